@@ -1,17 +1,17 @@
 import streamlit as st
-from predict import predict_code_quality
-from extract import extract
-import tempfile
-import os
+from predict import get_predictor
+from history_store import get_history_store
+from extract import extract_source
+from repo_analysis import analyze_repo
+from neighbors import LABEL_GRADES, LABEL_SCORES, load_index
+from reports import REPORTS_DIR, get_report_worker
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
-import sqlite3
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.units import inch
-from reportlab.lib.pagesizes import letter
-import datetime
+import hashlib
+import os
+import re
+import time
 
 # -----------------------------------
 # Page Configuration
@@ -29,33 +29,53 @@ st.divider()
 # -----------------------------------
 # DATABASE SETUP
 # -----------------------------------
-def init_db():
-    conn = sqlite3.connect("analysis_history.db")
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT,
-            mode TEXT,
-            score INTEGER,
-            grade TEXT
-        )
-    """)
-    conn.commit()
-    conn.close()
-
-init_db()
+@st.cache_resource
+def load_history_store():
+    """One WAL-mode store (and background writer) per server process."""
+    return get_history_store()
 
 
 def save_analysis(mode, score, grade):
-    conn = sqlite3.connect("analysis_history.db")
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO history (timestamp, mode, score, grade)
-        VALUES (?, ?, ?, ?)
-    """, (str(datetime.datetime.now()), mode, score, grade))
-    conn.commit()
-    conn.close()
+    load_history_store().save(mode, score, grade)
+
+
+# -----------------------------------
+# ANALYSIS CACHE
+# -----------------------------------
+RESULT_CACHE_SIZE = 256
+
+
+@st.cache_resource
+def load_predictor():
+    """Models are loaded once per server process and shared by all sessions."""
+    return get_predictor()
+
+
+@st.cache_data(max_entries=RESULT_CACHE_SIZE, show_spinner=False)
+def analyze_cached(source_hash, filename, _code):
+    # Keyed on the source hash (the leading underscore keeps Streamlit from
+    # hashing the full text again); least recently used entries are evicted.
+    metrics = extract_source(_code, filename)
+    cluster, label = load_predictor().predict_metrics(metrics)
+    return metrics, cluster, label
+
+
+def analyze_source(code, filename="snippet.py"):
+    """Metrics, cluster and label for `code`; no extraction if seen before."""
+    source_hash = hashlib.sha256(code.encode("utf-8")).hexdigest()
+    return analyze_cached(source_hash, filename, code)
+
+
+# -----------------------------------
+# NEIGHBOUR INDEX
+# -----------------------------------
+SIMILAR_FILES = 5
+
+
+@st.cache_resource
+def load_neighbor_index():
+    """Corpus neighbour index for the loaded model; None until `python neighbors.py build`."""
+    return load_index(load_predictor())
 
 
 # -----------------------------------
@@ -65,43 +85,99 @@ st.sidebar.header("⚙ Configuration")
 
 analysis_mode = st.sidebar.selectbox(
     "Select Mode",
-    ["Single Code Analysis", "Code Comparison"]
+    ["Single Code Analysis", "Code Comparison", "Repository Analysis"]
 )
 
+HISTORY_PAGE_SIZE = 50
+
 if st.sidebar.button("📜 View Analysis History"):
-    conn = sqlite3.connect("analysis_history.db")
-    df = pd.read_sql_query("SELECT * FROM history", conn)
-    conn.close()
+    st.session_state["show_history"] = not st.session_state.get("show_history", False)
+
+if st.session_state.get("show_history"):
+    history = load_history_store()
+    total = history.count()
     st.subheader("📜 Analysis History")
-    st.dataframe(df)
+
+    pages = max(1, -(-total // HISTORY_PAGE_SIZE))
+    page = st.number_input("Page", min_value=1, max_value=pages, value=1)
+    rows = history.page(limit=HISTORY_PAGE_SIZE, offset=(page - 1) * HISTORY_PAGE_SIZE)
+    st.caption(f"{total} analyses, page {page} of {pages}")
+    st.dataframe(pd.DataFrame(rows, columns=["id", "timestamp", "mode", "score", "grade"]))
+
+    distribution = pd.DataFrame(
+        history.grade_distribution("day"),
+        columns=["day", "grade", "count", "avg_score"],
+    )
+    if not distribution.empty:
+        st.subheader("📊 Grade Distribution Over Time")
+        st.bar_chart(distribution.pivot(index="day", columns="grade", values="count").fillna(0))
 
 
 # -----------------------------------
 # Utility Functions
 # -----------------------------------
 def get_score_and_grade(label):
-    if label.lower() == "good":
-        return 85, "A"
-    elif label.lower() == "average":
-        return 65, "B"
-    else:
-        return 40, "C"
+    label = label.capitalize()
+    return LABEL_SCORES.get(label, LABEL_SCORES["Bad"]), LABEL_GRADES.get(label, "C")
+
+
+def score_metrics(metrics, label):
+    """
+    (score, grade, explanation). Score and grade follow the label, as in
+    repository mode and the reports; with the neighbour index the
+    explanation adds the most similar corpus files and the distance-weighted
+    neighbour score, shown only as context.
+    """
+    score, grade = get_score_and_grade(label)
+    index = load_neighbor_index()
+    if index is None:
+        return score, grade, None
+    return score, grade, index.explain(metrics, k=SIMILAR_FILES)
+
+
+# metric, lower is better, advice
+SUGGESTION_RULES = [
+    ("cyclomatic_complexity", True, "Reduce cyclomatic complexity"),
+    ("nesting_depth", True, "Flatten deeply nested blocks"),
+    ("max_line_length", True, "Shorten the longest lines"),
+    ("comment_ratio", False, "Add comments"),
+    ("has_docstring", False, "Add docstrings"),
+    ("avg_identifier_quality", False, "Use more descriptive function names"),
+]
+
+
+def threshold_suggestions(metrics):
+    suggestions = []
+    if metrics.get("cyclomatic_complexity", 0) > 5:
+        suggestions.append("⚠ Reduce cyclomatic complexity.")
+    if metrics.get("num_comments", 0) == 0:
+        suggestions.append("⚠ Add comments.")
+    if metrics.get("has_docstring", 0) == 0:
+        suggestions.append("⚠ Add docstrings.")
+    if metrics.get("num_functions", 0) <= 1:
+        suggestions.append("⚠ Break into reusable functions.")
+    return suggestions
 
 
 def generate_suggestions(label, metrics):
+    if label.lower() not in ["average", "bad"]:
+        return ["✔ Code structure looks good."]
+    index = load_neighbor_index()
+    if index is None:
+        return threshold_suggestions(metrics)
+
+    # Compare against the closest files the model rates Good
+    good = index.nearest(metrics, k=SIMILAR_FILES, label="Good")
     suggestions = []
-    if label.lower() in ["average", "bad"]:
-        if metrics.get("cyclomatic_complexity", 0) > 5:
-            suggestions.append("⚠ Reduce cyclomatic complexity.")
-        if metrics.get("num_comments", 0) == 0:
-            suggestions.append("⚠ Add comments.")
-        if metrics.get("has_docstring", 0) == 0:
-            suggestions.append("⚠ Add docstrings.")
-        if metrics.get("num_functions", 0) <= 1:
-            suggestions.append("⚠ Break into reusable functions.")
-    else:
-        suggestions.append("✔ Code structure looks good.")
-    return suggestions
+    for key, lower_is_better, advice in SUGGESTION_RULES:
+        values = [n["metrics"][key] for n in good if key in n["metrics"]]
+        if not values or key not in metrics:
+            continue
+        target = float(np.median(values))
+        value = metrics[key]
+        if (value > target) if lower_is_better else (value < target):
+            suggestions.append(f"⚠ {advice}: {value:.2f} here, {target:.2f} in the most similar Good files.")
+    return suggestions or threshold_suggestions(metrics)
 
 
 def radar_chart(metrics1, metrics2):
@@ -137,6 +213,14 @@ def radar_chart(metrics1, metrics2):
     st.pyplot(fig)
 
 
+@st.fragment(run_every=1)
+def report_progress(job):
+    """Polls a background report job without rerunning the whole page."""
+    if job.finished.is_set():
+        st.rerun()
+    st.progress(job.progress, text=f"Building report: {job.done}/{job.total or '?'} files")
+
+
 # -----------------------------------
 # SINGLE CODE ANALYSIS
 # -----------------------------------
@@ -160,33 +244,37 @@ if analysis_mode == "Single Code Analysis":
 
         if code_input.strip():
 
-            with tempfile.NamedTemporaryFile(mode='w', suffix=".py", delete=False, encoding="utf-8") as tmp:
-                tmp.write(code_input)
-                path = tmp.name
-
-            try:
-                cluster, label = predict_code_quality(path)
-                score, grade = get_score_and_grade(label)
-                metrics = extract(path)
-                suggestions = generate_suggestions(label, metrics)
+            start = time.perf_counter()
+            metrics, cluster, label = analyze_source(code_input, "snippet.py")
+            score, grade, explanation = score_metrics(metrics, label)
+            elapsed_ms = 1000 * (time.perf_counter() - start)
+            suggestions = generate_suggestions(label, metrics)
 
-                save_analysis("Single", score, grade)
+            save_analysis("Single", score, grade)
 
-                st.progress(score / 100)
-                st.metric("Score", f"{score}/100")
-                st.metric("Grade", grade)
+            st.caption(f"Analyzed in {elapsed_ms:.1f} ms")
+            st.progress(score / 100)
+            st.metric("Score", f"{score}/100")
+            st.metric("Grade", grade)
 
-                st.subheader("📌 Metrics")
-                cols = st.columns(3)
-                for i, (k, v) in enumerate(metrics.items()):
-                    cols[i % 3].metric(k.replace("_", " ").title(), v)
+            st.subheader("📌 Metrics")
+            cols = st.columns(3)
+            for i, (k, v) in enumerate(metrics.items()):
+                cols[i % 3].metric(k.replace("_", " ").title(), v)
 
-                st.subheader("🤖 Suggestions")
-                for s in suggestions:
-                    st.write(s)
+            st.subheader("🤖 Suggestions")
+            for s in suggestions:
+                st.write(s)
 
-            finally:
-                os.remove(path)
+            if explanation:
+                st.subheader("🧭 Files Like Yours")
+                st.caption(f"Neighbour score {explanation['score']:.0f}/100. Distance to each cluster centre: " + ", ".join(
+                    f"{name} {distance:.2f}" for name, distance in explanation["centroid_distances"].items()
+                ))
+                st.dataframe(pd.DataFrame([
+                    {"file": n["filename"], "label": n["label"], "distance": round(n["distance"], 3)}
+                    for n in explanation["neighbors"]
+                ]))
 
 
 # -----------------------------------
@@ -204,25 +292,18 @@ if analysis_mode == "Code Comparison":
         code1 = file1.read().decode("utf-8")
         code2 = file2.read().decode("utf-8")
 
-        with tempfile.NamedTemporaryFile(mode='w', suffix=".py", delete=False, encoding="utf-8") as tmp1:
-            tmp1.write(code1)
-            path1 = tmp1.name
-
-        with tempfile.NamedTemporaryFile(mode='w', suffix=".py", delete=False, encoding="utf-8") as tmp2:
-            tmp2.write(code2)
-            path2 = tmp2.name
-
-        cluster1, label1 = predict_code_quality(path1)
-        cluster2, label2 = predict_code_quality(path2)
+        metrics1, cluster1, label1 = analyze_source(code1, file1.name)
+        metrics2, cluster2, label2 = analyze_source(code2, file2.name)
 
-        score1, grade1 = get_score_and_grade(label1)
-        score2, grade2 = get_score_and_grade(label2)
+        score1, grade1, _ = score_metrics(metrics1, label1)
+        score2, grade2, _ = score_metrics(metrics2, label2)
 
-        save_analysis("Comparison File1", score1, grade1)
-        save_analysis("Comparison File2", score2, grade2)
-
-        metrics1 = extract(path1)
-        metrics2 = extract(path2)
+        # Widget interactions rerun this block; record each pair only once
+        pair = (hash(code1), hash(code2))
+        if st.session_state.get("saved_comparison") != pair:
+            save_analysis("Comparison File1", score1, grade1)
+            save_analysis("Comparison File2", score2, grade2)
+            st.session_state["saved_comparison"] = pair
 
         col1, col2 = st.columns(2)
         col1.metric("File 1 Score", f"{score1}/100")
@@ -238,5 +319,78 @@ if analysis_mode == "Code Comparison":
         st.subheader("📈 Radar Chart Comparison")
         radar_chart(metrics1, metrics2)
 
-        os.remove(path1)
-        os.remove(path2)
+
+# -----------------------------------
+# REPOSITORY ANALYSIS MODE
+# -----------------------------------
+if analysis_mode == "Repository Analysis":
+
+    st.subheader("🗂 Analyze a GitHub Repository")
+
+    repo_url = st.text_input("Repository URL", placeholder="https://github.com/owner/repo")
+
+    if st.button("🔍 Analyze Repository") and repo_url.strip():
+
+        with st.spinner("Fetching and scoring files..."):
+            # Kept across reruns so the export buttons below don't lose it
+            st.session_state["repo_analysis"] = (repo_url.strip(), analyze_repo(repo_url.strip()))
+            st.session_state.pop("report_job", None)
+
+    if "repo_analysis" in st.session_state:
+        analyzed_url, report = st.session_state["repo_analysis"]
+
+        if not report or not report["files"]:
+            st.error("Could not fetch any Python files from this repository.")
+        else:
+            files_df = pd.DataFrame([
+                {
+                    "path": r["path"],
+                    "label": r["label"],
+                    "score": get_score_and_grade(r["label"])[0],
+                    "cyclomatic_complexity": r["metrics"]["cyclomatic_complexity"],
+                    "lines_of_code": r["metrics"]["lines_of_code"],
+                }
+                for r in report["files"]
+            ])
+            avg_score = int(round(files_df["score"].mean()))
+
+            col1, col2 = st.columns(2)
+            col1.metric("Files Analyzed", len(files_df))
+            col2.metric("Average Score", f"{avg_score}/100")
+
+            st.subheader("📁 Directories")
+            st.dataframe(pd.DataFrame([
+                {
+                    "directory": d,
+                    "files": v["files"],
+                    **{label: v["labels"].get(label, 0) for label in ["Good", "Average", "Bad"]},
+                    "avg_complexity": round(v["mean"].get("cyclomatic_complexity", 0), 2),
+                }
+                for d, v in report["directories"].items()
+            ]))
+
+            st.subheader("📄 Files")
+            st.dataframe(files_df)
+
+            st.subheader("🧾 Export Report")
+            report_format = st.radio("Format", ["PDF", "HTML"], horizontal=True)
+            if st.button("Build Report"):
+                name = re.sub(r"[^\w.-]+", "_", analyzed_url.rstrip("/").split("/")[-1]) or "repository"
+                out = os.path.join(REPORTS_DIR, f"{name}-{int(time.time())}.{report_format.lower()}")
+                st.session_state["report_job"] = get_report_worker().submit(
+                    report["files"], out, title=f"Code Quality Report: {analyzed_url}"
+                )
+
+            job = st.session_state.get("report_job")
+            if job is not None:
+                if job.status == "done":
+                    with open(job.out, "rb") as f:
+                        st.download_button(
+                            f"⬇ Download {os.path.basename(job.out)}", f, file_name=os.path.basename(job.out),
+                            mime="text/html" if job.fmt == "html" else "application/pdf",
+                        )
+                    st.caption(f"Built in {job.seconds:.1f} s")
+                elif job.status == "failed":
+                    st.error(f"Report failed: {job.error}")
+                else:
+                    report_progress(job)
@@ -0,0 +1,201 @@
+"""
+AST-driven structure metrics for Python sources.
+
+One walk over the ast.parse() tree gives what the line scanner could
+only guess from line prefixes:
+- true block nesting depth
+- loops, conditionals (if/elif/else) and exception clauses
+- import statements
+- module, class and function docstrings, with their exact line ranges
+- every identifier (names, attributes, arguments, definitions, imports)
+
+The same walk also gives the function list with per-function cyclomatic
+complexity, so lizard is no longer needed for Python. Complexity follows
+lizard's rules: 1 plus one for every if/elif/for/while/except/finally
+and every and/or, including comprehension clauses, conditional
+expressions and match guards. A nested function is its own entry named
+"outer.inner", and its body does not count towards the outer function.
+Unlike lizard, one-line definitions ("def f(): return 1") are counted.
+
+analyze() raises SyntaxError (or ValueError for null bytes,
+RecursionError for absurd nesting) on source that does not parse;
+extract.py then falls back to lizard and the line scanner.
+"""
+import ast
+import gc
+import warnings
+from collections import Counter
+
+FUNCTIONS = (ast.FunctionDef, ast.AsyncFunctionDef)
+LOOPS = (ast.For, ast.AsyncFor, ast.While)
+TRIES = (ast.Try, ast.TryStar) if hasattr(ast, "TryStar") else (ast.Try,)
+# Statement lists that open a new block
+BLOCK_FIELDS = {"body", "orelse", "finalbody"}
+# Fields that only ever hold operator / context singletons
+SKIP_FIELDS = {"ctx", "op", "ops"}
+_child_fields = {}
+
+
+def child_fields(kind):
+    """(field, opens a block) pairs worth descending into, per node class."""
+    fields = _child_fields.get(kind)
+    if fields is None:
+        fields = _child_fields[kind] = tuple(
+            (field, field in BLOCK_FIELDS) for field in kind._fields if field not in SKIP_FIELDS
+        )
+    return fields
+
+
+def docstring_range(body):
+    """0-based line indexes of the docstring opening `body`, or None."""
+    if body and isinstance(body[0], ast.Expr):
+        value = body[0].value
+        if isinstance(value, ast.Constant) and isinstance(value.value, str):
+            return range(body[0].lineno - 1, body[0].end_lineno)
+    return None
+
+
+def analyze(text):
+    """
+    Structure of one Python source text:
+    {"max_nesting", "num_loops", "num_conditionals", "num_exceptions",
+     "num_imports", "has_docstring", "docstring_lines", "identifiers",
+     "functions": [(name, cyclomatic_complexity), ...]}
+    """
+    # The parser allocates a node per token or so; letting the cyclic GC
+    # scan them all mid-parse costs more than a tenth of the parse time.
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with warnings.catch_warnings():
+            # Invalid escape sequences and the like are not our concern
+            warnings.simplefilter("ignore")
+            tree = ast.parse(text)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    identifiers = Counter()
+    functions = []
+    docstring_lines = set()
+    max_nesting = loops = conditionals = exceptions = imports = 0
+
+    module_docstring = docstring_range(tree.body)
+    if module_docstring:
+        docstring_lines.update(module_docstring)
+
+    # (node, block depth, [name, complexity] of the enclosing function or None)
+    stack = [(stmt, 0, None) for stmt in tree.body]
+    while stack:
+        node, depth, func = stack.pop()
+        kind = type(node)
+
+        if isinstance(node, ast.stmt) and depth > max_nesting:
+            max_nesting = depth
+
+        if kind in FUNCTIONS or kind is ast.ClassDef:
+            identifiers[node.name] += 1
+            docstring = docstring_range(node.body)
+            if docstring:
+                docstring_lines.update(docstring)
+            # Decorators (and class bases) are evaluated in the enclosing scope
+            for child in node.decorator_list:
+                stack.append((child, depth, func))
+            if kind is ast.ClassDef:
+                for child in node.bases + node.keywords:
+                    stack.append((child, depth, func))
+                inner = func
+            else:
+                inner = [node.name if func is None else f"{func[0]}.{node.name}", 1]
+                functions.append(inner)
+                stack.append((node.args, depth, inner))
+                if node.returns is not None:
+                    stack.append((node.returns, depth, inner))
+            for child in node.body:
+                stack.append((child, depth + 1, inner))
+            continue
+
+        if kind is ast.Name:
+            identifiers[node.id] += 1
+            continue
+        if kind is ast.Constant:
+            continue
+        if kind is ast.Attribute:
+            identifiers[node.attr] += 1
+        elif kind is ast.arg:
+            identifiers[node.arg] += 1
+        elif kind is ast.If:
+            conditionals += 1
+            if func is not None:
+                func[1] += 1
+            orelse = node.orelse
+            if len(orelse) == 1 and type(orelse[0]) is ast.If:
+                # elif: same block level as the if it continues
+                stack.append((orelse[0], depth, func))
+                stack.append((node.test, depth, func))
+                for child in node.body:
+                    stack.append((child, depth + 1, func))
+                continue
+            if orelse:
+                conditionals += 1
+        elif kind in LOOPS:
+            loops += 1
+            if func is not None:
+                func[1] += 1
+        elif kind in TRIES:
+            exceptions += 1 + len(node.handlers) + (1 if node.finalbody else 0)
+            if func is not None and node.finalbody:
+                func[1] += 1
+        elif kind is ast.ExceptHandler:
+            if node.name:
+                identifiers[node.name] += 1
+            if func is not None:
+                func[1] += 1
+        elif kind is ast.BoolOp:
+            if func is not None:
+                func[1] += len(node.values) - 1
+        elif kind is ast.IfExp:
+            if func is not None:
+                func[1] += 1
+        elif kind is ast.comprehension:
+            if func is not None:
+                func[1] += 1 + len(node.ifs)
+        elif kind is ast.Import or kind is ast.ImportFrom:
+            imports += 1
+            for alias in node.names:
+                for part in (alias.asname or alias.name).split("."):
+                    identifiers[part] += 1
+            continue
+        elif kind is ast.keyword:
+            if node.arg:
+                identifiers[node.arg] += 1
+        elif kind is ast.Global or kind is ast.Nonlocal:
+            for name in node.names:
+                identifiers[name] += 1
+        elif kind is ast.match_case:
+            if func is not None and node.guard is not None:
+                func[1] += 1
+
+        for field, block in child_fields(kind):
+            value = getattr(node, field, None)
+            if value is None:
+                continue
+            child_depth = depth + 1 if block else depth
+            if type(value) is list:
+                for child in value:
+                    if isinstance(child, ast.AST):
+                        stack.append((child, child_depth, func))
+            elif isinstance(value, ast.AST):
+                stack.append((value, child_depth, func))
+
+    return {
+        "max_nesting": max_nesting,
+        "num_loops": loops,
+        "num_conditionals": conditionals,
+        "num_exceptions": exceptions,
+        "num_imports": imports,
+        "has_docstring": 1 if docstring_lines else 0,
+        "docstring_lines": docstring_lines,
+        "identifiers": identifiers,
+        "functions": [(name, complexity) for name, complexity in functions],
+    }
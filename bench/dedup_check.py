@@ -0,0 +1,49 @@
+"""
+Re-running dedup on an already indexed folder must not delete anything.
+
+    python -m bench.dedup_check
+
+Builds a scratch folder with an exact and a near duplicate, runs
+dedup_folder(remove=True) twice against the same saved index and checks
+that the first run removes only the copies and the second run changes
+nothing. Exits non-zero on failure.
+"""
+import os
+import tempfile
+
+from dedup import DedupIndex, dedup_folder
+
+ORIGINAL = "\n".join(f"def handler_{i}(request, context):\n    return process(request, {i}) + context.offset\n" for i in range(20))
+NEAR = ORIGINAL.replace("handler_19", "handler_nineteen")
+OTHER = "\n".join(f"class Model{i}:\n    size = {i} * 3\n" for i in range(20))
+
+
+def main():
+    with tempfile.TemporaryDirectory() as folder:
+        files = {"a.py": ORIGINAL, "b.py": OTHER, "c.py": ORIGINAL, "d.py": NEAR}
+        for name, content in files.items():
+            with open(os.path.join(folder, name), "w", encoding="utf-8") as f:
+                f.write(content)
+
+        first = dedup_folder(folder, remove=True)
+        after_first = sorted(n for n in os.listdir(folder) if n.endswith(".py"))
+        second = dedup_folder(folder, remove=True)
+        after_second = sorted(n for n in os.listdir(folder) if n.endswith(".py"))
+        indexed = len(DedupIndex(os.path.join(folder, "dedup_index")))
+
+    print(f"first run:  removed {first}, left {after_first}")
+    print(f"second run: removed {second}, left {after_second}, {indexed} indexed")
+    ok = (
+        sorted(first) == [("c.py", "a.py"), ("d.py", "a.py")]
+        and after_first == ["a.py", "b.py"]
+        and second == []
+        and after_second == after_first
+        and indexed == 2
+    )
+    if not ok:
+        raise SystemExit("dedup re-run changed the folder")
+    print("ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+fetch.py against a local stub of the GitHub API.
+
+    python -m bench.fetch_stub
+
+Serves the recorded responses in bench/fixtures/github.json on a local
+port, points GITHUB_API at it and checks:
+- search pagination (pages 1-3, the last one empty)
+- a malformed X-RateLimit header is ignored, not raised
+- a 403 with X-RateLimit-Remaining: 0, then a 429 with Retry-After,
+  are waited out and retried until the 200
+- a bare 403 secondary-limit message, then a 429 with no rate-limit
+  headers at all, are retried with exponential backoff
+- a late response with a stale, higher X-RateLimit-Remaining doesn't
+  refill the bucket past what it holds
+- the tree/blob path of fetch_repo_files(), and that a second fetch is
+  served from the blob cache
+Exits non-zero on failure.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "github.json")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    routes = {}
+    served = Counter()
+    lock = threading.Lock()
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        page = parse_qs(url.query).get("page")
+        route = f"{url.path}?page={page[0]}" if page else url.path
+        with self.lock:
+            responses = self.routes.get(route)
+            n = self.served[route]
+            self.served[route] += 1
+        if responses is None:
+            response = {"status": 404, "body": {"message": "Not Found"}}
+        else:
+            response = responses[min(n, len(responses) - 1)]
+
+        headers = {"X-RateLimit-Remaining": "4999", "X-RateLimit-Reset": "+3600", **response.get("headers", {})}
+        body = json.dumps(response["body"]).encode()
+        self.send_response(response["status"])
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            if value is None:
+                continue
+            if value.startswith("+") and value[1:].isdigit():
+                value = str(int(time.time()) + int(value[1:]))
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def check(name, ok, detail=""):
+    print(f"{'ok  ' if ok else 'FAIL'} {name}{': ' + str(detail) if detail else ''}")
+    return ok
+
+
+def main():
+    with open(FIXTURES, "r", encoding="utf-8") as f:
+        StubHandler.routes = {k: v for k, v in json.load(f).items() if not k.startswith("_")}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # fetch reads GITHUB_API at import time
+    os.environ["GITHUB_API"] = f"http://127.0.0.1:{server.server_port}"
+    import fetch
+
+    results = []
+    pages = [fetch.search_files("demo language:Python", page=page) for page in (1, 2, 3)]
+    results.append(check("search pagination", [len(p) for p in pages] == [2, 1, 0], [len(p) for p in pages]))
+    results.append(check("malformed rate-limit headers ignored", pages[1] and pages[1][0]["path"] == "app.py"))
+
+    with tempfile.TemporaryDirectory() as cache:
+        fetch.BLOB_CACHE_DIR = cache
+        files = fetch.fetch_repo_files("https://github.com/octo/demo")
+        results.append(check("tree/blob fetch", files is not None and sorted(files) == ["src/main.py", "src/util.py"]
+                             and files["src/util.py"].startswith("def add"), sorted(files or {})))
+        blob_requests = sum(n for route, n in StubHandler.served.items() if "/git/blobs/" in route)
+        fetch.fetch_repo_files("https://github.com/octo/demo")
+        cached = sum(n for route, n in StubHandler.served.items() if "/git/blobs/" in route) == blob_requests
+        results.append(check("second fetch served from blob cache", cached))
+
+    start = time.monotonic()
+    content = fetch.download_file("octo/demo", "src/main.py")
+    waited = time.monotonic() - start
+    attempts = StubHandler.served["/repos/octo/demo/contents/src/main.py"]
+    results.append(check("403 and 429 waited out and retried",
+                         content is not None and content.startswith("def main") and attempts == 3 and waited >= 1.5,
+                         f"{attempts} attempts, {waited:.1f} s"))
+
+    start = time.monotonic()
+    content = fetch.download_file("octo/demo", "src/util.py")
+    waited = time.monotonic() - start
+    attempts = StubHandler.served["/repos/octo/demo/contents/src/util.py"]
+    # 2 ** 0 + 2 ** 1 seconds of backoff
+    results.append(check("bare 403 and 429 retried with backoff",
+                         content is not None and content.startswith("def add") and attempts == 3 and waited >= 2.5,
+                         f"{attempts} attempts, {waited:.1f} s"))
+
+    limiter = fetch.RateLimiter(rate=1.0, burst=8)
+    limiter.tokens = 2.0
+    stale = SimpleNamespace(headers={"X-RateLimit-Remaining": "4990", "X-RateLimit-Reset": str(int(time.time()) + 3600)})
+    limiter.update(stale)
+    results.append(check("stale remaining doesn't refill the bucket", limiter.tokens == 2.0 and limiter.capacity == 8,
+                         f"tokens {limiter.tokens}, capacity {limiter.capacity}"))
+
+    server.shutdown()
+    if not all(results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
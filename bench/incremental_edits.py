@@ -0,0 +1,81 @@
+"""
+Single-line edits on a large file: full re-extraction vs IncrementalAnalyzer.
+
+    python -m bench.incremental_edits [--lines 10000] [--edits 50]
+
+Every incremental result is checked against extract_source() on the same
+text.
+"""
+import argparse
+import random
+import time
+
+from extract import extract_source
+from incremental import IncrementalAnalyzer
+
+FUNCTION_TEMPLATE = '''def handler_{i}(items, limit={i}):
+    """Process items for handler {i}."""
+    total = 0
+    for item in items:
+        if item > limit:
+            total += item
+        elif item < 0:
+            continue
+        else:
+            try:
+                total -= int(item)
+            except ValueError:
+                pass
+    return total
+
+'''
+
+
+def generate_source(n_lines):
+    parts = ["import os\nimport sys\n\n"]
+    i = 0
+    while sum(p.count("\n") for p in parts) < n_lines:
+        parts.append(FUNCTION_TEMPLATE.format(i=i))
+        i += 1
+    return "".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=10_000)
+    parser.add_argument("--edits", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    lines = generate_source(args.lines).splitlines(keepends=True)
+    analyzer = IncrementalAnalyzer("generated.py")
+    analyzer.update("".join(lines))
+
+    full_times, incremental_times = [], []
+    for _ in range(args.edits):
+        pos = rng.randrange(len(lines))
+        new_line = lines[pos].rstrip("\n") + "  # edited\n" if lines[pos].strip() else "x = 1\n"
+        lines[pos] = new_line
+
+        start = time.perf_counter()
+        incremental = analyzer.apply_edit(pos, pos + 1, new_line)
+        incremental_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        full = extract_source("".join(lines), "generated.py")
+        full_times.append(time.perf_counter() - start)
+
+        if incremental != full:
+            diff = {k: (full[k], incremental[k]) for k in full if full[k] != incremental[k]}
+            raise SystemExit(f"Mismatch after editing line {pos}: {diff}")
+
+    full_ms = 1000 * sum(full_times) / len(full_times)
+    incremental_ms = 1000 * sum(incremental_times) / len(incremental_times)
+    print(f"lines:        {len(lines)}")
+    print(f"full extract: {full_ms:8.2f} ms/edit")
+    print(f"incremental:  {incremental_ms:8.2f} ms/edit ({full_ms / incremental_ms:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
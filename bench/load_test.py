@@ -0,0 +1,82 @@
+"""
+Load test for the scoring service.
+
+    python service.py --port 8000 &
+    python -m bench.load_test --url http://127.0.0.1:8000 --concurrency 16 --duration 10
+
+Each client thread keeps one connection open and posts the sample files
+in data/ in a loop; latency percentiles and requests/sec are printed at
+the end.
+"""
+import argparse
+import http.client
+import json
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+
+SAMPLES = ["data/good.py", "data/average.py", "data/bad.py"]
+
+
+def client(url, bodies, stop_at, latencies, errors):
+    parsed = urlparse(url)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=30)
+    i = 0
+    while time.perf_counter() < stop_at:
+        body = bodies[i % len(bodies)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            conn.request("POST", "/score", body=body, headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+                continue
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(str(e))
+            conn.close()
+            conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    bodies = []
+    for path in SAMPLES:
+        with open(path, "r", encoding="utf-8") as f:
+            bodies.append(json.dumps({"source": f.read(), "filename": os.path.basename(path)}))
+
+    latencies, errors = [], []
+    stop_at = time.perf_counter() + args.duration
+    threads = [
+        threading.Thread(target=client, args=(args.url, bodies, stop_at, latencies, errors))
+        for _ in range(args.concurrency)
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    ms = np.array(latencies) * 1000
+    print(f"requests:    {len(latencies)} ok, {len(errors)} errors")
+    print(f"throughput:  {len(latencies) / elapsed:.1f} req/sec")
+    if len(ms):
+        print(f"latency p50: {np.percentile(ms, 50):.2f} ms")
+        print(f"latency p99: {np.percentile(ms, 99):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Equivalence check and load timing for the model.bin artifact.
+
+    python -m bench.model_artifact [--model-dir data] [--files N]
+
+predict_code_quality() (which loads model.bin when present) must give
+the same cluster and label as a predictor built from the scikit-learn
+pickles, for the sample files, a synthetic corpus and random feature
+vectors. Exits non-zero on any mismatch.
+"""
+import argparse
+import glob
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+import model_artifact
+from bench import synthetic
+from predict import QualityPredictor, predict_code_quality
+
+warnings.filterwarnings("ignore")
+
+COLD_START = "import time; t = time.perf_counter(); from predict import QualityPredictor; QualityPredictor({model_dir!r}, params={params}); print(time.perf_counter() - t)"
+
+
+def cold_start_ms(model_dir, from_pickles):
+    params = f"__import__('model_artifact').params_from_pickles({model_dir!r})" if from_pickles else "None"
+    code = COLD_START.format(model_dir=model_dir, params=params)
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    return float(out.strip().splitlines()[-1]) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model-dir", default="data")
+    parser.add_argument("--files", type=int, default=200, help="stdlib files to include")
+    args = parser.parse_args()
+
+    artifact = os.path.join(args.model_dir, model_artifact.ARTIFACT)
+    if not os.path.exists(artifact):
+        sys.exit(f"{artifact} not found; run `python model_artifact.py convert` first")
+
+    reference = QualityPredictor(params=model_artifact.params_from_pickles(args.model_dir))
+    candidate = QualityPredictor(params=model_artifact.load(artifact))
+    assert candidate.feature_columns == reference.feature_columns, "feature schema differs"
+    assert candidate.cluster_mapping == reference.cluster_mapping, "cluster mapping differs"
+
+    mismatches = 0
+    with tempfile.TemporaryDirectory() as workdir:
+        files = glob.glob(os.path.join(args.model_dir, "*.py"))
+        files += synthetic.write_corpus(workdir, size=20, files_per_shape=2)
+        files += sorted(glob.glob(os.path.join(os.path.dirname(os.__file__), "*.py")))[:args.files]
+        for path in files:
+            expected = reference.predict_file(path)
+            actual = predict_code_quality(path)
+            if actual != expected:
+                mismatches += 1
+                print(f"MISMATCH {path}: pickles {expected}, artifact {actual}")
+
+    X = np.random.default_rng(0).normal(size=(100000, len(reference.feature_columns))) * 50
+    matrix_mismatches = int(np.sum(reference.predict_matrix(X) != candidate.predict_matrix(X)))
+    projection_error = float(np.max(np.abs(reference.project(X) - candidate.project(X))))
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        model_artifact.load(artifact)
+    load_ms = (time.perf_counter() - start)
+
+    print(f"files checked:       {len(files)} ({mismatches} mismatches)")
+    print(f"random vectors:      {len(X)} ({matrix_mismatches} mismatches, max projection error {projection_error:.2e})")
+    print(f"artifact load:       {load_ms:.3f} ms")
+    print(f"cold start, pickles: {cold_start_ms(args.model_dir, True):.1f} ms")
+    print(f"cold start, artifact:{cold_start_ms(args.model_dir, False):.1f} ms")
+    if mismatches or matrix_mismatches:
+        sys.exit(1)
+    print("equivalent: ok")
+
+
+if __name__ == "__main__":
+    main()
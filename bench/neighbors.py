@@ -0,0 +1,101 @@
+"""
+Build and query timings for the neighbour index (neighbors.py).
+
+    python -m bench.neighbors [--rows 1000000] [--queries 1000] [-k 5]
+
+Resamples data/metrics.csv with ±20% jitter to --rows rows, builds an
+index from the CSV, then times single queries: a search over all rows,
+one over the Good cluster only, and the full explain(). Every result is
+checked against an exhaustive search, and the script exits non-zero if
+any neighbour list differs.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import neighbors
+from bench.suite import peak_rss_mb
+from predict import METRICS_CSV, get_predictor
+
+
+def jittered_metrics(path, rows, workdir, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.read_csv(METRICS_CSV).sample(rows, replace=True, random_state=seed).reset_index(drop=True)
+    numeric = df.select_dtypes("number").columns.drop("has_docstring", errors="ignore")
+    df[numeric] = df[numeric] * rng.uniform(0.8, 1.2, size=(rows, len(numeric)))
+    df["filename"] = [f"{i}_{name}" for i, name in enumerate(df["filename"])]
+    out = os.path.join(workdir, "metrics.csv")
+    df.to_csv(out, index=False)
+    return out, df
+
+
+def percentiles(latencies):
+    p50, p99 = np.percentile(np.array(latencies) * 1000, [50, 99])
+    return f"p50 {p50:.3f} ms, p99 {p99:.3f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    predictor = get_predictor()
+    with tempfile.TemporaryDirectory() as workdir:
+        print(f"Generating {args.rows} rows...")
+        csv_path, df = jittered_metrics(METRICS_CSV, args.rows, workdir)
+
+        start = time.perf_counter()
+        out = neighbors.build(neighbors.metrics_chunks(csv_path, predictor), predictor, os.path.join(workdir, "index"))
+        build_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = neighbors.NeighborIndex(out, predictor)
+        load_s = time.perf_counter() - start
+
+        rng = np.random.default_rng(1)
+        queries = df.iloc[rng.integers(0, len(df), args.queries)].to_dict("records")
+        for metrics in queries:
+            metrics.update({k: v * rng.uniform(0.9, 1.1) for k, v in metrics.items() if isinstance(v, float)})
+
+        start = time.perf_counter()
+        index.nearest(queries[0], args.k)
+        first_s = time.perf_counter() - start
+
+        good = [c for c, label in predictor.cluster_mapping.items() if label == "Good"]
+        search, search_good, explain = [], [], []
+        mismatches = 0
+        for metrics in queries:
+            P = predictor.project(predictor.vectorize(metrics))[np.newaxis]
+            start = time.perf_counter()
+            distances, rows = index.search(P, args.k)
+            search.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            index.search(P, args.k, clusters=good)
+            search_good.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            index.explain(metrics, args.k)
+            explain.append(time.perf_counter() - start)
+
+            exact = np.sort(np.linalg.norm(index.points - P, axis=1))[:args.k]
+            if not np.allclose(distances[0], exact, rtol=1e-6, atol=1e-6):
+                mismatches += 1
+
+    print(f"rows:        {len(index)}")
+    print(f"build:       {build_s:.1f} s (peak RSS {peak_rss_mb():.0f} MB)")
+    print(f"load:        {load_s * 1000:.1f} ms, first query {first_s * 1000:.1f} ms (builds the KD-tree above {neighbors.BRUTE_FORCE_ROWS} rows)")
+    print(f"search k={args.k}:  {percentiles(search)}")
+    print(f"  Good only: {percentiles(search_good)}")
+    print(f"explain:     {percentiles(explain)}")
+    print(f"exact:       {args.queries - mismatches}/{args.queries}")
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
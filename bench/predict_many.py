@@ -0,0 +1,62 @@
+"""
+Compare batch scoring against the per-file loop.
+
+    python -m bench.predict_many [folder] [--files N] [--processes P]
+
+Without a folder the sample files in data/ are repeated up to --files.
+"""
+import argparse
+import glob
+import os
+import time
+
+from predict import get_predictor, predict_code_quality, predict_many
+
+
+def load_items(folder, n_files):
+    if folder:
+        paths = sorted(p for p in glob.glob(os.path.join(folder, "*")) if not p.endswith(".csv"))
+        return paths[:n_files]
+    samples = []
+    for name in ["good.py", "average.py", "bad.py"]:
+        with open(os.path.join("data", name), "r", encoding="utf-8") as f:
+            samples.append((name, f.read()))
+    return [samples[i % len(samples)] for i in range(n_files)]
+
+
+def per_file_loop(items):
+    predictor = get_predictor()
+    for item in items:
+        if isinstance(item, tuple):
+            predictor.predict_source(item[1], item[0])
+        else:
+            predict_code_quality(item)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("folder", nargs="?")
+    parser.add_argument("--files", type=int, default=3000)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    items = load_items(args.folder, args.files)
+    get_predictor()
+
+    start = time.perf_counter()
+    per_file_loop(items)
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in predict_many(items, chunk_size=args.chunk_size, processes=args.processes):
+        pass
+    batch_time = time.perf_counter() - start
+
+    print(f"files:        {len(items)}")
+    print(f"per-file:     {len(items) / loop_time:10.1f} files/sec")
+    print(f"predict_many: {len(items) / batch_time:10.1f} files/sec")
+
+
+if __name__ == "__main__":
+    main()
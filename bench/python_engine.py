@@ -0,0 +1,93 @@
+"""
+AST engine against the line scanner plus lizard, on Python sources.
+
+    python -m bench.python_engine [--files 300] [--size 50] [--rounds 3]
+
+Times analyze_source() both ways over stdlib modules and a synthetic
+corpus (bench/synthetic.py), and reports how many of lizard's
+(function, complexity) pairs the AST engine reproduces. Exits non-zero
+if the AST engine is slower than the path it replaces.
+"""
+import argparse
+import glob
+import io
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from bench import synthetic
+import languages
+from extract import analyze_source
+
+
+def load(paths):
+    sources = []
+    for path in paths:
+        with open(path, "rb") as f:
+            code = f.read().decode("utf-8", errors="ignore")
+        lines = io.StringIO(code, newline=None).readlines()
+        sources.append((path, lines, "".join(lines)))
+    return sources
+
+
+def best_time(sources, use_ast, rounds):
+    python = languages.load("python")
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for path, lines, text in sources:
+            analyze_source(path, python, lines, text, use_ast=use_ast)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def agreement(sources):
+    """(lizard functions, matched by name and complexity, AST-only functions, files that fell back)"""
+    python = languages.load("python")
+    total = matched = extra = fallbacks = 0
+    for path, lines, text in sources:
+        scan, complexities, names = analyze_source(path, python, lines, text, use_ast=True)
+        if scan["engine"] != "ast":
+            fallbacks += 1
+            continue
+        _, lizard_complexities, lizard_names = analyze_source(path, python, lines, text, use_ast=False)
+        expected = Counter(zip(lizard_names, lizard_complexities))
+        actual = Counter(zip(names, complexities))
+        total += sum(expected.values())
+        matched += sum((expected & actual).values())
+        extra += sum((actual - expected).values())
+    return total, matched, extra, fallbacks
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=300, help="stdlib modules to include")
+    parser.add_argument("--size", type=int, default=50, help="synthetic corpus scale")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        paths = sorted(glob.glob(os.path.join(os.path.dirname(os.__file__), "*.py")))[:args.files]
+        paths += [p for p in synthetic.write_corpus(workdir, size=args.size) if p.endswith(".py")]
+        sources = load(paths)
+    n_lines = sum(len(lines) for _, lines, _ in sources)
+
+    # Warm the identifier caches so both sides time only their own work
+    best_time(sources, True, 1)
+    legacy = best_time(sources, False, args.rounds)
+    ast_time = best_time(sources, True, args.rounds)
+    total, matched, extra, fallbacks = agreement(sources)
+
+    print(f"{len(sources)} files, {n_lines} lines")
+    print(f"lines + lizard: {legacy:8.2f} s {n_lines / legacy:10.0f} lines/s")
+    print(f"ast:            {ast_time:8.2f} s {n_lines / ast_time:10.0f} lines/s ({legacy / ast_time:.1f}x)")
+    print(f"lizard functions matched: {matched}/{total} ({matched / (total or 1):.1%}), "
+          f"{extra} only found by the AST engine, {fallbacks} files fell back")
+    if ast_time > legacy:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
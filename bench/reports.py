@@ -0,0 +1,104 @@
+"""
+Report build time and memory at scale (reports.py).
+
+    python -m bench.reports [--files 10000]
+
+Writes --files synthetic scored records (jittered data/metrics.csv rows
+spread over a few hundred directories, labelled by the current model) as
+codeq NDJSON, then times:
+- PDF with a cold and a warm chart cache, and HTML
+- Python heap peak (tracemalloc) for --files and 4x --files, to see how
+  memory grows with the number of files
+- a background ReportWorker job, with the longest stall of a main thread
+  that wakes every 10 ms while the report builds
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import reports
+from predict import METRICS_CSV, get_predictor
+
+
+def write_records(path, files, seed=0):
+    rng = np.random.default_rng(seed)
+    predictor = get_predictor()
+    df = pd.read_csv(METRICS_CSV).sample(files, replace=True, random_state=seed).reset_index(drop=True)
+    numeric = df.select_dtypes("number").columns.drop("has_docstring", errors="ignore")
+    df[numeric] = df[numeric] * rng.uniform(0.8, 1.2, size=(files, len(numeric)))
+    labels = predictor.predict_matrix(df[predictor.feature_columns].to_numpy(dtype=float))
+    with open(path, "w", encoding="utf-8") as f:
+        for i, (metrics, cluster) in enumerate(zip(df.to_dict("records"), labels)):
+            path_parts = [f"pkg{i % 20}", f"module{i % 300}", f"{i}_{metrics['filename']}"]
+            record = {
+                "path": "/".join(path_parts),
+                "language": metrics["language"],
+                "cluster": int(cluster),
+                "label": predictor.cluster_mapping.get(int(cluster), "Unknown"),
+                "metrics": metrics,
+            }
+            f.write(json.dumps(record) + "\n")
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def heap_peak_mb(func, *args, **kwargs):
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=10000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        small, large = os.path.join(workdir, "small.ndjson"), os.path.join(workdir, "large.ndjson")
+        print(f"Generating {args.files} and {4 * args.files} records...")
+        write_records(small, args.files)
+        write_records(large, 4 * args.files, seed=1)
+        charts = os.path.join(workdir, "charts")
+        pdf, html = os.path.join(workdir, "report.pdf"), os.path.join(workdir, "report.html")
+
+        _, cold = timed(reports.build_report, small, pdf, chart_cache=charts)
+        _, warm = timed(reports.build_report, small, pdf, chart_cache=charts)
+        _, html_s = timed(reports.build_report, small, html, chart_cache=charts)
+        print(f"PDF, {args.files} files:   {cold:.2f} s cold charts, {warm:.2f} s cached ({os.path.getsize(pdf) / 2 ** 20:.1f} MB)")
+        print(f"HTML, {args.files} files:  {html_s:.2f} s ({os.path.getsize(html) / 2 ** 20:.1f} MB)")
+
+        for path, n in [(small, args.files), (large, 4 * args.files)]:
+            print(f"heap peak, {n} files: PDF {heap_peak_mb(reports.build_report, path, pdf, chart_cache=charts):.1f} MB, "
+                  f"HTML {heap_peak_mb(reports.build_report, path, html, chart_cache=charts):.1f} MB")
+
+        worker = reports.ReportWorker()
+        start = time.perf_counter()
+        job = worker.submit(small, os.path.join(workdir, "job.pdf"))
+        submit_ms = 1000 * (time.perf_counter() - start)
+        stalls = []
+        while not job.finished.is_set():
+            before = time.perf_counter()
+            time.sleep(0.01)
+            stalls.append(time.perf_counter() - before - 0.01)
+        worker.close()
+        print(f"worker: submit {submit_ms:.2f} ms, {job.status} in {job.seconds:.2f} s, "
+              f"main thread stalls p50 {1000 * np.median(stalls):.1f} ms / max {1000 * max(stalls):.1f} ms")
+        if job.status != "done":
+            raise SystemExit(f"report job failed: {job.error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Golden-output check and lines/sec benchmark for the extract() line scanner.
+
+    python -m bench.scanner            # check goldens, then benchmark
+    python -m bench.scanner --update   # rewrite bench/golden_metrics.json
+
+The goldens are the full extract() output for the sample files in data/;
+any change to the scanner must reproduce them exactly.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from extract import extract, scan_lines
+import languages
+
+GOLDEN_FILE = os.path.join(os.path.dirname(__file__), "golden_metrics.json")
+SAMPLES = ["data/good.py", "data/average.py", "data/bad.py"]
+
+
+def check_golden(update=False):
+    current = {path: extract(path) for path in SAMPLES}
+    if update:
+        with open(GOLDEN_FILE, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        print(f"Wrote {GOLDEN_FILE}")
+        return True
+
+    with open(GOLDEN_FILE, "r", encoding="utf-8") as f:
+        golden = json.load(f)
+    ok = True
+    for path, expected in golden.items():
+        for key, value in expected.items():
+            if current[path].get(key) != value:
+                print(f"MISMATCH {path} {key}: expected {value!r}, got {current[path].get(key)!r}")
+                ok = False
+    print("golden: ok" if ok else "golden: FAILED")
+    return ok
+
+
+def sample_lines(n_lines):
+    lines = []
+    for path in SAMPLES:
+        with open(path, "r", encoding="utf-8") as f:
+            lines.extend(f.readlines())
+    return [lines[i % len(lines)] for i in range(n_lines)]
+
+
+def benchmark(n_lines, repeat):
+    lines = sample_lines(n_lines)
+    for language in [languages.load("python"), languages.load("javascript")]:
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            scan_lines(lines, language)
+            best = min(best, time.perf_counter() - start)
+        print(f"{language.name:<10} {n_lines / best:12.0f} lines/sec")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--update", action="store_true")
+    parser.add_argument("--lines", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if not check_golden(update=args.update):
+        sys.exit(1)
+    benchmark(args.lines, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Reproducible benchmarks for the extraction, training and prediction hot paths.
+
+    python -m bench.suite run [--out bench/baseline.json] [--size 50] [--only extract]
+    python -m bench.suite compare bench/baseline.json new.json [--tolerance 0.2]
+
+`run` generates a seeded synthetic corpus (see bench/synthetic.py) and
+runs each benchmark in its own subprocess, so peak RSS is per benchmark
+and one benchmark's caches don't warm the next. It records throughput,
+latency percentiles and peak RSS per benchmark. `compare` diffs two
+result files and exits non-zero when a metric regresses by more than the
+tolerance.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from bench import synthetic
+
+BASELINE = os.path.join("bench", "baseline.json")
+PERCENTILES = [50, 90, 99]
+ROUNDS = 3
+# Lower is better for everything except throughput
+HIGHER_IS_BETTER = {"throughput"}
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KiB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def summarize(latencies, count, wall, unit):
+    latencies = np.asarray(latencies) * 1000
+    return {
+        "unit": unit,
+        "count": count,
+        "wall_s": round(wall, 4),
+        "throughput": round(count / wall, 2) if wall else 0.0,
+        **{f"p{p}_ms": round(float(np.percentile(latencies, p)), 4) for p in PERCENTILES},
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def timed_calls(func, args_list, rounds=ROUNDS, setup=None):
+    """
+    Time every call `rounds` times after one warm-up call. As with timeit,
+    the best round and each call's fastest run are kept, since slower runs
+    measure machine noise rather than the code. `setup` runs untimed
+    before each round.
+    """
+    func(*args_list[0])
+    best_wall = None
+    best = [float("inf")] * len(args_list)
+    for _ in range(rounds):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        for i, args in enumerate(args_list):
+            t0 = time.perf_counter()
+            func(*args)
+            best[i] = min(best[i], time.perf_counter() - t0)
+        wall = time.perf_counter() - start
+        best_wall = wall if best_wall is None else min(best_wall, wall)
+    return best, best_wall
+
+
+def clear_identifier_caches():
+    """Start each round cold, like one pass over a fresh corpus."""
+    from extract import identifier_quality, is_english_word, split_identifier
+    identifier_quality.cache_clear()
+    split_identifier.cache_clear()
+    is_english_word.cache_clear()
+
+
+def corpus(workdir, size):
+    return synthetic.write_corpus(os.path.join(workdir, "corpus"), size=size)
+
+
+def bench_extract(workdir, size):
+    from extract import extract, get_english_words
+    paths = corpus(workdir, size)
+    get_english_words()
+    lines = 0
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            lines += sum(1 for _ in f)
+    latencies, wall = timed_calls(extract, [(p,) for p in paths], setup=clear_identifier_caches)
+    result = summarize(latencies, len(paths), wall, "files/s")
+    result["lines_per_s"] = round(lines / wall, 2)
+    return result
+
+
+def bench_identifier_quality(workdir, size):
+    from extract import get_english_words, identifier_quality
+    names = synthetic.identifiers(size * 400)
+    get_english_words()
+    latencies, wall = timed_calls(identifier_quality, [(n,) for n in names], setup=clear_identifier_caches)
+    return summarize(latencies, len(names), wall, "identifiers/s")
+
+
+def metrics_csv(workdir, size, rows):
+    """A metrics table of `rows` rows, resampled with jitter from the corpus."""
+    import pandas as pd
+    from extract import extract
+    df = pd.DataFrame([extract(p) for p in corpus(workdir, size)])
+    rng = np.random.default_rng(0)
+    df = df.sample(rows, replace=True, random_state=0).reset_index(drop=True)
+    numeric = df.select_dtypes("number").columns.drop("has_docstring", errors="ignore")
+    df[numeric] = df[numeric] * rng.uniform(0.8, 1.2, size=(rows, len(numeric)))
+    path = os.path.join(workdir, "metrics.csv")
+    df.to_csv(path, index=False)
+    return path
+
+
+def bench_preprocess(workdir, size, repeats=5):
+    from preprocess import preprocess_dataset
+    rows = size * 400
+    path = metrics_csv(workdir, size, rows)
+    latencies, wall = timed_calls(preprocess_dataset, [(path,)] * repeats)
+    return summarize(latencies, rows * repeats, wall, "rows/s")
+
+
+def bench_reduce_dimensions(workdir, size, repeats=5):
+    from preprocess import preprocess_dataset, reduce_dimensions
+    rows = size * 4000
+    _, X, _ = preprocess_dataset(metrics_csv(workdir, size, rows))
+    latencies, wall = timed_calls(reduce_dimensions, [(X,)] * repeats)
+    return summarize(latencies, rows * repeats, wall, "rows/s")
+
+
+def bench_predict(workdir, size):
+    from predict import get_predictor, predict_code_quality
+    paths = corpus(workdir, size)
+    start = time.perf_counter()
+    get_predictor()
+    cold_start = time.perf_counter() - start
+    latencies, wall = timed_calls(predict_code_quality, [(p,) for p in paths])
+    result = summarize(latencies, len(paths), wall, "files/s")
+    result["cold_start_ms"] = round(cold_start * 1000, 2)
+    return result
+
+
+BENCHMARKS = {
+    "extract": bench_extract,
+    "identifier_quality": bench_identifier_quality,
+    "preprocess_dataset": bench_preprocess,
+    "reduce_dimensions": bench_reduce_dimensions,
+    "predict_code_quality": bench_predict,
+}
+
+
+def run_one(name, size):
+    with tempfile.TemporaryDirectory() as workdir:
+        return BENCHMARKS[name](workdir, size)
+
+
+def environment():
+    import lizard
+    import sklearn
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "scikit-learn": sklearn.__version__,
+        "lizard": lizard.version,
+    }
+
+
+def run(names, size):
+    results = {}
+    for name in names:
+        print(f"{name}...", end=" ", flush=True)
+        proc = subprocess.run(
+            [sys.executable, "-m", "bench.suite", "_one", name, "--size", str(size)],
+            capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            print("failed")
+            print(proc.stderr, file=sys.stderr)
+            continue
+        # The last stdout line is the result; anything before it is the code's own output
+        results[name] = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"{results[name]['throughput']} {results[name]['unit']}")
+    return {"size": size, "environment": environment(), "benchmarks": results}
+
+
+def compare(old, new, tolerance):
+    """Print a table of changes; returns the list of regressed (benchmark, metric) pairs."""
+    regressions = []
+    print(f"{'benchmark':22} {'metric':14} {'old':>12} {'new':>12} {'change':>8}")
+    for name, new_result in new["benchmarks"].items():
+        old_result = old["benchmarks"].get(name)
+        if old_result is None:
+            print(f"{name:22} (new)")
+            continue
+        for metric in ["throughput", "p50_ms", "p99_ms", "peak_rss_mb"]:
+            before, after = old_result.get(metric), new_result.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            flag = "  REGRESSION" if worse > tolerance else ""
+            if flag:
+                regressions.append((name, metric))
+            print(f"{name:22} {metric:14} {before:12.4f} {after:12.4f} {change:+8.1%}{flag}")
+    if old.get("environment") != new.get("environment"):
+        print("note: results come from different environments")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="run the suite and write a results file")
+    run_parser.add_argument("--out", default=BASELINE)
+    run_parser.add_argument("--size", type=int, default=50, help="scale of the synthetic corpus")
+    run_parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS))
+
+    compare_parser = sub.add_parser("compare", help="diff two results files")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--tolerance", type=float, default=0.2)
+
+    one_parser = sub.add_parser("_one")
+    one_parser.add_argument("name", choices=list(BENCHMARKS))
+    one_parser.add_argument("--size", type=int, default=50)
+
+    args = parser.parse_args()
+    if args.command == "_one":
+        print(json.dumps(run_one(args.name, args.size)))
+    elif args.command == "run":
+        results = run(args.only, args.size)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.out}")
+    else:
+        with open(args.old, encoding="utf-8") as f:
+            old = json.load(f)
+        with open(args.new, encoding="utf-8") as f:
+            new = json.load(f)
+        regressions = compare(old, new, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) over {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Synthetic Python and JavaScript sources of controlled size and shape.
+
+Everything is driven by a seeded random.Random, so the same arguments
+always give byte-identical files and benchmark runs stay comparable.
+
+Shapes:
+    typical           a mix of small functions, loops, conditionals, comments
+    many_functions    hundreds of short functions
+    deep_nesting      loops/conditionals nested `size` levels deep
+    long_lines        few statements, each several hundred characters wide
+    huge_identifiers  long compound names and very long identifier lists
+"""
+import os
+import random
+
+SHAPES = ["typical", "many_functions", "deep_nesting", "long_lines", "huge_identifiers"]
+LANGUAGES = {"Python": ".py", "JavaScript": ".js"}
+
+# Real words hit the dictionary, the made-up ones miss it
+WORDS = [
+    "user", "account", "total", "count", "index", "value", "result", "buffer",
+    "parse", "render", "load", "save", "update", "request", "response", "cache",
+    "item", "list", "table", "score", "config", "handler", "event", "stream",
+    "qzx", "tmpv", "fooz", "blarg", "xqw", "zzk",
+]
+
+
+def identifier(rng, parts=2, style="snake"):
+    words = [rng.choice(WORDS) for _ in range(parts)]
+    if style == "camel":
+        return words[0] + "".join(w.title() for w in words[1:])
+    return "_".join(words)
+
+
+def identifiers(n, seed=0, max_parts=6):
+    """`n` identifiers of mixed length and casing."""
+    rng = random.Random(seed)
+    return [
+        identifier(rng, rng.randint(1, max_parts), rng.choice(["snake", "camel"]))
+        for _ in range(n)
+    ]
+
+
+def py_function(rng, name, body_lines=4):
+    lines = [f"def {name}({identifier(rng, 1)}, {identifier(rng, 1)}=None):",
+             f'    """{identifier(rng, 3).replace("_", " ").capitalize()}."""']
+    for _ in range(body_lines):
+        kind = rng.random()
+        var = identifier(rng)
+        if kind < 0.25:
+            lines += [f"    for {var} in range({rng.randint(1, 100)}):", f"        total += {var}"]
+        elif kind < 0.5:
+            lines += [f"    if {var} > {rng.randint(0, 50)}:", f"        return {var}", "    else:", "        pass"]
+        elif kind < 0.6:
+            lines += ["    try:", f"        {var} = int({var})", "    except ValueError:", "        raise"]
+        elif kind < 0.7:
+            lines.append(f"    # {identifier(rng, 4).replace('_', ' ')}")
+        else:
+            lines.append(f"    {var} = {identifier(rng)} + {rng.randint(0, 999)}")
+    lines.append("    return None")
+    return lines
+
+
+def js_function(rng, name, body_lines=4):
+    lines = [f"function {name}({identifier(rng, 1, 'camel')}, {identifier(rng, 1, 'camel')}) {{",
+             f"  // {identifier(rng, 3).replace('_', ' ')}"]
+    for _ in range(body_lines):
+        kind = rng.random()
+        var = identifier(rng, 2, "camel")
+        if kind < 0.25:
+            lines += [f"  for (let {var} = 0; {var} < {rng.randint(1, 100)}; {var}++) {{", f"    total += {var};", "  }"]
+        elif kind < 0.5:
+            lines += [f"  if ({var} > {rng.randint(0, 50)}) {{", f"    return {var};", "  } else {", "    total--;", "  }"]
+        elif kind < 0.6:
+            lines += ["  try {", f"    {var} = JSON.parse({var});", "  } catch (e) {", "    throw e;", "  }"]
+        else:
+            lines.append(f"  const {var} = {identifier(rng, 2, 'camel')} + {rng.randint(0, 999)};")
+    lines += ["  return null;", "}"]
+    return lines
+
+
+def nested(rng, lang, depth):
+    lines = []
+    for level in range(depth):
+        var = identifier(rng, 1)
+        if lang == "Python":
+            pad = "    " * (level + 1)
+            lines.append(f"{pad}for {var} in range({level + 2}):" if level % 2 else f"{pad}if {var}:")
+        else:
+            pad = "  " * (level + 1)
+            lines.append(f"{pad}for (const {var} of items) {{" if level % 2 else f"{pad}if ({var}) {{")
+    pad = ("    " if lang == "Python" else "  ") * (depth + 1)
+    lines.append(f"{pad}total += 1" if lang == "Python" else f"{pad}total += 1;")
+    if lang == "JavaScript":
+        lines += ["  " * level + "}" for level in range(depth, 0, -1)]
+    return lines
+
+
+def generate(lang="Python", shape="typical", size=50, seed=0):
+    """
+    Source text for one file. `size` scales the shape: number of
+    functions, nesting depth, statements, or identifiers.
+    """
+    rng = random.Random(f"{lang}-{shape}-{size}-{seed}")
+    func = py_function if lang == "Python" else js_function
+    lines = ["import os", "import sys", ""] if lang == "Python" else ["const fs = require('fs');", ""]
+
+    if shape == "typical":
+        for _ in range(size):
+            lines += func(rng, identifier(rng, rng.randint(1, 3)), rng.randint(2, 8)) + [""]
+    elif shape == "many_functions":
+        for i in range(size * 5):
+            lines += func(rng, f"{identifier(rng)}_{i}", 1) + [""]
+    elif shape == "deep_nesting":
+        for _ in range(max(1, size // 10)):
+            header = f"def {identifier(rng)}(items):" if lang == "Python" else f"function {identifier(rng, 2, 'camel')}(items) {{"
+            lines += [header] + nested(rng, lang, size) + ([] if lang == "Python" else ["}"]) + [""]
+    elif shape == "long_lines":
+        for _ in range(size):
+            terms = " + ".join(identifier(rng) for _ in range(40))
+            lines.append(f"{identifier(rng)} = {terms}" + (";" if lang == "JavaScript" else ""))
+    elif shape == "huge_identifiers":
+        for _ in range(max(1, size // 5)):
+            name = identifier(rng, 12, rng.choice(["snake", "camel"]))
+            lines += func(rng, name, 2) + [""]
+        names = ", ".join(identifier(rng, 6) for _ in range(size * 20))
+        lines.append(f"__all__ = [{names}]" if lang == "Python" else f"module.exports = [{names}];")
+    else:
+        raise ValueError(f"unknown shape: {shape}")
+    return "\n".join(lines) + "\n"
+
+
+def write_corpus(folder, size=50, files_per_shape=4, seed=0, languages=LANGUAGES, shapes=SHAPES):
+    """Write one file per (language, shape, copy) into `folder`; returns the paths."""
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for lang, ext in languages.items():
+        for shape in shapes:
+            for i in range(files_per_shape):
+                path = os.path.join(folder, f"{shape}_{i}{ext}")
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(generate(lang, shape, size, seed + i))
+                paths.append(path)
+    return paths
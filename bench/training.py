@@ -0,0 +1,111 @@
+"""
+Streaming training (train.py) against the in-memory fit from unsupervised.ipynb.
+
+    python -m bench.training [--rows 500000] [--chunk-size 10000]
+
+Builds a synthetic metrics file of --rows rows (see bench/suite.py), fits
+both ways in separate processes and reports wall time, peak RSS, KMeans
+inertia on the full data and how often the two models give the same label.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+import joblib
+import numpy as np
+
+from bench.suite import metrics_csv, peak_rss_mb
+
+warnings.filterwarnings("ignore")
+
+
+def full_fit(csv_path, out_dir):
+    """The notebook's steps: everything in memory, KMeans on the PCA projection."""
+    from sklearn.cluster import KMeans
+    from preprocess import preprocess_dataset, reduce_dimensions
+    df, X_scaled, scaler = preprocess_dataset(csv_path)
+    X_reduced, pca = reduce_dimensions(X_scaled, n_components=10)
+    kmeans = KMeans(n_clusters=3, random_state=42)
+    labels = kmeans.fit_predict(X_reduced)
+    stats = df.assign(cluster=labels).groupby("cluster")["cyclomatic_complexity"].mean()
+    order = stats.sort_values().index.tolist()
+    mapping = {order[0]: "Bad", order[1]: "Average", order[2]: "Good"}
+    os.makedirs(out_dir, exist_ok=True)
+    for name, obj in [("scaler", scaler), ("pca", pca), ("kmeans", kmeans), ("cluster_mapping", mapping)]:
+        joblib.dump(obj, os.path.join(out_dir, f"{name}.pkl"))
+    return out_dir
+
+
+def stream_fit(csv_path, out_dir, chunk_size):
+    import train
+    return train.fit(csv_path, models_dir=out_dir, chunk_size=chunk_size)
+
+
+def run_fit(kind, csv_path, out_dir, chunk_size):
+    proc = subprocess.run(
+        [sys.executable, "-m", "bench.training", "_fit", kind, csv_path, out_dir, "--chunk-size", str(chunk_size)],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def evaluate(predictor, csv_path, columns, chunk_size):
+    """(inertia, labels) of one model over the whole file, chunk by chunk."""
+    from metrics_store import iter_feature_chunks
+    inertia = 0.0
+    labels = []
+    for X in iter_feature_chunks(csv_path, columns, chunk_size):
+        P = predictor.project(X)
+        distances = ((P[:, np.newaxis, :] - predictor.centers[np.newaxis]) ** 2).sum(axis=2)
+        inertia += distances.min(axis=1).sum()
+        labels.extend(predictor.cluster_mapping[int(c)] for c in predictor.predict_matrix(X))
+    return inertia, np.array(labels)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--size", type=int, default=20, help="scale of the synthetic corpus the rows are drawn from")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    args, rest = parser.parse_known_args()
+
+    if rest[:1] == ["_fit"]:
+        kind, csv_path, out_dir = rest[1:4]
+        start = time.perf_counter()
+        if kind == "full":
+            full_fit(csv_path, out_dir)
+        else:
+            out_dir = stream_fit(csv_path, out_dir, args.chunk_size)
+        print(json.dumps({"wall_s": round(time.perf_counter() - start, 2), "peak_rss_mb": round(peak_rss_mb(), 1),
+                          "model_dir": out_dir}))
+        return
+
+    from predict import QualityPredictor
+    with tempfile.TemporaryDirectory() as workdir:
+        print(f"Generating {args.rows} rows...")
+        csv_path = metrics_csv(workdir, args.size, args.rows)
+        print(f"metrics file: {os.path.getsize(csv_path) / 1e6:.0f} MB")
+
+        results = {
+            "full": run_fit("full", csv_path, os.path.join(workdir, "full"), args.chunk_size),
+            "streaming": run_fit("stream", csv_path, os.path.join(workdir, "models"), args.chunk_size),
+        }
+        labels = {}
+        for kind, result in results.items():
+            predictor = QualityPredictor(result["model_dir"], csv_path)
+            columns = QualityPredictor(results["streaming"]["model_dir"], csv_path).feature_columns
+            result["inertia"], labels[kind] = evaluate(predictor, csv_path, columns, args.chunk_size)
+
+    print(f"{'':10} {'wall s':>8} {'peak RSS MB':>12} {'inertia':>14}")
+    for kind, result in results.items():
+        print(f"{kind:10} {result['wall_s']:8.2f} {result['peak_rss_mb']:12.1f} {result['inertia']:14.1f}")
+    print(f"label agreement: {np.mean(labels['full'] == labels['streaming']):.1%}")
+
+
+if __name__ == "__main__":
+    main()
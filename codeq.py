@@ -0,0 +1,278 @@
+"""
+Score source files from the command line, streaming one JSON object per
+line as each file finishes.
+
+    python codeq.py [PATH ...]                 # files and directory trees (default: .)
+    python codeq.py --changed-since main       # files changed since a git revision
+    python codeq.py --staged --fail-on Bad     # pre-commit: staged files only
+
+Directories are walked with .gitignore applied: inside a git work tree
+`git ls-files` does the filtering, elsewhere the .gitignore files along
+the way are read directly. Only extensions with a language pack are
+scored (narrow it with --ext). --staged scores the content in the index,
+which is what will be committed, not the work tree copy. Each output
+line is
+
+    {"path": ..., "language": ..., "cluster": ..., "label": ..., "metrics": {...}}
+
+or {"path": ..., "error": ...} for a file that could not be scored.
+Unchanged files come from the shared metrics cache; the rest are
+extracted and predicted across a pool of warm workers, in completion
+order. With only a handful of files (the usual pre-commit case) they are
+scored in-process, since starting workers would cost more than it saves.
+
+The models, word list and cache are found relative to this script, so it
+can be run from any directory, e.g. as a pre-commit hook:
+
+    python /path/to/codeq.py --staged --fail-on Bad > /dev/null
+"""
+import argparse
+import fnmatch
+import functools
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import languages
+from metrics_cache import CACHE_DB, MetricsCache, file_hash
+from predict import MODEL_DIR, extract_item, get_predictor
+from workers import WorkerPool
+
+HOME = os.path.dirname(os.path.abspath(__file__))
+TIMEOUT = 10  # seconds per file
+# Below this many files to extract, workers cost more than they save
+PARALLEL_THRESHOLD = 16
+
+
+def git(args, cwd, text=True):
+    """stdout of a git command run in `cwd` (bytes unless `text`), or None if it fails (not a repo, no git)."""
+    if shutil.which("git") is None:
+        return None
+    result = subprocess.run(["git", "-C", cwd, *args], capture_output=True)
+    if result.returncode != 0:
+        return None
+    return result.stdout.decode("utf-8", errors="surrogateescape") if text else result.stdout
+
+
+def git_paths(output, base):
+    """Existing files from NUL-separated git output, joined onto `base`."""
+    paths = (os.path.join(base, p) for p in output.split("\0") if p)
+    # ls-files still lists tracked files deleted from the work tree
+    return [os.path.normpath(p) for p in paths if os.path.isfile(p)]
+
+
+def read_gitignore(directory):
+    """(pattern, negated, directories only, anchored) rules of one .gitignore."""
+    rules = []
+    try:
+        with open(os.path.join(directory, ".gitignore"), "r", encoding="utf-8", errors="ignore") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return rules
+    for line in lines:
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negated = line.startswith("!")
+        if negated:
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        # A slash anywhere but the end ties the pattern to this directory
+        anchored = "/" in line
+        rules.append((line.lstrip("/"), negated, dir_only, anchored))
+    return rules
+
+
+def is_ignored(path, is_dir, ignores):
+    """Whether `path` is ignored by the (directory, rules) list; later rules win."""
+    ignored = False
+    name = os.path.basename(path)
+    for directory, rules in ignores:
+        relative = os.path.relpath(path, directory).replace(os.sep, "/")
+        for pattern, negated, dir_only, anchored in rules:
+            if dir_only and not is_dir:
+                continue
+            if fnmatch.fnmatchcase(relative if anchored else name, pattern):
+                ignored = not negated
+    return ignored
+
+
+def walk(root):
+    """Files under `root` outside git: os.walk, pruned by every .gitignore on the way."""
+    ignores = {}
+    for directory, dirs, files in os.walk(root):
+        parent = ignores.get(os.path.dirname(directory), [])
+        rules = read_gitignore(directory)
+        scoped = ignores[directory] = parent + [(directory, rules)] if rules else parent
+        dirs[:] = sorted(
+            d for d in dirs
+            if d != ".git" and not is_ignored(os.path.join(directory, d), True, scoped)
+        )
+        for f in sorted(files):
+            path = os.path.join(directory, f)
+            if not is_ignored(path, False, scoped):
+                yield os.path.normpath(path)
+
+
+def list_tree(path):
+    """Every non-ignored file under a directory (or the file itself)."""
+    if os.path.isfile(path):
+        return [os.path.normpath(path)]
+    # -co: tracked plus untracked-but-not-ignored files
+    output = git(["ls-files", "-z", "-co", "--exclude-standard"], path)
+    if output is not None:
+        return git_paths(output, path)
+    return list(walk(path))
+
+
+def changed_files(since=None, staged=False, cwd="."):
+    """Files added or modified since a revision (or range), or staged for commit."""
+    top = git(["rev-parse", "--show-toplevel"], cwd)
+    if top is None:
+        raise SystemExit(f"{os.path.abspath(cwd)} is not in a git work tree")
+    args = ["diff", "--name-only", "-z", "--diff-filter=d"]
+    if staged:
+        args.append("--cached")
+    if since:
+        args.append(since)
+    output = git(args + ["--"], cwd)
+    if output is None:
+        raise SystemExit(f"git diff {since or ''} failed")
+    return [os.path.relpath(p, cwd) for p in git_paths(output, top.strip())]
+
+
+def staged_content(path):
+    """Bytes of `path` as staged in the index, or None if it has no staged copy."""
+    directory, name = os.path.split(os.path.abspath(path))
+    return git(["cat-file", "blob", f":./{name}"], directory, text=False)
+
+
+def select(paths, extensions):
+    """Scoreable paths, each once, grouped by language."""
+    paths = [p for p in dict.fromkeys(paths) if os.path.splitext(p)[1].lower() in extensions]
+    return [paths[i] for i in languages.group_by_language(paths)]
+
+
+def score_file(predictor, item):
+    """(metrics, cluster, label) for a path or (path, source), None if extraction fails."""
+    metrics = extract_item(item)
+    if metrics is None:
+        return None
+    cluster, label = predictor.predict_metrics(metrics)
+    return metrics, cluster, label
+
+
+def record(path, result):
+    if result is None:
+        return {"path": path, "error": "extraction failed or timed out"}
+    metrics, cluster, label = result
+    return {"path": path, "language": metrics["language"], "cluster": cluster, "label": label, "metrics": metrics}
+
+
+def score(paths, predictor, cache=None, processes=None, timeout=TIMEOUT, staged=False):
+    """
+    Yield an output record per path as soon as it is scored: cache hits
+    first, then extracted files in completion order. With `staged`, each
+    file's index content is scored instead of the work tree copy.
+    """
+    hashes = {}
+    todo = []
+    for path in paths:
+        if staged:
+            content = staged_content(path)
+            if content is None:
+                yield {"path": path, "error": "not staged"}
+                continue
+            # Same value as file_hash(), so the cache is shared
+            hashes[path] = hashlib.md5(content).hexdigest()
+            item = (path, content.decode("utf-8", errors="ignore"))
+        else:
+            try:
+                hashes[path] = file_hash(path)
+            except OSError as e:
+                yield {"path": path, "error": str(e)}
+                continue
+            item = path
+        metrics = cache.get(hashes[path], path) if cache else None
+        if metrics:
+            cluster, label = predictor.predict_metrics(metrics)
+            yield record(path, (metrics, cluster, label))
+        else:
+            todo.append(item)
+
+    func = functools.partial(score_file, predictor)
+    if processes is None:
+        processes = 1 if len(todo) < PARALLEL_THRESHOLD else os.cpu_count() or 1
+    if processes <= 1 or not todo:
+        results = ((item, func(item)) for item in todo)
+        pool = None
+    else:
+        # Forked after the predictor is loaded, so workers start ready
+        pool = WorkerPool(func, processes=min(processes, len(todo)), timeout=timeout)
+        results = pool.imap_unordered(todo)
+    try:
+        for item, result in results:
+            path = item[0] if isinstance(item, tuple) else item
+            if result is not None and cache:
+                cache.put(hashes[path], result[0])
+            yield record(path, result)
+    finally:
+        if pool is not None:
+            pool.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream code quality predictions as NDJSON.")
+    parser.add_argument("paths", nargs="*", help="files or directories (default: .), or limits for --changed-since/--staged")
+    parser.add_argument("--changed-since", metavar="REV", help="only files changed since a git revision or A..B range")
+    parser.add_argument("--staged", action="store_true", help="only files staged for commit")
+    parser.add_argument("--ext", action="append", help="extension to score (repeatable); default: every language pack")
+    parser.add_argument("-j", "--workers", type=int, help="worker processes (default: CPUs, 1 for small inputs)")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT, help="seconds per file before its worker is replaced")
+    parser.add_argument("--model-dir", help=f"trained model directory (default: {MODEL_DIR}/ next to this script)")
+    parser.add_argument("--no-cache", action="store_true", help="always re-extract")
+    parser.add_argument("--fail-on", metavar="LABEL", action="append", help="exit 1 if any file gets this label (repeatable)")
+    args = parser.parse_args(argv)
+
+    if args.changed_since or args.staged:
+        paths = changed_files(args.changed_since, args.staged)
+        if args.paths:
+            roots = [os.path.normpath(p) for p in args.paths]
+            paths = [p for p in paths if any(p == r or p.startswith(r + os.sep) for r in roots)]
+    else:
+        paths = [p for root in args.paths or ["."] for p in list_tree(root)]
+    extensions = {e if e.startswith(".") else "." + e for e in args.ext} if args.ext else set(languages.extensions())
+    paths = select(paths, extensions)
+
+    # Paths are reported as given; data/ and the cache live next to this script
+    absolute = {os.path.abspath(p): p for p in paths}
+    model_dir = os.path.abspath(args.model_dir) if args.model_dir else MODEL_DIR
+    os.chdir(HOME)
+    predictor = get_predictor(model_dir)
+    fail_on = {label.lower() for label in args.fail_on or ()}
+    failed = 0
+    cache = None if args.no_cache else MetricsCache(CACHE_DB)
+    try:
+        for result in score(list(absolute), predictor, cache, args.workers, args.timeout, args.staged):
+            result["path"] = absolute[result["path"]]
+            sys.stdout.write(json.dumps(result) + "\n")
+            sys.stdout.flush()
+            if result.get("label", "").lower() in fail_on:
+                failed += 1
+    except BrokenPipeError:
+        # The reader stopped early (`| head`); keep Python's exit flush quiet
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    finally:
+        if cache:
+            cache.close()
+    if failed:
+        print(f"{failed} file(s) labelled {', '.join(args.fail_on)}", file=sys.stderr)
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Near-duplicate index for collected code files.
+
+    python dedup.py datasets            # index and report duplicates
+    python dedup.py datasets --remove   # also delete them
+
+Files are reduced to MinHash signatures over shingles of normalized
+tokens, so whitespace, formatting and small edits don't hide a copy.
+Candidates are found with LSH banding, and each candidate is confirmed by
+signature agreement.
+"""
+import argparse
+import csv
+import hashlib
+import os
+import re
+import zlib
+
+import numpy as np
+
+INDEX_DIR = os.path.join("datasets", "dedup_index")
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+THRESHOLD = 0.8  # estimated Jaccard similarity that counts as a duplicate
+
+TOKEN_PATTERN = re.compile(r'\w+|[^\w\s]')
+
+# Fixed seed: signatures are persisted, so they must be identical across runs
+_rng = np.random.default_rng(20240205)
+PERM_A = _rng.integers(0, 2 ** 32, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+PERM_B = _rng.integers(0, 2 ** 32, NUM_PERM, dtype=np.uint64)
+BAND_COEF = _rng.integers(0, 2 ** 63, ROWS, dtype=np.uint64) | np.uint64(1)
+MASK32 = np.uint64(0xFFFFFFFF)
+
+
+def content_hash(content):
+    """Same exact-content hash fetch.py records in metadata.csv."""
+    return hashlib.md5(content.encode()).hexdigest()
+
+
+def minhash(content):
+    """MinHash signature (NUM_PERM uint32) of the file's token shingles."""
+    tokens = TOKEN_PATTERN.findall(content)
+    if len(tokens) <= SHINGLE_SIZE:
+        shingles = {" ".join(tokens)}
+    else:
+        shingles = {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+    hashes = np.fromiter((zlib.crc32(s.encode()) for s in shingles), dtype=np.uint64, count=len(shingles))
+    # (a * x + b) mod 2**32 with odd a is a permutation of 32-bit values
+    permuted = (PERM_A[:, np.newaxis] * hashes[np.newaxis, :] + PERM_B[:, np.newaxis]) & MASK32
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+def band_keys(signatures):
+    """One uint64 key per LSH band for each signature row."""
+    bands = np.asarray(signatures, dtype=np.uint64).reshape(-1, BANDS, ROWS)
+    return (bands * BAND_COEF).sum(axis=2)
+
+
+class DedupIndex:
+    """
+    Persistent MinHash/LSH index keyed by content hash.
+
+    On disk it is a directory of .npy arrays (content hashes, signatures and
+    per-band sorted keys) opened with mmap, so loading costs nothing and
+    lookups are a binary search per band. Entries added since the last
+    save() live in an in-memory overlay.
+    """
+
+    def __init__(self, path=INDEX_DIR):
+        self.path = path
+        self.load()
+
+    def load(self):
+        path = self.path
+        if os.path.exists(os.path.join(path, "hashes.npy")):
+            load = lambda name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            self.hashes = load("hashes")
+            self.signatures = load("signatures")
+            self.sorted_hashes = load("sorted_hashes")
+            self.band_order = load("band_order")
+            self.band_sorted = load("band_sorted")
+            self.cleared = False
+        else:
+            self.clear()
+            return
+        self.new_hashes = []
+        self.new_signatures = []
+        self.new_exact = set()
+        self.new_buckets = {}
+
+    def clear(self):
+        """Forget every entry; the files on disk are replaced by the next save()."""
+        self.hashes = np.empty(0, dtype="S32")
+        self.signatures = np.empty((0, NUM_PERM), dtype=np.uint32)
+        self.sorted_hashes = np.empty(0, dtype="S32")
+        self.band_order = np.empty((BANDS, 0), dtype=np.int64)
+        self.band_sorted = np.empty((BANDS, 0), dtype=np.uint64)
+        self.new_hashes = []
+        self.new_signatures = []
+        self.new_exact = set()
+        self.new_buckets = {}
+        self.cleared = True
+
+    def __len__(self):
+        return len(self.hashes) + len(self.new_hashes)
+
+    @property
+    def pending(self):
+        """Entries not yet saved to disk."""
+        return len(self.new_hashes)
+
+    def contains_exact(self, digest):
+        if digest in self.new_exact:
+            return True
+        key = digest.encode()
+        i = np.searchsorted(self.sorted_hashes, key)
+        return i < len(self.sorted_hashes) and self.sorted_hashes[i] == key
+
+    def candidates(self, signature):
+        keys = band_keys(signature)[0]
+        found = set()
+        for band, key in enumerate(keys):
+            column = self.band_sorted[band]
+            lo = np.searchsorted(column, key, side="left")
+            hi = np.searchsorted(column, key, side="right")
+            found.update(int(i) for i in self.band_order[band, lo:hi])
+            found.update(self.new_buckets.get((band, int(key)), ()))
+        return found
+
+    def signature_at(self, i):
+        if i < len(self.signatures):
+            return self.signatures[i]
+        return self.new_signatures[i - len(self.signatures)]
+
+    def hash_at(self, i):
+        if i < len(self.hashes):
+            return self.hashes[i].decode()
+        return self.new_hashes[i - len(self.hashes)]
+
+    def find_duplicate(self, content, signature=None, digest=None):
+        """Content hash of an indexed exact or near duplicate, else None."""
+        digest = digest or content_hash(content)
+        if self.contains_exact(digest):
+            return digest
+        signature = minhash(content) if signature is None else signature
+        best, best_similarity = None, THRESHOLD
+        for i in self.candidates(signature):
+            similarity = float(np.mean(self.signature_at(i) == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = self.hash_at(i), similarity
+        return best
+
+    def add(self, digest, signature):
+        i = len(self)
+        self.new_hashes.append(digest)
+        self.new_signatures.append(signature)
+        self.new_exact.add(digest)
+        for band, key in enumerate(band_keys(signature)[0]):
+            self.new_buckets.setdefault((band, int(key)), []).append(i)
+
+    def check_and_add(self, content):
+        """Add `content` unless it duplicates an indexed file; returns the duplicate's hash or None."""
+        digest = content_hash(content)
+        signature = minhash(content)
+        duplicate = self.find_duplicate(content, signature, digest)
+        if duplicate is None:
+            self.add(digest, signature)
+        return duplicate
+
+    def save(self):
+        """Merge the overlay into the on-disk arrays (written atomically per file)."""
+        if not self.new_hashes and not self.cleared:
+            return
+        hashes = np.concatenate([self.hashes, np.array(self.new_hashes, dtype="S32")])
+        signatures = np.concatenate([self.signatures, np.array(self.new_signatures, dtype=np.uint32)])
+        keys = band_keys(signatures).T
+        band_order = np.argsort(keys, axis=1, kind="stable")
+        arrays = {
+            "hashes": hashes,
+            "signatures": signatures,
+            "sorted_hashes": np.sort(hashes),
+            "band_order": band_order,
+            "band_sorted": np.take_along_axis(keys, band_order, axis=1),
+        }
+        os.makedirs(self.path, exist_ok=True)
+        for name, array in arrays.items():
+            tmp = os.path.join(self.path, f"{name}.tmp.npy")
+            np.save(tmp, array)
+            os.replace(tmp, os.path.join(self.path, f"{name}.npy"))
+        self.cleared = False
+        self.load()
+
+
+def dedup_folder(folder, index_path=None, remove=False):
+    """
+    Index every file in `folder` (in sorted order, so the first copy wins)
+    and return [(duplicate_file, original_file)].
+
+    The index is rebuilt from the folder rather than added to: the files
+    already in a saved index would otherwise match themselves as exact
+    duplicates, and --remove would delete them.
+    """
+    index = DedupIndex(index_path or os.path.join(folder, "dedup_index"))
+    index.clear()
+    originals = {}
+    duplicates = []
+    for name in sorted(os.listdir(folder)):
+        path = os.path.join(folder, name)
+        if not os.path.isfile(path) or name.endswith((".csv", ".json")):
+            continue
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            content = f.read()
+        digest = content_hash(content)
+        duplicate = index.check_and_add(content)
+        if duplicate is None:
+            originals[digest] = name
+            continue
+        original = originals.get(duplicate)
+        if original is None or original == name:
+            continue  # only ever remove a copy of a file kept in this pass
+        duplicates.append((name, original))
+        if remove:
+            os.remove(path)
+    index.save()
+    return duplicates
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("folder", nargs="?", default="datasets")
+    parser.add_argument("--remove", action="store_true", help="delete duplicate files")
+    parser.add_argument("--report", default="duplicates.csv")
+    args = parser.parse_args()
+
+    duplicates = dedup_folder(args.folder, remove=args.remove)
+    with open(args.report, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["duplicate_file", "original_file"])
+        writer.writerows(duplicates)
+    action = "Removed" if args.remove else "Found"
+    print(f"{action} {len(duplicates)} duplicates. See {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,29 @@
 import os
+import time
+import instrument
+import languages
 import pandas as pd
 from extract import extract  # your extract function
+from metrics_cache import MetricsCache, file_hash
+from metrics_store import MetricsWriter
 from tqdm import tqdm
-from multiprocessing import Pool, TimeoutError as MP_TimeoutError
+from workers import WorkerPool
 
 FOLDER = "datasets"
 OUTPUT_CSV = "metrics.csv"
 SKIPPED_CSV = "skipped_files.csv"
+CACHE_DB = "metrics_cache.db"
 TIMEOUT = 10  # seconds per file
+PROCESSES = os.cpu_count() or 1
 
-# Collect all files except CSV
-filepaths = [
-    os.path.join(FOLDER, f)
-    for f in os.listdir(FOLDER)
-    if not f.endswith(".csv")
-]
+
+def list_files(folder=FOLDER):
+    """Collect all code files (skipping metadata, fetch progress and the dedup index)."""
+    return [
+        os.path.join(folder, f)
+        for f in os.listdir(folder)
+        if not f.endswith((".csv", ".json")) and os.path.isfile(os.path.join(folder, f))
+    ]
 
 def safe_extract(filepath):
     """Extract metrics with exception handling."""
@@ -23,36 +32,53 @@ def safe_extract(filepath):
     except Exception:
         return None
 
-def process_file(args):
-    """Wrapper for multiprocessing with timeout."""
-    filepath = args
-    with Pool(processes=1) as pool:
-        async_result = pool.apply_async(safe_extract, (filepath,))
-        try:
-            result = async_result.get(timeout=TIMEOUT)
-            if result:
-                return result, None
-            else:
-                return None, filepath
-        except MP_TimeoutError:
-            return None, filepath
-
-def main():
-    data = []
+def main(output=OUTPUT_CSV, resume=False):
     skipped = []
+    filepaths = list_files()
+
+    print(f"Found {len(filepaths)} files.")
 
-    print(f"Found {len(filepaths)} files. Processing...")
+    # Rows go to disk in batches as they arrive; with resume=True files
+    # already present in the output from an interrupted run are skipped.
+    with MetricsWriter(output, resume=resume) as writer, MetricsCache(CACHE_DB) as cache:
+        if writer.done:
+            filepaths = [p for p in filepaths if os.path.basename(p) not in writer.done]
+            print(f"Resuming: {len(writer.done)} files already in {output}.")
 
-    for result, skipped_file in tqdm(map(process_file, filepaths), total=len(filepaths), desc="Extracting metrics"):
-        if result:
-            data.append(result)
-        elif skipped_file:
-            skipped.append(skipped_file)
+        # Unchanged files (same content hash and extractor version) are
+        # served from the cache; only new or modified ones are analyzed.
+        hashes = {}
+        todo = []
+        for filepath in filepaths:
+            try:
+                hashes[filepath] = file_hash(filepath)
+            except OSError:
+                skipped.append(filepath)
+                continue
+            cached = cache.get(hashes[filepath], filepath)
+            if cached:
+                writer.write(cached)
+            else:
+                todo.append(filepath)
+        instrument.count("cache_hits", cache.hits)
+        instrument.count("cache_misses", len(todo))
+
+        print(f"{cache.hits} cached, {len(todo)} to extract with {PROCESSES} workers...")
+        # Same-language files back to back keep each worker on one language pack
+        todo = [todo[i] for i in languages.group_by_language(todo)]
 
-    # Save metrics
-    df = pd.DataFrame(data)
-    df.to_csv(OUTPUT_CSV, index=False)
-    print(f"✅ Metrics saved to {OUTPUT_CSV}")
+        # Workers stay warm across files; a file that hangs past TIMEOUT only
+        # restarts the worker that was handling it.
+        with WorkerPool(safe_extract, processes=PROCESSES, timeout=TIMEOUT) as pool:
+            results = pool.imap_unordered(todo)
+            for filepath, result in tqdm(results, total=len(todo), desc="Extracting metrics"):
+                if result:
+                    writer.write(result)
+                    cache.put(hashes[filepath], result)
+                else:
+                    skipped.append(filepath)
+
+    print(f"✅ Metrics saved to {output}")
 
     # Save skipped files
     if skipped:
@@ -60,4 +86,19 @@ def main():
         print(f"⚠️ Skipped {len(skipped)} files. See {SKIPPED_CSV}")
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", default=OUTPUT_CSV, help="metrics.csv, or a *.parquet directory for typed output")
+    parser.add_argument("--resume", action="store_true", help="continue an interrupted export")
+    parser.add_argument("--stats", metavar="PATH", help="write per-stage timings and counters as JSON")
+    parser.add_argument("--profile", metavar="PATH", help="write a cProfile/pstats dump of the run")
+    args = parser.parse_args()
+
+    if args.stats:
+        instrument.enable()
+    start = time.perf_counter()
+    with instrument.profile(args.profile):
+        main(output=args.output, resume=args.resume)
+    if args.stats:
+        instrument.write_report(args.stats, wall_time=time.perf_counter() - start)
+        print(f"Stats written to {args.stats}")
@@ -1,91 +1,257 @@
+import functools
+import io
+import math
+import mmap
+import operator
 import os
 import re
-import lizard
 from collections import Counter
-from keywords import py_kw, js_kw
+import ast_engine
+import instrument
+import languages
 
-with open("data/words_alpha.txt", "r") as f:
-    english_words = set(line.strip().lower() for line in f)
+# Bump whenever a change here alters the metrics; cached results keyed on
+# the old version are discarded (see metrics_cache.py).
+EXTRACTOR_VERSION = "4"
 
+# "lines" (default) keeps the line-prefix heuristics and lizard the
+# shipped models were trained on; "ast" takes Python structure and
+# functions from ast_engine. Switch the default only together with a
+# re-export and retrain (train.py fit), or predictions drift.
+PYTHON_ENGINE = os.environ.get("CODEQ_PYTHON_ENGINE", "lines")
+# What ast.parse() raises on source it cannot take
+PARSE_ERRORS = (SyntaxError, ValueError, RecursionError, MemoryError)
+
+WORDS_FILE = "data/words_alpha.txt"
+SORTED_WORDS_FILE = "data/words_sorted.txt"
+
+class WordList:
+    """
+    Read-only word lookup over a byte-sorted, newline-separated file.
+
+    The file is memory-mapped and searched by bisection, so nothing is
+    loaded up front and every process maps the same page-cache pages.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __contains__(self, word):
+        key = word.encode("utf-8")
+        data = self.data
+        lo, hi = 0, len(data)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = data.rfind(b"\n", 0, mid) + 1
+            end = data.find(b"\n", start)
+            if end == -1:
+                end = len(data)
+            current = data[start:end]
+            if current == key:
+                return True
+            if current < key:
+                lo = end + 1
+            else:
+                hi = start
+        return False
+
+def build_word_file(src=WORDS_FILE, dst=SORTED_WORDS_FILE):
+    """Write the sorted lookup file for `src` (atomically, so workers can race)."""
+    with open(src, "r") as f:
+        words = sorted(set(line.strip().lower().encode("utf-8") for line in f) - {b""})
+    tmp = f"{dst}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(b"\n".join(words))
+    os.replace(tmp, dst)
+
+_english_words = None
+
+def get_english_words():
+    """Load the dictionary on first use, rebuilding it if the word list changed."""
+    global _english_words
+    if _english_words is None:
+        if not os.path.exists(SORTED_WORDS_FILE) or os.path.getmtime(SORTED_WORDS_FILE) < os.path.getmtime(WORDS_FILE):
+            build_word_file()
+        _english_words = WordList(SORTED_WORDS_FILE)
+    return _english_words
+
+# Names like __init__, main or handleClick repeat across the whole corpus,
+# so split and score results are memoized per process.
+IDENTIFIER_CACHE_SIZE = 1 << 16
+CAMEL_PATTERN = re.compile(r'[A-Z]?[a-z]+|[A-Z]+(?=[A-Z]|$)')
+
+@functools.lru_cache(maxsize=IDENTIFIER_CACHE_SIZE)
 def split_identifier(identifier):
-    parts = identifier.split("_")
     final_parts = []
-    for part in parts:
-        split_camel = re.findall(r'[A-Z]?[a-z]+|[A-Z]+(?=[A-Z]|$)', part)
-        final_parts.extend([p.lower() for p in split_camel if p])
-    return final_parts
+    for part in identifier.split("_"):
+        final_parts.extend(p.lower() for p in CAMEL_PATTERN.findall(part) if p)
+    return tuple(final_parts)
+
+@functools.lru_cache(maxsize=IDENTIFIER_CACHE_SIZE)
+def is_english_word(word):
+    return word in get_english_words()
 
+@functools.lru_cache(maxsize=IDENTIFIER_CACHE_SIZE)
 def identifier_quality(identifier, max_length=30):
     tokens = split_identifier(identifier)
     if not tokens:
         return 0.0
-    valid_frac = sum(1 for t in tokens if t in english_words) / len(tokens)
+    valid_frac = sum(map(is_english_word, tokens)) / len(tokens)
     length_penalty = 1.0 if len(identifier) <= max_length else max_length / len(identifier)
     return valid_frac * length_penalty
 
-def extract(filepath):
-    analysis = lizard.analyze_file(filepath)
-    functions = analysis.function_list
-    avg_complexity = sum(f.cyclomatic_complexity for f in functions)/len(functions) if functions else 0
+def score_identifiers(counts):
+    """
+    Occurrence-weighted (score sum, count) of identifier_quality() over a
+    {identifier: occurrences} mapping. Each distinct name is scored once,
+    so the cost follows the file's vocabulary rather than its length.
+    """
+    scores = map(identifier_quality, counts)
+    # fsum: the same total whatever order the identifiers come in
+    return math.fsum(map(operator.mul, scores, counts.values())), sum(counts.values())
 
-    identifiers = [f.name for f in functions]
+def identifier_cache_stats():
+    """(hits, misses) of the identifier score cache in this process."""
+    info = identifier_quality.cache_info()
+    return info.hits, info.misses
 
+def extract(filepath):
     try:
-        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-            lines = f.readlines()
+        with open(filepath, 'rb') as f:
+            code = f.read().decode('utf-8', errors='ignore')
     except Exception as e:
         print(f"Error reading {filepath}: {e}")
-        lines = []
-
-    _, ext = os.path.splitext(filepath)
-    if ext == '.py':
-        lang = 'Python'
-        keywords = py_kw
-    elif ext == '.js':
-        lang = 'JavaScript'
-        keywords = js_kw
-    else:
-        lang = 'Unknown'
-        keywords = set()
-
-    code_lines = 0
+        code = ""
+
+    return extract_source(code, filepath)
+
+def extract_source(code, filename="snippet.py"):
+    """Extract metrics from source text without touching the filesystem.
+
+    `filename` is only used for language detection and the reported name.
+    """
+    # newline=None gives the same universal-newline split as open().readlines()
+    lines = io.StringIO(code, newline=None).readlines()
+    text = "".join(lines)
+    if text.startswith("\ufeff"):
+        text = text[1:]
+    instrument.count("files")
+    instrument.count("lines", len(lines))
+    language = languages.for_path(filename)
+    if instrument.enabled:
+        hits, misses = identifier_cache_stats()
+    scan, complexities, names = analyze_source(filename, language, lines, text)
+    with instrument.stage("identifiers"):
+        identifier_scores = [identifier_quality(name) for name in names]
+        all_identifiers = score_identifiers(scan["identifiers"])
+    if instrument.enabled:
+        new_hits, new_misses = identifier_cache_stats()
+        instrument.count("identifier_cache_hits", new_hits - hits)
+        instrument.count("identifier_cache_misses", new_misses - misses)
+    return build_metrics(filename, language.name, scan, complexities, identifier_scores, all_identifiers)
+
+def analyze_source(filename, language, lines, text, in_docstring=False, use_ast=None):
+    """
+    (scan, complexities, function names) for a file or a slice of one.
+
+    Python goes through ast_engine, with the line scanner only classifying
+    lines (docstrings come from the tree). Sources that do not parse, and
+    every other language, get lizard plus the line scanner's heuristics;
+    the scan's "engine" key says which one ran.
+    """
+    if use_ast is None:
+        use_ast = PYTHON_ENGINE == "ast"
+    if use_ast and language.name == "Python":
+        try:
+            with instrument.stage("ast"):
+                structure = ast_engine.analyze(text)
+        except PARSE_ERRORS:
+            instrument.count("ast_fallbacks")
+        else:
+            with instrument.stage("scan"):
+                scan = scan_lines(lines, language,
+                                  docstring_lines=structure["docstring_lines"],
+                                  identifier_counts=structure["identifiers"])
+            for key in ["max_nesting", "num_imports", "num_loops", "num_conditionals",
+                        "num_exceptions", "has_docstring"]:
+                scan[key] = structure[key]
+            scan["engine"] = "ast"
+            functions = structure["functions"]
+            return scan, [ccn for _, ccn in functions], [name for name, _ in functions]
+
+    # lizard loads a reader for every language it knows; only pay for
+    # that once a file actually needs it
+    import lizard
+    with instrument.stage("lizard"):
+        functions = lizard.analyze_file.analyze_source_code(filename, text).function_list
+    with instrument.stage("scan"):
+        scan = scan_lines(lines, language, in_docstring=in_docstring)
+    scan["engine"] = "lines"
+    return scan, [f.cyclomatic_complexity for f in functions], [f.name for f in functions]
+
+DOCSTRING_PATTERN = re.compile(r'^\s*[ru]?"""|\'\'\'')
+TOKEN_PATTERN = re.compile(r'\w+')
+
+def scan_lines(lines, language, in_docstring=False, docstring_lines=None, identifier_counts=None):
+    """
+    Line-level counts for one file in a single pass.
+
+    The loop only classifies lines (blank / comment / docstring / code) and
+    tracks per-line state (lengths, indentation, brace depth). Keyword,
+    token, import and statement counts run once over the joined code lines
+    with the language pack's precompiled patterns (see languages/), since
+    none of them cross a line boundary.
+
+    The result can also describe a slice of a file: `in_docstring` is the
+    state on entry, and the returned "in_docstring" and "nesting_end" (brace
+    depth relative to the start) are the state on exit. merge_scans()
+    combines consecutive slices.
+
+    With `docstring_lines` (0-based indexes, from the Python AST) those
+    lines are counted as comments instead of guessing docstrings from
+    triple quotes; `identifier_counts` likewise replaces the identifiers
+    taken from the code tokens. The returned "identifiers" are counts only;
+    extract_source() scores them.
+    """
+    comment_prefixes = language.comment_prefixes
+    doc_comment = language.doc_comment
+    docstrings = language.docstrings
+    braces = language.braces
+    keywords = language.keywords
+
+    code = []
     comment_lines = 0
     blank_lines = 0
     max_line_length = 0
     total_line_length = 0
-    indent_levels = []
+    min_space = max_space = min_tab = max_tab = 0
     nesting_depth = 0
     max_nesting = 0
-    num_imports = 0
-    num_loops = 0
-    num_conditionals = 0
-    num_exceptions = 0
     has_docstring = 0
-    total_tokens = 0
-    total_token_lines = 0
-    keyword_count = 0
-
-    docstring_pattern = re.compile(r'^\s*[ru]?"""|\'\'\'')
-    in_docstring = False
 
-    for line in lines:
-        stripped = line.strip()
-        line_len = len(line.rstrip("\n"))
-        max_line_length = max(max_line_length, line_len)
+    for i, line in enumerate(lines):
+        line_len = len(line) - 1 if line[-1:] == "\n" else len(line)
+        if line_len > max_line_length:
+            max_line_length = line_len
         total_line_length += line_len
 
+        stripped = line.strip()
         if not stripped:
             blank_lines += 1
             continue
-        if lang == 'Python' and stripped.startswith('#'):
-            comment_lines += 1
-            continue
-        if lang == 'JavaScript' and stripped.startswith('//'):
+        if comment_prefixes and stripped.startswith(comment_prefixes):
             comment_lines += 1
+            if doc_comment and stripped.startswith(doc_comment):
+                has_docstring = 1
             continue
 
-        if lang == 'Python':
-            if docstring_pattern.match(stripped):
+        if docstrings:
+            if docstring_lines is not None:
+                if i in docstring_lines:
+                    comment_lines += 1
+                    continue
+            elif DOCSTRING_PATTERN.match(stripped):
                 has_docstring = 1
                 in_docstring = not in_docstring
                 continue
@@ -93,68 +259,151 @@ def extract(filepath):
                 comment_lines += 1
                 continue
 
-        code_lines += 1
+        code.append(stripped)
 
-        leading_spaces = len(line) - len(line.lstrip(' '))
-        leading_tabs = len(line) - len(line.lstrip('\t'))
-        indent_levels.append((leading_spaces, leading_tabs))
+        first = line[0]
+        if first == ' ':
+            indent = len(line) - len(line.lstrip(' '))
+            if not max_space:
+                min_space = max_space = indent
+            elif indent < min_space:
+                min_space = indent
+            elif indent > max_space:
+                max_space = indent
+        elif first == '\t':
+            indent = len(line) - len(line.lstrip('\t'))
+            if not max_tab:
+                min_tab = max_tab = indent
+            elif indent < min_tab:
+                min_tab = indent
+            elif indent > max_tab:
+                max_tab = indent
 
-        open_braces = line.count('{') if lang == 'JavaScript' else 0
-        close_braces = line.count('}') if lang == 'JavaScript' else 0
-        nesting_depth += open_braces - close_braces
-        max_nesting = max(max_nesting, nesting_depth)
+        if braces:
+            nesting_depth += stripped.count('{') - stripped.count('}')
+            if nesting_depth > max_nesting:
+                max_nesting = nesting_depth
 
-        if lang == 'Python' and (stripped.startswith('import') or stripped.startswith('from')):
-            num_imports += 1
-        if lang == 'JavaScript' and (stripped.startswith('import') or 'require' in stripped):
-            num_imports += 1
+    code_text = "\n".join(code)
 
-        if re.match(r'^\s*(for|while)\b', stripped):
+    num_loops = num_conditionals = num_exceptions = 0
+    for loop, conditional, _ in language.statements.findall(code_text):
+        if loop:
             num_loops += 1
-
-        if re.match(r'^\s*(if|elif|else|else if)\b', stripped):
+        elif conditional:
             num_conditionals += 1
-
-        if re.match(r'^\s*(try|except|catch|finally)\b', stripped):
+        else:
             num_exceptions += 1
 
-        tokens = re.findall(r'\b\w+\b', stripped)
-        total_tokens += len(tokens)
-        total_token_lines += 1
+    num_imports = len(language.imports.findall(code_text)) if language.imports else 0
 
-        keyword_count += sum(1 for t in tokens if t in keywords)
+    tokens = TOKEN_PATTERN.findall(code_text)
+    token_counts = Counter(tokens)
+    keyword_count = sum(token_counts[k] for k in keywords if k in token_counts)
 
-    space_levels = [s for s, t in indent_levels if s > 0]
-    tab_levels = [t for s, t in indent_levels if t > 0]
-    indentation_consistency = 0
-    if space_levels:
-        indentation_consistency = 1 / (1 + (max(space_levels) - min(space_levels)))
-    elif tab_levels:
-        indentation_consistency = 1 / (1 + (max(tab_levels) - min(tab_levels)))
+    # Every identifier in the code, not only the function names
+    if identifier_counts is None:
+        identifier_counts = {
+            t: n for t, n in token_counts.items()
+            if t not in keywords and not t[0].isdigit()
+        }
+
+    return {
+        "code_lines": len(code),
+        "comment_lines": comment_lines,
+        "blank_lines": blank_lines,
+        "total_lines": len(lines),
+        "max_line_length": max_line_length,
+        "total_line_length": total_line_length,
+        "min_space": min_space,
+        "max_space": max_space,
+        "min_tab": min_tab,
+        "max_tab": max_tab,
+        "max_nesting": max_nesting,
+        "nesting_end": nesting_depth,
+        "in_docstring": in_docstring,
+        "num_imports": num_imports,
+        "num_loops": num_loops,
+        "num_conditionals": num_conditionals,
+        "num_exceptions": num_exceptions,
+        "has_docstring": has_docstring,
+        "total_tokens": len(tokens),
+        "keyword_count": keyword_count,
+        "identifiers": identifier_counts,
+    }
+
+def merge_scans(scans):
+    """Combine scan_lines() results of consecutive slices of one file."""
+    merged = dict(scans[0])
+    merged["identifiers"] = Counter(scans[0]["identifiers"])
+    for scan in scans[1:]:
+        for key in ["code_lines", "comment_lines", "blank_lines", "total_lines", "total_line_length",
+                    "num_imports", "num_loops", "num_conditionals", "num_exceptions",
+                    "total_tokens", "keyword_count"]:
+            merged[key] += scan[key]
+        merged["identifiers"].update(scan["identifiers"])
+        merged["max_line_length"] = max(merged["max_line_length"], scan["max_line_length"])
+        merged["has_docstring"] = merged["has_docstring"] or scan["has_docstring"]
+        for kind in ["space", "tab"]:
+            if scan[f"max_{kind}"]:
+                if merged[f"max_{kind}"]:
+                    merged[f"min_{kind}"] = min(merged[f"min_{kind}"], scan[f"min_{kind}"])
+                    merged[f"max_{kind}"] = max(merged[f"max_{kind}"], scan[f"max_{kind}"])
+                else:
+                    merged[f"min_{kind}"] = scan[f"min_{kind}"]
+                    merged[f"max_{kind}"] = scan[f"max_{kind}"]
+        # The slice's depths are relative to its own start
+        merged["max_nesting"] = max(merged["max_nesting"], merged["nesting_end"] + scan["max_nesting"])
+        merged["nesting_end"] += scan["nesting_end"]
+        merged["in_docstring"] = scan["in_docstring"]
+    return merged
+
+def detect_language(filepath):
+    """(language name, keyword set) of a file; see languages.for_path()."""
+    language = languages.for_path(filepath)
+    return language.name, language.keywords
 
-    avg_identifier_quality = sum(identifier_quality(id_) for id_ in identifiers) / (len(identifiers) or 1)
+def build_metrics(filepath, lang, scan, complexities, identifier_scores, all_identifiers):
+    """
+    File-level metrics from a (merged) scan, per-function results and the
+    score_identifiers() (sum, count) of every identifier.
+    """
+    num_functions = len(complexities)
+    avg_complexity = sum(complexities)/num_functions if num_functions else 0
+    avg_identifier_quality = math.fsum(identifier_scores) / (len(identifier_scores) or 1)
+
+    code_lines = scan["code_lines"]
+    comment_lines = scan["comment_lines"]
+    total_lines = scan["total_lines"]
+
+    indentation_consistency = 0
+    if scan["max_space"]:
+        indentation_consistency = 1 / (1 + (scan["max_space"] - scan["min_space"]))
+    elif scan["max_tab"]:
+        indentation_consistency = 1 / (1 + (scan["max_tab"] - scan["min_tab"]))
 
     metrics = {
         "filename": os.path.basename(filepath),
         "language": lang,
         "lines_of_code": code_lines,
-        "num_functions": len(functions),
+        "num_functions": num_functions,
         "num_comments": comment_lines,
         "comment_ratio": comment_lines / (code_lines + comment_lines + 1),
-        "avg_line_length": total_line_length / (len(lines) or 1),
-        "max_line_length": max_line_length,
+        "avg_line_length": scan["total_line_length"] / (total_lines or 1),
+        "max_line_length": scan["max_line_length"],
         "indentation_consistency": indentation_consistency,
-        "nesting_depth": max_nesting,
+        "nesting_depth": scan["max_nesting"],
         "cyclomatic_complexity": avg_complexity,
-        "num_imports": num_imports,
-        "num_loops": num_loops,
-        "num_conditionals": num_conditionals,
-        "num_exceptions": num_exceptions,
-        "has_docstring": has_docstring,
-        "avg_tokens_per_line": total_tokens / (total_token_lines or 1),
-        "keyword_density": keyword_count / (code_lines or 1),
-        "blank_lines_ratio": blank_lines / (len(lines) or 1),
-        "avg_identifier_quality": avg_identifier_quality
+        "num_imports": scan["num_imports"],
+        "num_loops": scan["num_loops"],
+        "num_conditionals": scan["num_conditionals"],
+        "num_exceptions": scan["num_exceptions"],
+        "has_docstring": scan["has_docstring"],
+        "avg_tokens_per_line": scan["total_tokens"] / (code_lines or 1),
+        "keyword_density": scan["keyword_count"] / (code_lines or 1),
+        "blank_lines_ratio": scan["blank_lines"] / (total_lines or 1),
+        "avg_identifier_quality": avg_identifier_quality,
+        "avg_all_identifier_quality": all_identifiers[0] / (all_identifiers[1] or 1),
     }
 
     return metrics
@@ -4,7 +4,12 @@ import base64
 import time
 import hashlib
 import csv
+import json
 import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from dedup import DedupIndex, dedup_folder
 
 # ===============================
 # GitHub Token (for dataset collection)
@@ -12,19 +17,144 @@ import random
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 headers = {"Authorization": f"token {GITHUB_TOKEN}"} if GITHUB_TOKEN else {}
 
+# Overridable so the fetcher can be pointed at a local stub server
+GITHUB_API = os.getenv("GITHUB_API", "https://api.github.com").rstrip("/")
+
 OUTPUT_DIR = "datasets"
 META_FILE = os.path.join(OUTPUT_DIR, "metadata.csv")
+PROGRESS_FILE = os.path.join(OUTPUT_DIR, "fetch_progress.json")
 NUM_FILES_PER_LANG = 2000
 FILES_PER_KEYWORD = 10
+MAX_WORKERS = 8
+MAX_RETRIES = 5
+REQUEST_TIMEOUT = 30
 
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-seen_hashes = set()
-if os.path.exists(META_FILE):
-    with open(META_FILE, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            seen_hashes.add(row["content_hash"])
+DEDUP_INDEX_DIR = os.path.join(OUTPUT_DIR, "dedup_index")
+DEDUP_SAVE_EVERY = 500
+
+
+# ===============================
+# 🔌 HTTP SESSION + RATE LIMITING
+# ===============================
+def make_session(pool_size=MAX_WORKERS):
+    """Keep-alive session whose connection pool matches the worker count."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(headers)
+    return session
+
+
+session = make_session()
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket driven by GitHub's rate-limit headers.
+
+    The bucket holds at most `burst` tokens, refilled at `rate`
+    requests/sec until the first response and after that at
+    X-RateLimit-Remaining spread over the time left until
+    X-RateLimit-Reset, so short interactive bursts (a repo analysis) run at
+    full speed while long crawls stay within the quota. A response can
+    only lower the token count: with requests in flight, one that arrives
+    late carries a stale, higher remaining. An exhausted quota or a
+    Retry-After header blocks all callers until the given time.
+    """
+
+    def __init__(self, rate, burst=MAX_WORKERS):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def update(self, response):
+        """Apply a response's rate-limit headers; True if callers are now blocked."""
+        retry_after = response.headers.get("Retry-After")
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        reset = response.headers.get("X-RateLimit-Reset")
+        with self.lock:
+            now = time.monotonic()
+            if retry_after is not None:
+                try:
+                    self.blocked_until = max(self.blocked_until, now + float(retry_after))
+                except ValueError:
+                    pass
+            if remaining is not None and reset is not None:
+                try:
+                    seconds_left = max(1.0, float(reset) - time.time())
+                    remaining = int(remaining)
+                except ValueError:
+                    pass  # a garbled header shouldn't abort the fetch
+                else:
+                    if remaining <= 0:
+                        self.blocked_until = max(self.blocked_until, now + seconds_left)
+                        self.tokens = 0.0
+                    else:
+                        self.rate = remaining / seconds_left
+                        self.tokens = min(self.tokens, float(remaining))
+            return self.blocked_until > now
+
+
+# Search and core API calls have separate quotas on GitHub
+# (30/min vs 5000/h with a token, 10/min vs 60/h without).
+search_limiter = RateLimiter(rate=0.5 if GITHUB_TOKEN else 10 / 60)
+core_limiter = RateLimiter(rate=5000 / 3600 if GITHUB_TOKEN else 60 / 3600)
+
+
+def is_rate_limited(response):
+    if response.status_code == 429:
+        return True
+    # Secondary limits can come as a bare 403 with only the message to tell
+    return response.status_code == 403 and (
+        "Retry-After" in response.headers
+        or response.headers.get("X-RateLimit-Remaining") == "0"
+        or "rate limit" in response.text.lower()
+    )
+
+
+def api_get(url, limiter, params=None):
+    """GET through the pooled session, waiting on the limiter and retrying."""
+    response = None
+    for attempt in range(MAX_RETRIES):
+        limiter.acquire()
+        try:
+            response = session.get(url, params=params, timeout=REQUEST_TIMEOUT)
+        except requests.RequestException:
+            time.sleep(2 ** attempt)
+            continue
+        blocked = limiter.update(response)
+        if is_rate_limited(response):
+            # The limiter blocks until the quota resets; without headers
+            # saying when, back off
+            if not blocked:
+                time.sleep(2 ** attempt)
+            continue
+        if response.status_code >= 500:
+            time.sleep(2 ** attempt)
+            continue
+        return response
+    return response
 
 
 # ===============================
@@ -46,33 +176,66 @@ KEYWORDS = [
 
 
 def search_files(query, per_page=50, page=1):
-    url = f"https://api.github.com/search/code?q={query}&per_page={per_page}&page={page}"
-    r = requests.get(url, headers=headers)
-    if r.status_code == 200:
+    url = f"{GITHUB_API}/search/code"
+    r = api_get(url, search_limiter, params={"q": query, "per_page": per_page, "page": page})
+    if r is not None and r.status_code == 200:
         return r.json().get("items", [])
     return []
 
 
 def download_file(repo_full_name, path):
-    url = f"https://api.github.com/repos/{repo_full_name}/contents/{path}"
-    r = requests.get(url, headers=headers)
-    if r.status_code != 200:
+    url = f"{GITHUB_API}/repos/{repo_full_name}/contents/{path}"
+    r = api_get(url, core_limiter)
+    if r is None or r.status_code != 200:
         return None
-    content = r.json().get("content", "")
-    encoding = r.json().get("encoding", "")
-    if encoding == "base64":
-        return base64.b64decode(content).decode("utf-8", errors="ignore")
+    data = r.json()
+    if data.get("encoding", "") == "base64":
+        return base64.b64decode(data.get("content", "")).decode("utf-8", errors="ignore")
     return None
 
 
-def collect_files():
+def safe_download(item):
+    try:
+        return download_file(item["repository"]["full_name"], item["path"])
+    except Exception:
+        return None
+
+
+def load_progress():
+    """Collected counts and the next search page per (language, keyword)."""
+    if os.path.exists(PROGRESS_FILE):
+        with open(PROGRESS_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"collected": {"Python": 0, "JavaScript": 0}, "pages": {}}
+
+
+def save_progress(progress):
+    tmp = PROGRESS_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(progress, f)
+    os.replace(tmp, PROGRESS_FILE)
+
+
+def load_dedup_index():
+    """
+    Near-duplicate index of everything already collected. A dataset
+    collected before the index existed is indexed once from its files.
+    """
+    if not os.path.exists(DEDUP_INDEX_DIR) and os.path.exists(META_FILE):
+        print("Building dedup index from existing files...")
+        dedup_folder(OUTPUT_DIR, DEDUP_INDEX_DIR)
+    return DedupIndex(DEDUP_INDEX_DIR)
+
+
+def collect_files(resume=True):
     start_time = time.time()
-    collected = {
-        "Python": 0,
-        "JavaScript": 0
-    }
+    dedup_index = load_dedup_index()
+    progress = load_progress() if resume else {"collected": {"Python": 0, "JavaScript": 0}, "pages": {}}
+    collected = progress["collected"]
+    pages = progress["pages"]
 
-    with open(META_FILE, "a", newline="", encoding="utf-8") as meta:
+    with open(META_FILE, "a", newline="", encoding="utf-8") as meta, \
+            ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
         writer = csv.writer(meta)
         if os.stat(META_FILE).st_size == 0:
             writer.writerow(["local_file", "repo_url", "original_path", "content_hash", "download_time", "keyword", "language"])
@@ -84,7 +247,8 @@ def collect_files():
                 random.shuffle(KEYWORDS)
 
                 for kw in KEYWORDS:
-                    page = 1
+                    page_key = f"{lang}|{kw}"
+                    page = pages.get(page_key, 1)
                     files_downloaded = 0
 
                     while files_downloaded < FILES_PER_KEYWORD:
@@ -93,21 +257,25 @@ def collect_files():
                         if not files:
                             break
 
-                        for item in files:
-                            repo_name = item["repository"]["full_name"]
-                            repo_url = item["repository"]["html_url"]
-                            path = item["path"]
+                        # Download in waves no larger than the number of files
+                        # still needed, so concurrency doesn't waste quota.
+                        pos = 0
+                        while pos < len(files) and files_downloaded < FILES_PER_KEYWORD:
+                            wave = files[pos:pos + min(MAX_WORKERS, FILES_PER_KEYWORD - files_downloaded)]
+                            pos += len(wave)
 
-                            try:
-                                content = download_file(repo_name, path)
+                            for item, content in zip(wave, executor.map(safe_download, wave)):
                                 if not content or len(content.splitlines()) < 10:
                                     continue
 
                                 content_hash = hashlib.md5(content.encode()).hexdigest()
-                                if content_hash in seen_hashes:
+                                # Exact copies, forks and whitespace-only variants
+                                if dedup_index.check_and_add(content) is not None:
                                     continue
 
-                                seen_hashes.add(content_hash)
+                                repo_name = item["repository"]["full_name"]
+                                repo_url = item["repository"]["html_url"]
+                                path = item["path"]
 
                                 repo_safe = repo_name.replace("/", "_")
                                 local_name = f"{repo_safe}_{path.split('/')[-1]}"
@@ -131,15 +299,17 @@ def collect_files():
                                 if files_downloaded >= FILES_PER_KEYWORD:
                                     break
 
-                            except Exception:
-                                continue
-
                         page += 1
-                        time.sleep(0.1)
+                        pages[page_key] = page
+                        meta.flush()
+                        if dedup_index.pending >= DEDUP_SAVE_EVERY:
+                            dedup_index.save()
+                        save_progress(progress)
 
                     if collected[lang] >= NUM_FILES_PER_LANG:
                         break
 
+    dedup_index.save()
     total_time = round(time.time() - start_time, 2)
     print(f"\n✅ Done! Collected Python: {collected['Python']} | JavaScript: {collected['JavaScript']} in {total_time}s")
 
@@ -181,5 +351,94 @@ def fetch_github_repo_code(repo_url):
         return None
 
 
+# ==========================================================
+# 🌳 RECURSIVE REPO FETCH (git tree + blobs, cached by SHA)
+# ==========================================================
+BLOB_CACHE_DIR = "blob_cache"
+
+
+def parse_repo_url(repo_url):
+    parts = repo_url.rstrip("/").split("/")
+    repo = parts[-1]
+    if repo.endswith(".git"):
+        repo = repo[:-4]
+    return parts[-2], repo
+
+
+def fetch_repo_tree(owner, repo, ref=None):
+    """All blobs in the repository as (path, sha), from one recursive tree call."""
+    if ref is None:
+        r = api_get(f"{GITHUB_API}/repos/{owner}/{repo}", core_limiter)
+        if r is None or r.status_code != 200:
+            return None
+        ref = r.json().get("default_branch", "main")
+
+    r = api_get(f"{GITHUB_API}/repos/{owner}/{repo}/git/trees/{ref}", core_limiter, params={"recursive": 1})
+    if r is None or r.status_code != 200:
+        return None
+    data = r.json()
+    if data.get("truncated"):
+        print(f"Warning: tree listing for {owner}/{repo} was truncated by GitHub")
+    return [(entry["path"], entry["sha"]) for entry in data.get("tree", []) if entry["type"] == "blob"]
+
+
+def blob_cache_path(sha):
+    return os.path.join(BLOB_CACHE_DIR, sha[:2], sha)
+
+
+def fetch_blob(owner, repo, sha):
+    """
+    Blob content as text. Blobs are content-addressed, so a cached copy
+    under its SHA never goes stale and re-analysis only downloads blobs
+    that changed.
+    """
+    path = blob_cache_path(sha)
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read().decode("utf-8", errors="ignore")
+
+    r = api_get(f"{GITHUB_API}/repos/{owner}/{repo}/git/blobs/{sha}", core_limiter)
+    if r is None or r.status_code != 200:
+        return None
+    data = r.json()
+    if data.get("encoding") != "base64":
+        return None
+    content = base64.b64decode(data.get("content", ""))
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(content)
+    os.replace(tmp, path)
+    return content.decode("utf-8", errors="ignore")
+
+
+def fetch_repo_files(repo_url, extensions=(".py",), ref=None):
+    """
+    Fetch every file with one of `extensions` from a GitHub repository,
+    walking the full tree, and return {path: source}. Blobs are downloaded
+    concurrently through the shared session and rate limiter.
+    """
+    owner, repo = parse_repo_url(repo_url)
+    entries = fetch_repo_tree(owner, repo, ref)
+    if entries is None:
+        return None
+    entries = [(path, sha) for path, sha in entries if path.endswith(tuple(extensions))]
+
+    def safe_fetch(entry):
+        try:
+            return fetch_blob(owner, repo, entry[1])
+        except Exception:
+            return None
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        sources = list(executor.map(safe_fetch, entries))
+    return {path: source for (path, _), source in zip(entries, sources) if source is not None}
+
+
 if __name__ == "__main__":
-    collect_files()
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--restart", action="store_true", help="ignore saved keyword/page progress")
+    args = parser.parse_args()
+    collect_files(resume=not args.restart)
@@ -0,0 +1,162 @@
+import atexit
+import datetime
+import functools
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+HISTORY_DB = "history.db"
+# Pre-WAL history in the default rollback journal; only ever read, to seed a new store
+LEGACY_HISTORY_DB = "analysis_history.db"
+BATCH_SIZE = 100
+FLUSH_INTERVAL = 0.2  # seconds a write may wait to be batched
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT,
+        mode TEXT,
+        score INTEGER,
+        grade TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS history_timestamp ON history (timestamp)",
+    "CREATE INDEX IF NOT EXISTS history_mode ON history (mode, timestamp)",
+]
+
+INSERT_SQL = "INSERT INTO history (timestamp, mode, score, grade) VALUES (?, ?, ?, ?)"
+LEGACY_ROWS_SQL = "SELECT id, timestamp, mode, score, grade FROM history ORDER BY id"
+SEED_SQL = "INSERT INTO history (id, timestamp, mode, score, grade) VALUES (?, ?, ?, ?, ?)"
+PAGE_SQL = "SELECT id, timestamp, mode, score, grade FROM history ORDER BY id DESC LIMIT ? OFFSET ?"
+PAGE_BY_MODE_SQL = "SELECT id, timestamp, mode, score, grade FROM history WHERE mode = ? ORDER BY id DESC LIMIT ? OFFSET ?"
+COUNT_SQL = "SELECT COUNT(*) FROM history"
+GRADE_DISTRIBUTION_SQL = """
+    SELECT substr(timestamp, 1, ?) AS period, grade, COUNT(*) AS count, AVG(score) AS avg_score
+    FROM history
+    GROUP BY period, grade
+    ORDER BY period, grade
+"""
+
+# Timestamps are str(datetime.now()), so a period is a prefix of the text
+PERIOD_LENGTHS = {"hour": 13, "day": 10, "month": 7}
+
+
+def connect(path):
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def legacy_rows(path=LEGACY_HISTORY_DB):
+    """Rows of the old history file, opened read-only so it is never converted to WAL."""
+    if not os.path.exists(path):
+        return []
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        return conn.execute(LEGACY_ROWS_SQL).fetchall()
+    except sqlite3.Error:
+        return []
+    finally:
+        conn.close()
+
+
+class HistoryStore:
+    """
+    Analysis history backed by SQLite in WAL mode.
+
+    One store per process: a background thread owns the write connection
+    and inserts queued rows in batched transactions, while reads go
+    through a second shared connection (WAL lets them run alongside the
+    writer). Queries page and aggregate in SQL instead of loading the
+    whole table. A new store starts with the rows of LEGACY_HISTORY_DB.
+    Rows still queued when the process exits are written by close(),
+    which runs at exit.
+    """
+
+    def __init__(self, path=HISTORY_DB, legacy_path=LEGACY_HISTORY_DB):
+        self.path = path
+        fresh = not os.path.exists(path)
+        self.read_conn = connect(path)
+        for statement in SCHEMA:
+            self.read_conn.execute(statement)
+        if fresh and os.path.abspath(legacy_path) != os.path.abspath(path):
+            self.read_conn.executemany(SEED_SQL, legacy_rows(legacy_path))
+        self.read_conn.commit()
+        self.read_lock = threading.Lock()
+        self.closed = False
+
+        self.queue = queue.Queue()
+        self.writer = threading.Thread(target=self.write_loop, daemon=True)
+        self.writer.start()
+        atexit.register(self.close)
+
+    def write_loop(self):
+        conn = connect(self.path)
+        while True:
+            rows = [self.queue.get()]
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            while len(rows) < BATCH_SIZE and rows[-1] is not None:
+                try:
+                    rows.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            stop = None in rows
+            rows = [row for row in rows if row is not None]
+            try:
+                with conn:
+                    conn.executemany(INSERT_SQL, rows)
+            except sqlite3.Error as e:
+                print(f"History write failed ({len(rows)} rows): {e}")
+            finally:
+                for _ in range(len(rows) + stop):
+                    self.queue.task_done()
+            if stop:
+                conn.close()
+                return
+
+    def save(self, mode, score, grade):
+        """Queue one analysis for the next batched insert."""
+        self.queue.put((str(datetime.datetime.now()), mode, score, grade))
+
+    def flush(self):
+        """Block until every queued row is committed."""
+        self.queue.join()
+
+    def query(self, sql, params=()):
+        self.flush()
+        with self.read_lock:
+            return self.read_conn.execute(sql, params).fetchall()
+
+    def page(self, limit=50, offset=0, mode=None):
+        """Most recent analyses first, as (id, timestamp, mode, score, grade)."""
+        if mode is None:
+            return self.query(PAGE_SQL, (limit, offset))
+        return self.query(PAGE_BY_MODE_SQL, (mode, limit, offset))
+
+    def count(self):
+        return self.query(COUNT_SQL)[0][0]
+
+    def grade_distribution(self, period="day"):
+        """(period, grade, count, avg_score) rows grouped in SQL."""
+        return self.query(GRADE_DISTRIBUTION_SQL, (PERIOD_LENGTHS[period],))
+
+    def close(self):
+        """Write out the queued rows and stop the writer; safe to call twice."""
+        with self.read_lock:
+            if self.closed:
+                return
+            self.closed = True
+        self.queue.put(None)
+        self.writer.join()
+        with self.read_lock:
+            self.read_conn.close()
+
+
+@functools.lru_cache(maxsize=None)
+def get_history_store(path=HISTORY_DB):
+    """The process-wide store for `path`."""
+    return HistoryStore(path)
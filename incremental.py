@@ -0,0 +1,179 @@
+import io
+import re
+import tokenize
+
+import extract
+import languages
+from extract import analyze_source, build_metrics, identifier_quality, merge_scans, score_identifiers
+
+TRIPLE_QUOTE = re.compile(r'"""|\'\'\'')
+OPENERS = {"(", "[", "{", "${"}
+CLOSERS = {")", "]", "}"}
+STATEMENT_ENDS = {"}", ";", ")"}
+
+
+def split_regions(lines, language):
+    """
+    Split a file into (start, end) line ranges at top-level definitions.
+
+    Boundaries depend only on the lines themselves, so an edit inside one
+    function leaves every other region's text, and therefore its cached
+    result, unchanged. A region starts at a line matching the language's
+    `region_start`: for Python outside triple-quoted strings (decorators
+    belong to the definition below them), for brace languages only at
+    depth 0.
+    """
+    starts = [0]
+    region_start = language.region_start
+    if region_start and language.docstrings:
+        previous_decorator = False
+        open_quote = None  # never split inside a triple-quoted string
+        for i, line in enumerate(lines):
+            if open_quote is None and region_start.match(line):
+                if not previous_decorator and i:
+                    starts.append(i)
+                previous_decorator = line.startswith('@')
+            elif line.strip():
+                previous_decorator = False
+            if '"""' in line or "'''" in line:
+                for quote in TRIPLE_QUOTE.findall(line):
+                    if open_quote is None:
+                        open_quote = quote
+                    elif quote == open_quote:
+                        open_quote = None
+    elif region_start and language.braces:
+        depth = 0
+        for i, line in enumerate(lines):
+            if i and depth == 0 and region_start.match(line):
+                starts.append(i)
+            depth += line.count('{') - line.count('}')
+    starts.append(len(lines))
+    return [(starts[i], starts[i + 1]) for i in range(len(starts) - 1) if starts[i] < starts[i + 1]]
+
+
+def ends_cleanly(filename, language, text):
+    """
+    Whether `text` closes every bracket, string and block comment it
+    opens and, in brace languages, finishes its last statement. Only then
+    does lizard read the text that follows the same way with or without
+    this text in front of it.
+    """
+    if language.name == "Python":
+        # lizard's Python tokens take // for a comment, so ask tokenize
+        try:
+            return all(t.type != tokenize.ERRORTOKEN for t in tokenize.generate_tokens(io.StringIO(text).readline))
+        except (tokenize.TokenError, SyntaxError):
+            return False
+
+    from lizard_languages import CLikeReader, get_reader_for
+
+    reader = get_reader_for(filename) or CLikeReader
+    depth = 0
+    previous = last = None
+    for token in reader.generate_tokens(text):
+        if token in OPENERS:
+            depth += 1
+        elif token in CLOSERS:
+            depth -= 1
+            if depth < 0:
+                return False
+        # lizard leaves an unterminated string or comment as its bare opener
+        elif token in ("'", '"') or (previous == "/" and token == "*"):
+            return False
+        previous = token
+        if not token.isspace() and not token.startswith(("//", "/*")):
+            last = token
+    return depth == 0 and (last is None or last in STATEMENT_ENDS or last.startswith("#"))
+
+
+class IncrementalAnalyzer:
+    """
+    Re-score one file after edits by recomputing only the changed regions.
+
+    Each region keeps its partial aggregates: the scan_lines() counts for
+    its lines and the complexity and identifier scores of the functions
+    inside it. They are cached by region text plus the docstring state on
+    entry (the only scanner state that crosses a region boundary besides
+    brace depth, which merges exactly). File-level metrics are re-derived
+    by merging the parts, giving the same result as extract_source() on
+    the full text.
+
+    Python regions are whole top-level statements, so each one parses on
+    its own exactly when the file does. If any region fails to parse, the
+    whole file is redone with the line engine, as extract_source() would.
+    lizard, though, carries its state from one region into the next when a
+    region leaves a bracket, string or comment open (the usual state while
+    typing). Whenever a region other than the last one does that, the
+    file is extracted in full instead.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.language = languages.for_path(filename)
+        self.lines = []
+        self.regions = {}
+        self.recomputed = 0
+
+    def analyze_region(self, region_lines, in_docstring, strip_bom, use_ast):
+        text = "".join(region_lines)
+        if strip_bom and text.startswith("\ufeff"):
+            text = text[1:]
+        scan, complexities, names = analyze_source(
+            self.filename, self.language, region_lines, text, in_docstring, use_ast)
+        self.recomputed += 1
+        # The AST engine only ran if the region parsed, which closes everything
+        closed = scan["engine"] == "ast" or ends_cleanly(self.filename, self.language, text)
+        return scan, complexities, [identifier_quality(name) for name in names], closed
+
+    def metrics(self):
+        use_ast = extract.PYTHON_ENGINE == "ast" and self.language.name == "Python"
+        metrics = self.merge_regions(use_ast) or self.merge_regions(False)
+        if metrics is None:
+            self.recomputed += 1
+            metrics = extract.extract_source("".join(self.lines), self.filename)
+        return metrics
+
+    def merge_regions(self, use_ast):
+        """
+        File metrics from cached or fresh regions; None if a region didn't
+        parse or left something open for the next one.
+        """
+        regions = {}
+        scans, complexities, identifier_scores = [], [], []
+        in_docstring = False
+        bounds = split_regions(self.lines, self.language) or [(0, 0)]
+        for start, end in bounds:
+            region_lines = self.lines[start:end]
+            key = ("".join(region_lines), in_docstring, start == 0, use_ast)
+            result = self.regions.get(key) or self.analyze_region(region_lines, in_docstring, start == 0, use_ast)
+            scan, region_complexities, region_scores, closed = result
+            if use_ast and scan["engine"] != "ast":
+                return None
+            if not closed and end != bounds[-1][1]:
+                self.regions.update(regions)  # keep what was computed for the next edit
+                return None
+            regions[key] = result
+            scans.append(scan)
+            complexities.extend(region_complexities)
+            identifier_scores.extend(region_scores)
+            in_docstring = scan["in_docstring"]
+
+        # Only the current version's regions are kept, so the cache is
+        # bounded by the file itself.
+        self.regions = regions
+        scan = merge_scans(scans)
+        return build_metrics(self.filename, self.language.name, scan, complexities, identifier_scores,
+                             score_identifiers(scan["identifiers"]))
+
+    def update(self, code):
+        """Metrics for a new version of the whole file."""
+        self.lines = io.StringIO(code, newline=None).readlines()
+        return self.metrics()
+
+    def apply_edit(self, start, end, new_text):
+        """
+        Metrics after replacing lines [start, end) (0-based) with
+        `new_text`, as in a unified diff hunk.
+        """
+        self.lines[start:end] = io.StringIO(new_text, newline=None).readlines()
+        return self.metrics()
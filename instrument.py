@@ -0,0 +1,196 @@
+"""
+Stage timers and counters for the extract → predict pipeline.
+
+Off by default. enable() (or CODEQ_STATS=1 in the environment) turns it
+on; while off, stage() hands back a shared no-op context manager and
+count() returns straight away, so the hot paths pay about one function
+call each.
+
+    with instrument.stage("lizard"):
+        ...
+    instrument.count("files")
+
+Worker processes keep their own numbers; they send drain() back with
+their results and the parent merge()s them.
+"""
+import contextlib
+import cProfile
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+ENV_VAR = "CODEQ_STATS"
+
+enabled = os.environ.get(ENV_VAR) == "1"
+timings = {}  # stage -> [calls, total seconds, max seconds]
+counters = Counter()
+_lock = threading.Lock()
+_NULL = contextlib.nullcontext()
+
+
+def _reinit_lock():
+    # A worker forked while another thread held the lock would deadlock on it
+    global _lock
+    _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reinit_lock)
+
+
+class _Stage:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start)
+
+
+def stage(name):
+    """Context manager timing one pass through `name`."""
+    return _Stage(name) if enabled else _NULL
+
+
+def record(name, seconds, calls=1):
+    with _lock:
+        entry = timings.get(name)
+        if entry is None:
+            timings[name] = [calls, seconds, seconds]
+        else:
+            entry[0] += calls
+            entry[1] += seconds
+            if seconds > entry[2]:
+                entry[2] = seconds
+
+
+def count(name, n=1):
+    if enabled:
+        with _lock:
+            counters[name] += n
+
+
+def enable():
+    global enabled
+    enabled = True
+    # Inherited by worker processes however they are started
+    os.environ[ENV_VAR] = "1"
+
+
+def disable():
+    global enabled
+    enabled = False
+    os.environ.pop(ENV_VAR, None)
+
+
+def reset():
+    with _lock:
+        timings.clear()
+        counters.clear()
+
+
+def snapshot():
+    with _lock:
+        return {
+            "timings": {name: list(entry) for name, entry in timings.items()},
+            "counters": dict(counters),
+        }
+
+
+def drain():
+    """snapshot() and reset(), for a worker shipping its numbers to the parent."""
+    with _lock:
+        data = {"timings": dict(timings), "counters": dict(counters)}
+        timings.clear()
+        counters.clear()
+    return data
+
+
+def merge(data):
+    if not data:
+        return
+    with _lock:
+        for name, (calls, total, longest) in data["timings"].items():
+            entry = timings.setdefault(name, [0, 0.0, 0.0])
+            entry[0] += calls
+            entry[1] += total
+            entry[2] = max(entry[2], longest)
+        counters.update(data["counters"])
+
+
+def report(wall_time=None):
+    """
+    Structured summary: per-stage calls/total/mean/max, all counters, and
+    the hit rate of every cache counted as <name>_hits / <name>_misses.
+    """
+    data = snapshot()
+    stages = {
+        name: {
+            "calls": calls,
+            "total_s": round(total, 6),
+            "mean_ms": round(1000 * total / calls, 4) if calls else 0.0,
+            "max_ms": round(1000 * longest, 4),
+        }
+        for name, (calls, total, longest) in sorted(data["timings"].items(), key=lambda kv: -kv[1][1])
+    }
+    counts = data["counters"]
+    hit_rates = {}
+    for name, hits in counts.items():
+        if name.endswith("_hits"):
+            cache = name[:-len("_hits")]
+            lookups = hits + counts.get(f"{cache}_misses", 0)
+            if lookups:
+                hit_rates[cache] = round(hits / lookups, 4)
+    result = {"stages": stages, "counters": counts, "hit_rates": hit_rates}
+    if wall_time is not None:
+        result["wall_time_s"] = round(wall_time, 6)
+        for name in ("files", "lines"):
+            if data["counters"].get(name):
+                result[f"{name}_per_s"] = round(data["counters"][name] / wall_time, 2)
+    return result
+
+
+def write_report(path, wall_time=None):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report(wall_time), f, indent=2)
+
+
+def prometheus(prefix="codeq"):
+    """Prometheus text exposition of the current timers and counters."""
+    data = snapshot()
+    lines = [
+        f"# HELP {prefix}_stage_seconds_total Time spent in each pipeline stage.",
+        f"# TYPE {prefix}_stage_seconds_total counter",
+    ]
+    for name, (_, total, _) in sorted(data["timings"].items()):
+        lines.append(f'{prefix}_stage_seconds_total{{stage="{name}"}} {total:.9f}')
+    lines += [
+        f"# HELP {prefix}_stage_calls_total Passes through each pipeline stage.",
+        f"# TYPE {prefix}_stage_calls_total counter",
+    ]
+    for name, (calls, _, _) in sorted(data["timings"].items()):
+        lines.append(f'{prefix}_stage_calls_total{{stage="{name}"}} {calls}')
+    for name, value in sorted(data["counters"].items()):
+        lines.append(f"# TYPE {prefix}_{name}_total counter")
+        lines.append(f"{prefix}_{name}_total {value}")
+    return "\n".join(lines) + "\n"
+
+
+@contextlib.contextmanager
+def profile(path=None):
+    """cProfile the block and dump pstats to `path`; a no-op when path is None."""
+    if path is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
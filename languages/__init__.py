@@ -0,0 +1,123 @@
+"""
+Language registry for the extractor.
+
+Each supported language is a pack, a module in this package that defines
+`language = Language(...)`. The pack gives the comment syntax, keyword
+set, import and statement patterns, and how nesting is measured. Packs
+are only imported the first time a file of that language is seen, so
+importing extract.py stays cheap however many languages are registered.
+Complexity comes from lizard, which already reads all of them.
+
+To add a language, write the pack and list its extensions in EXTENSIONS.
+"""
+import importlib
+import os
+import re
+
+# extension -> pack module; the only thing known before a pack is loaded
+EXTENSIONS = {
+    ".py": "python",
+    ".js": "javascript",
+    ".mjs": "javascript",
+    ".cjs": "javascript",
+    ".jsx": "javascript",
+    ".ts": "typescript",
+    ".tsx": "typescript",
+    ".java": "java",
+    ".go": "go",
+    ".c": "cpp",
+    ".h": "cpp",
+    ".cc": "cpp",
+    ".cpp": "cpp",
+    ".cxx": "cpp",
+    ".hpp": "cpp",
+    ".rs": "rust",
+}
+
+# Block comment continuation lines as well as // comments
+C_COMMENTS = ("//", "/*", "* ", "*/")
+
+
+def statement_pattern(loops, conditionals, exceptions):
+    """
+    Leading keyword of a stripped code line, one group per kind:
+    (loop, conditional, exception). An empty kind never matches.
+    """
+    groups = ["|".join(words) or "(?!)" for words in (loops, conditionals, exceptions)]
+    return re.compile(r'^(?:({})|({})|({}))\b'.format(*groups), re.M)
+
+
+class Language:
+    """
+    What the line scanner needs to know about one language.
+
+    `imports` and `statements` run over the file's stripped code lines
+    joined by newlines (re.M), counting at most one match per line.
+    `docstrings` turns on Python triple-quote handling; `doc_comment` is
+    the prefix of a documentation comment in other languages. With
+    `braces`, nesting depth is the running { } balance. `region_start`
+    marks a top-level definition for incremental.split_regions().
+    """
+
+    __slots__ = ("name", "extensions", "keywords", "comment_prefixes", "docstrings",
+                 "doc_comment", "braces", "imports", "statements", "region_start")
+
+    def __init__(self, name, extensions, keywords, comment_prefixes=(), docstrings=False,
+                 doc_comment=None, braces=False, imports=None, statements=None, region_start=None):
+        self.name = name
+        self.extensions = tuple(extensions)
+        self.keywords = keywords
+        self.comment_prefixes = tuple(comment_prefixes)
+        self.docstrings = docstrings
+        self.doc_comment = doc_comment
+        self.braces = braces
+        self.imports = re.compile(imports, re.M) if imports else None
+        self.statements = statements
+        self.region_start = re.compile(region_start) if region_start else None
+
+    def __repr__(self):
+        return f"Language({self.name!r})"
+
+
+# Files with an unregistered extension still get line, token and lizard
+# metrics, and statements by the most common keywords, but no comments,
+# keywords or imports.
+UNKNOWN = Language("Unknown", (), set(), statements=statement_pattern(
+    ("for", "while"), ("if", "elif", "else"), ("try", "except", "catch", "finally")))
+
+_packs = {}
+
+
+def load(module):
+    """The Language of one pack, importing it on first use."""
+    language = _packs.get(module)
+    if language is None:
+        language = _packs[module] = importlib.import_module(f"{__name__}.{module}").language
+    return language
+
+
+def for_path(path):
+    """Language of a file by extension, UNKNOWN if no pack handles it."""
+    module = EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    return load(module) if module else UNKNOWN
+
+
+def extensions():
+    return tuple(EXTENSIONS)
+
+
+def loaded():
+    """Names of the packs imported so far in this process."""
+    return sorted(language.name for language in _packs.values())
+
+
+def group_by_language(items, key=None):
+    """
+    Order `items` so files of one language are adjacent (stable within a
+    language), for better cache locality in a batch. `key` maps an item
+    to its path. Returns the permutation as a list of indexes into
+    `items`, so callers can put results back in input order.
+    """
+    key = key or (lambda item: item)
+    modules = [EXTENSIONS.get(os.path.splitext(key(item))[1].lower(), "") for item in items]
+    return sorted(range(len(items)), key=modules.__getitem__)
@@ -0,0 +1,23 @@
+from languages import C_COMMENTS, Language, statement_pattern
+
+language = Language(
+    name="C/C++",
+    extensions=(".c", ".h", ".cc", ".cpp", ".cxx", ".hpp"),
+    keywords={
+        "alignas", "alignof", "auto", "bool", "break", "case", "catch", "char", "class",
+        "const", "constexpr", "const_cast", "continue", "decltype", "default", "delete", "do",
+        "double", "dynamic_cast", "else", "enum", "explicit", "extern", "false", "float", "for",
+        "friend", "goto", "if", "inline", "int", "long", "mutable", "namespace", "new",
+        "noexcept", "nullptr", "operator", "private", "protected", "public", "register",
+        "reinterpret_cast", "return", "short", "signed", "sizeof", "static", "static_assert",
+        "static_cast", "struct", "switch", "template", "this", "throw", "true", "try", "typedef",
+        "typename", "union", "unsigned", "using", "virtual", "void", "volatile", "while",
+    },
+    comment_prefixes=C_COMMENTS,
+    doc_comment="/**",
+    braces=True,
+    imports=r'^#\s*(?:include|import)\b',
+    statements=statement_pattern(("for", "while", "do"), ("if", "else", "switch", "case"), ("try", "catch")),
+    # Type definitions and anything that looks like a function head
+    region_start=r'(?:template\b|class\b|struct\b|namespace\b|[A-Za-z_][\w\s\*&:<>,]*\()',
+)
@@ -0,0 +1,19 @@
+from languages import C_COMMENTS, Language, statement_pattern
+
+language = Language(
+    name="Go",
+    extensions=(".go",),
+    keywords={
+        "break", "case", "chan", "const", "continue", "default", "defer", "else",
+        "fallthrough", "for", "func", "go", "goto", "if", "import", "interface", "map",
+        "package", "range", "return", "select", "struct", "switch", "type", "var",
+        "true", "false", "nil",
+    },
+    comment_prefixes=C_COMMENTS,
+    braces=True,
+    # One per imported path: import [alias] "x", or [alias] "x" inside import ( ... )
+    imports=r'^(?:import\s+)?(?:[\w.]+\s+)?"[^"]*"$',
+    # defer/panic/recover are the nearest Go has to try/catch/finally
+    statements=statement_pattern(("for",), ("if", "else", "switch", "select", "case"), ("defer", "panic", "recover")),
+    region_start=r'(?:func|type)\b',
+)
@@ -0,0 +1,22 @@
+from languages import C_COMMENTS, Language, statement_pattern
+
+language = Language(
+    name="Java",
+    extensions=(".java",),
+    keywords={
+        "abstract", "assert", "boolean", "break", "byte", "case", "catch", "char", "class",
+        "const", "continue", "default", "do", "double", "else", "enum", "extends", "final",
+        "finally", "float", "for", "goto", "if", "implements", "import", "instanceof", "int",
+        "interface", "long", "native", "new", "package", "private", "protected", "public",
+        "return", "short", "static", "strictfp", "super", "switch", "synchronized", "this",
+        "throw", "throws", "transient", "try", "void", "volatile", "while", "var", "record",
+        "yield", "true", "false", "null",
+    },
+    comment_prefixes=C_COMMENTS,
+    doc_comment="/**",
+    braces=True,
+    imports=r'^import\b',
+    statements=statement_pattern(("for", "while", "do"), ("if", "else", "switch", "case"), ("try", "catch", "finally")),
+    region_start=r'(?:(?:public|protected|private|abstract|final|sealed|static)\s+)*'
+                 r'(?:class|interface|enum|record|@interface)\b',
+)
@@ -0,0 +1,15 @@
+from keywords import js_kw
+from languages import Language, statement_pattern
+
+# Kept to the rules the shipped model's JavaScript rows were extracted
+# with: // comments only, no JSDoc detection, ES modules and require().
+language = Language(
+    name="JavaScript",
+    extensions=(".js", ".mjs", ".cjs", ".jsx"),
+    keywords=js_kw,
+    comment_prefixes=("//",),
+    braces=True,
+    imports=r'^(?:import|.*require)',
+    statements=statement_pattern(("for", "while"), ("if", "elif", "else"), ("try", "except", "catch", "finally")),
+    region_start=r'(?:export\s+(?:default\s+)?)?(?:async\s+)?(?:function|class)\b',
+)
@@ -0,0 +1,14 @@
+from keywords import py_kw
+from languages import Language, statement_pattern
+
+language = Language(
+    name="Python",
+    extensions=(".py",),
+    keywords=py_kw,
+    comment_prefixes=("#",),
+    docstrings=True,
+    imports=r'^(?:import|from)',
+    statements=statement_pattern(("for", "while"), ("if", "elif", "else"), ("try", "except", "catch", "finally")),
+    # Decorators belong to the definition below them
+    region_start=r'(?:@|(?:async\s+)?def\b|class\b)',
+)
@@ -0,0 +1,20 @@
+from languages import C_COMMENTS, Language, statement_pattern
+
+language = Language(
+    name="Rust",
+    extensions=(".rs",),
+    keywords={
+        "as", "async", "await", "break", "const", "continue", "crate", "dyn", "else", "enum",
+        "extern", "false", "fn", "for", "if", "impl", "in", "let", "loop", "match", "mod",
+        "move", "mut", "pub", "ref", "return", "self", "Self", "static", "struct", "super",
+        "trait", "true", "type", "unsafe", "use", "where", "while",
+    },
+    comment_prefixes=C_COMMENTS,
+    doc_comment="///",
+    braces=True,
+    imports=r'^(?:pub\s+)?(?:use|extern\s+crate)\b',
+    # No exceptions: errors are values (Result) in Rust
+    statements=statement_pattern(("for", "while", "loop"), ("if", "else", "match"), ()),
+    region_start=r'(?:#\[|(?:pub(?:\([^)]*\))?\s+)?(?:(?:async|unsafe|const|extern)\s+)*'
+                 r'(?:fn|struct|enum|impl|trait|mod|union|type)\b)',
+)
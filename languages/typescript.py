@@ -0,0 +1,19 @@
+from keywords import js_kw
+from languages import C_COMMENTS, Language, statement_pattern
+
+language = Language(
+    name="TypeScript",
+    extensions=(".ts", ".tsx"),
+    keywords=js_kw | {
+        "abstract", "any", "as", "async", "await", "boolean", "declare", "enum", "implements",
+        "interface", "keyof", "let", "namespace", "never", "number", "private", "protected",
+        "public", "readonly", "static", "string", "type", "unknown", "void",
+    },
+    comment_prefixes=C_COMMENTS,
+    doc_comment="/**",
+    braces=True,
+    imports=r'^(?:import\b|.*\brequire\()',
+    statements=statement_pattern(("for", "while", "do"), ("if", "else", "switch", "case"), ("try", "catch", "finally")),
+    region_start=r'(?:export\s+(?:default\s+)?)?(?:declare\s+)?(?:abstract\s+)?(?:async\s+)?'
+                 r'(?:function|class|interface|enum|type|namespace)\b',
+)
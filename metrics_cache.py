@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from extract import EXTRACTOR_VERSION, PYTHON_ENGINE
+
+CACHE_DB = "metrics_cache.db"
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+COMMIT_EVERY = 500  # writes per transaction, so a crash loses at most this many
+
+
+def cache_version():
+    """
+    Any change to extract.py logic bumps EXTRACTOR_VERSION; the Python engine
+    and a lizard upgrade can change the numbers too, so all are part of the key.
+    The engine comes last: see MetricsCache.
+    """
+    import lizard  # heavy, and extract.py imports it lazily too
+
+    return f"{EXTRACTOR_VERSION}-lizard{lizard.version}-{PYTHON_ENGINE}"
+
+
+def file_hash(filepath):
+    """MD5 of the file bytes, the same value fetch.py records as content_hash."""
+    with open(filepath, "rb") as f:
+        return hashlib.md5(f.read()).hexdigest()
+
+
+class MetricsCache:
+    """
+    Persistent extract() results keyed by content hash, extension and version.
+
+    The extension is part of the key because it decides the language.
+    Rows written by another extractor or lizard version are dropped when
+    the cache is opened. Rows for the other Python engine are kept, since
+    codeq, export and the service share the file and each may run with
+    either. The least recently used rows are evicted once the stored
+    metrics exceed `max_bytes`. Writes are committed every
+    `commit_every` puts and lookups.
+    """
+
+    def __init__(self, path=CACHE_DB, max_bytes=MAX_CACHE_BYTES, version=None, commit_every=COMMIT_EVERY):
+        self.max_bytes = max_bytes
+        self.version = version or cache_version()
+        self.commit_every = commit_every
+        self.pending = 0
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS metrics (
+                content_hash TEXT NOT NULL,
+                ext TEXT NOT NULL,
+                version TEXT NOT NULL,
+                metrics TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (content_hash, ext, version)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS metrics_last_used ON metrics (last_used)")
+        release = self.version.rsplit("-", 1)[0] + "-"
+        self.conn.execute(
+            "DELETE FROM metrics WHERE version != ? AND substr(version, 1, ?) != ?",
+            (self.version, len(release), release),
+        )
+        self.conn.commit()
+
+    def get(self, content_hash, filename):
+        """Cached metrics for this content, renamed to `filename`, or None."""
+        ext = os.path.splitext(filename)[1]
+        row = self.conn.execute(
+            "SELECT metrics FROM metrics WHERE content_hash = ? AND ext = ? AND version = ?",
+            (content_hash, ext, self.version),
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.conn.execute(
+            "UPDATE metrics SET last_used = ? WHERE content_hash = ? AND ext = ? AND version = ?",
+            (time.time(), content_hash, ext, self.version),
+        )
+        self.written()
+        return {"filename": os.path.basename(filename), **json.loads(row[0])}
+
+    def put(self, content_hash, metrics):
+        ext = os.path.splitext(metrics["filename"])[1]
+        payload = json.dumps({k: v for k, v in metrics.items() if k != "filename"})
+        self.conn.execute(
+            "INSERT OR REPLACE INTO metrics VALUES (?, ?, ?, ?, ?, ?)",
+            (content_hash, ext, self.version, payload, len(payload), time.time()),
+        )
+        self.written()
+
+    def written(self):
+        self.pending += 1
+        if self.pending >= self.commit_every:
+            self.commit()
+
+    def evict(self):
+        """Drop least recently used rows until the cache fits in max_bytes."""
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM metrics").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        rows = self.conn.execute("SELECT rowid, size FROM metrics ORDER BY last_used").fetchall()
+        to_delete = []
+        for rowid, size in rows:
+            if total <= self.max_bytes:
+                break
+            to_delete.append((rowid,))
+            total -= size
+        self.conn.executemany("DELETE FROM metrics WHERE rowid = ?", to_delete)
+        return len(to_delete)
+
+    def commit(self):
+        self.conn.commit()
+        self.pending = 0
+
+    def close(self):
+        self.evict()
+        self.commit()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
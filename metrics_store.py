@@ -0,0 +1,200 @@
+import csv
+import glob
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+BATCH_SIZE = 200
+NON_FEATURE_COLUMNS = ["filename", "language", "quality"]
+
+# Column types of an extract() row, used for the typed Parquet output.
+COLUMN_TYPES = {
+    "filename": "string",
+    "language": "string",
+    "lines_of_code": "int64",
+    "num_functions": "int64",
+    "num_comments": "int64",
+    "comment_ratio": "float64",
+    "avg_line_length": "float64",
+    "max_line_length": "int64",
+    "indentation_consistency": "float64",
+    "nesting_depth": "int64",
+    "cyclomatic_complexity": "float64",
+    "num_imports": "int64",
+    "num_loops": "int64",
+    "num_conditionals": "int64",
+    "num_exceptions": "int64",
+    "has_docstring": "int64",
+    "avg_tokens_per_line": "float64",
+    "keyword_density": "float64",
+    "blank_lines_ratio": "float64",
+    "avg_identifier_quality": "float64",
+    "avg_all_identifier_quality": "float64",
+}
+
+
+def is_parquet(path):
+    return path.endswith(".parquet")
+
+
+def import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("Parquet output needs pyarrow: pip install pyarrow") from e
+    return pyarrow
+
+
+def arrow_schema(columns):
+    pa = import_pyarrow()
+    return pa.schema([(col, COLUMN_TYPES.get(col, "float64")) for col in columns])
+
+
+class MetricsWriter:
+    """
+    Append metrics rows to disk in batches as they are produced.
+
+    CSV output is a single append-only file. Parquet output is a directory
+    of part files, each written atomically, so a crash never corrupts what
+    was already flushed. With resume=True existing output is kept and
+    `done` holds the filenames already written, so the caller can skip them.
+    """
+
+    def __init__(self, path, batch_size=BATCH_SIZE, resume=False):
+        self.path = path
+        self.batch_size = batch_size
+        self.rows = []
+        self.columns = None
+        self.written = 0
+        self.done = set()
+
+        if resume and os.path.exists(path):
+            if not is_parquet(path):
+                drop_partial_line(path)
+            self.columns = read_columns(path)
+            self.done = set(read_metrics(path, columns=["filename"])["filename"])
+        elif os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+        if is_parquet(path):
+            os.makedirs(path, exist_ok=True)
+            self.parts = len(glob.glob(os.path.join(path, "part-*.parquet")))
+
+    def write(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        if self.columns is None:
+            self.columns = list(self.rows[0])
+        if is_parquet(self.path):
+            self.flush_parquet()
+        else:
+            self.flush_csv()
+        self.written += len(self.rows)
+        self.rows = []
+
+    def flush_csv(self):
+        new_file = not os.path.exists(self.path)
+        with open(self.path, "a", newline="", encoding="utf-8") as f:
+            # A resumed file keeps its original columns
+            writer = csv.DictWriter(f, fieldnames=self.columns, extrasaction="ignore")
+            if new_file:
+                writer.writeheader()
+            writer.writerows(self.rows)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def flush_parquet(self):
+        pa = import_pyarrow()
+        table = pa.Table.from_pylist(self.rows, schema=arrow_schema(self.columns))
+        name = f"part-{self.parts:05d}.parquet"
+        # Underscore-prefixed files are ignored by Parquet dataset readers
+        tmp = os.path.join(self.path, f"_{name}.tmp")
+        pa.parquet.write_table(table, tmp)
+        os.replace(tmp, os.path.join(self.path, name))
+        self.parts += 1
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def drop_partial_line(path):
+    """Cut a CSV back to its last complete row after an interrupted write."""
+    with open(path, "r+b") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+def read_columns(path):
+    """Column names of a metrics file without reading its rows."""
+    if is_parquet(path):
+        pa = import_pyarrow()
+        parts = sorted(glob.glob(os.path.join(path, "part-*.parquet")))
+        return pa.parquet.read_schema(parts[0]).names if parts else []
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return next(csv.reader(f), [])
+
+
+def read_metrics(path, columns=None):
+    """Metrics table as a DataFrame from either CSV or a Parquet directory."""
+    if is_parquet(path):
+        return pd.read_parquet(path, columns=columns)
+    return pd.read_csv(path, usecols=columns)
+
+
+def feature_columns(columns):
+    return [col for col in columns if col not in NON_FEATURE_COLUMNS]
+
+
+def read_feature_matrix(path, columns=None):
+    """
+    Float64 feature matrix (n_files, n_features) plus its column names.
+
+    For Parquet the typed columns are taken straight from Arrow buffers,
+    with no text parsing; CSV falls back to pandas.
+    """
+    columns = columns or feature_columns(read_columns(path))
+    if is_parquet(path):
+        pa = import_pyarrow()
+        table = pa.parquet.read_table(path, columns=columns).combine_chunks()
+        X = np.empty((table.num_rows, len(columns)), dtype=np.float64, order="F")
+        for i, col in enumerate(columns):
+            X[:, i] = table.column(col).to_numpy()
+        return X, columns
+    return pd.read_csv(path, usecols=columns)[columns].to_numpy(dtype=np.float64), columns
+
+
+def iter_feature_chunks(path, columns=None, chunk_size=10000, with_names=False):
+    """
+    Yield float64 feature matrices of at most `chunk_size` rows, so a
+    metrics file larger than memory can be streamed. With `with_names`,
+    yield (filenames, matrix) pairs instead.
+    """
+    columns = columns or feature_columns(read_columns(path))
+    read = columns + ["filename"] if with_names else columns
+    if is_parquet(path):
+        pa = import_pyarrow()
+        for part in sorted(glob.glob(os.path.join(path, "part-*.parquet"))):
+            for batch in pa.parquet.ParquetFile(part).iter_batches(batch_size=chunk_size, columns=read):
+                X = np.column_stack([batch.column(col).to_numpy().astype(np.float64) for col in columns])
+                yield (batch.column("filename").to_pylist(), X) if with_names else X
+        return
+    for chunk in pd.read_csv(path, usecols=read, chunksize=chunk_size):
+        X = chunk[columns].to_numpy(dtype=np.float64)
+        yield (chunk["filename"].astype(str).tolist(), X) if with_names else X
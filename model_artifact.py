@@ -0,0 +1,133 @@
+"""
+Single-file model artifact for inference.
+
+    python model_artifact.py convert [--model-dir data] [--out data/model.bin]
+
+model.bin holds everything QualityPredictor needs: the feature schema,
+scaler mean/scale, PCA mean and components (whitening already applied),
+the KMeans centroids and the cluster → label mapping. The layout is
+
+    MAGIC | header length (uint32 LE) | JSON header | float64 arrays (LE)
+
+where the header carries the schema, the mapping and each array's
+shape. Loading is one read, a json.loads and np.frombuffer views: no
+unpickling, so a model file cannot run code, and only NumPy is needed.
+The scikit-learn pickles are only read by the converter.
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+ARTIFACT = "model.bin"
+MAGIC = b"CQMODEL\0"
+FORMAT_VERSION = 1
+ARRAYS = ["mean", "scale", "pca_mean", "components", "centers"]
+
+
+def params_from_models(scaler, pca, kmeans, cluster_mapping, feature_columns):
+    """Plain arrays from fitted scikit-learn objects."""
+    n_features = len(feature_columns)
+    components = pca.components_
+    if pca.whiten:
+        components = components / np.sqrt(pca.explained_variance_)[:, np.newaxis]
+    return {
+        "feature_columns": [str(col) for col in feature_columns],
+        "mean": np.asarray(scaler.mean_ if scaler.mean_ is not None else np.zeros(n_features), dtype=np.float64),
+        "scale": np.asarray(scaler.scale_ if scaler.scale_ is not None else np.ones(n_features), dtype=np.float64),
+        "pca_mean": np.asarray(pca.mean_, dtype=np.float64),
+        "components": np.asarray(components, dtype=np.float64),
+        "centers": np.asarray(kmeans.cluster_centers_, dtype=np.float64),
+        "cluster_mapping": {int(k): str(v) for k, v in cluster_mapping.items()},
+    }
+
+
+def params_from_pickles(model_dir, metrics_csv=None):
+    """Read the four joblib pickles (and work out the feature order)."""
+    import joblib
+
+    from metrics_store import feature_columns, read_columns
+
+    scaler = joblib.load(os.path.join(model_dir, "scaler.pkl"))
+    pca = joblib.load(os.path.join(model_dir, "pca.pkl"))
+    kmeans = joblib.load(os.path.join(model_dir, "kmeans.pkl"))
+    cluster_mapping = joblib.load(os.path.join(model_dir, "cluster_mapping.pkl"))
+
+    manifest = os.path.join(model_dir, "manifest.json")
+    if os.path.exists(manifest):
+        with open(manifest, "r", encoding="utf-8") as f:
+            columns = json.load(f)["feature_columns"]
+    elif hasattr(scaler, "feature_names_in_"):
+        columns = list(scaler.feature_names_in_)
+    else:
+        # Header only (or the Parquet schema), not the whole table
+        columns = feature_columns(read_columns(metrics_csv))
+    return params_from_models(scaler, pca, kmeans, cluster_mapping, columns)
+
+
+def save(path, params):
+    arrays = {name: np.ascontiguousarray(params[name], dtype="<f8") for name in ARRAYS}
+    header = {
+        "format_version": FORMAT_VERSION,
+        "feature_columns": params["feature_columns"],
+        "cluster_mapping": {str(k): v for k, v in sorted(params["cluster_mapping"].items())},
+        "arrays": {name: list(array.shape) for name, array in arrays.items()},
+    }
+    header_bytes = json.dumps(header).encode("utf-8")
+    # Pad so the float data starts 8-byte aligned
+    header_bytes += b" " * (-(len(MAGIC) + 4 + len(header_bytes)) % 8)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header_bytes).to_bytes(4, "little"))
+        f.write(header_bytes)
+        for array in arrays.values():
+            f.write(array.tobytes())
+    os.replace(tmp, path)
+
+
+def load(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path}: not a model artifact")
+    header_end = len(MAGIC) + 4 + int.from_bytes(data[len(MAGIC):len(MAGIC) + 4], "little")
+    header = json.loads(data[len(MAGIC) + 4:header_end])
+    if header["format_version"] != FORMAT_VERSION:
+        raise ValueError(f"{path}: model format {header['format_version']}, expected {FORMAT_VERSION}")
+
+    params = {
+        "feature_columns": header["feature_columns"],
+        "cluster_mapping": {int(k): v for k, v in header["cluster_mapping"].items()},
+    }
+    offset = header_end
+    for name, shape in header["arrays"].items():
+        size = int(np.prod(shape))
+        params[name] = np.frombuffer(data, dtype="<f8", count=size, offset=offset).reshape(shape)
+        offset += 8 * size
+    return params
+
+
+def convert(model_dir="data", out=None, metrics_csv=None):
+    out = out or os.path.join(model_dir, ARTIFACT)
+    metrics_csv = metrics_csv or os.path.join(model_dir, "metrics.csv")
+    save(out, params_from_pickles(model_dir, metrics_csv))
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+    convert_parser = sub.add_parser("convert", help="build model.bin from the joblib pickles")
+    convert_parser.add_argument("--model-dir", default="data")
+    convert_parser.add_argument("--out", default=None, help="default: <model-dir>/model.bin")
+    convert_parser.add_argument("--metrics-csv", default=None, help="column order if the scaler doesn't record it")
+    args = parser.parse_args()
+
+    out = convert(args.model_dir, args.out, args.metrics_csv)
+    print(f"✅ Wrote {out} ({os.path.getsize(out)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
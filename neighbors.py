@@ -0,0 +1,337 @@
+"""
+Nearest-neighbour index over the training corpus, in the model's PCA space.
+
+    python neighbors.py build [--metrics data/metrics.csv] [--model-dir data]
+    python neighbors.py query FILE [-k 5]
+
+The index lives in `neighbors/` next to the model it was built for
+(data/ or the current data/models/vNNNN/, which train.py fills in). It
+holds every corpus row, sorted by cluster:
+
+    features.npy  raw feature vectors (float32, memory-mapped on load)
+    points.npy    their PCA projection (float32)
+    names.txt     one filename per row
+    meta.json     feature columns, each cluster's row range, the
+                  within-cluster variance and a fingerprint of the model
+
+Building streams the metrics in chunks and spills each cluster's rows to
+its own temp files, so memory stays bounded. A search covers all rows
+at once, or only the slices of the requested clusters (nearest "Good"
+files, say). Up to BRUTE_FORCE_ROWS rows it uses blocked NumPy
+distances, which take tens of microseconds at corpus size. Beyond that
+it uses a KD-tree, built the first time it is needed.
+
+Besides the neighbours, the index gives the distance to each centroid
+and a continuous score: the label scores weighted by each cluster's
+posterior under a spherical Gaussian with the corpus' within-cluster
+variance.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import warnings
+
+import numpy as np
+
+from metrics_store import iter_feature_chunks
+from predict import METRICS_CSV, MODEL_DIR, current_model_dir, get_predictor
+
+INDEX_DIR = "neighbors"
+CHUNK_SIZE = 10000
+BRUTE_FORCE_ROWS = 50000
+BLOCK_ROWS = 65536
+LABEL_SCORES = {"Good": 85, "Average": 65, "Bad": 40}
+LABEL_GRADES = {"Good": "A", "Average": "B", "Bad": "C"}
+
+
+def fingerprint(predictor):
+    """Identifies the model an index was projected with."""
+    digest = hashlib.sha1(json.dumps(predictor.feature_columns).encode("utf-8"))
+    for array in (predictor.proj_weight, predictor.proj_bias, predictor.centers):
+        digest.update(np.ascontiguousarray(array, dtype=np.float64).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def index_path(model_dir=MODEL_DIR):
+    return os.path.join(current_model_dir(model_dir), INDEX_DIR)
+
+
+def metrics_chunks(path, predictor, chunk_size=CHUNK_SIZE):
+    """(filenames, feature matrix) chunks of a metrics CSV / Parquet directory."""
+    return iter_feature_chunks(path, predictor.feature_columns, chunk_size, with_names=True)
+
+
+def build(chunks, predictor, out):
+    """Write an index of the (filenames, feature matrix) `chunks` to `out`."""
+    n_clusters = len(predictor.centers)
+    tmp = f"{out}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    spills = [
+        (open(os.path.join(tmp, f"{c}.features"), "wb"),
+         open(os.path.join(tmp, f"{c}.points"), "wb"),
+         open(os.path.join(tmp, f"{c}.names"), "w", encoding="utf-8"))
+        for c in range(n_clusters)
+    ]
+    counts = np.zeros(n_clusters, dtype=np.int64)
+    squared_error = 0.0
+    try:
+        for names, X in chunks:
+            P = predictor.project(X)
+            distances = predictor.centroid_distances(X)
+            clusters = distances.argmin(axis=1)
+            squared_error += float(np.sum(distances[np.arange(len(X)), clusters] ** 2))
+            for c in range(n_clusters):
+                rows = np.flatnonzero(clusters == c)
+                if not len(rows):
+                    continue
+                features, points, names_file = spills[c]
+                features.write(X[rows].astype(np.float32).tobytes())
+                points.write(P[rows].astype(np.float32).tobytes())
+                names_file.writelines(names[i].replace("\n", " ") + "\n" for i in rows)
+                counts[c] += len(rows)
+    finally:
+        for files in spills:
+            for f in files:
+                f.close()
+
+    n_rows = int(counts.sum())
+    n_features = len(predictor.feature_columns)
+    n_components = predictor.proj_weight.shape[1]
+    for kind, width in [("features", n_features), ("points", n_components)]:
+        merged = np.lib.format.open_memmap(os.path.join(tmp, f"{kind}.npy"), mode="w+",
+                                           dtype=np.float32, shape=(n_rows, width))
+        start = 0
+        for c in range(n_clusters):
+            spill = os.path.join(tmp, f"{c}.{kind}")
+            if counts[c]:
+                part = np.memmap(spill, dtype=np.float32, mode="r", shape=(int(counts[c]), width))
+                for i in range(0, len(part), BLOCK_ROWS):
+                    block = part[i:i + BLOCK_ROWS]
+                    merged[start + i:start + i + len(block)] = block
+                del part
+            os.remove(spill)
+            start += int(counts[c])
+        merged.flush()
+        del merged
+    with open(os.path.join(tmp, "names.txt"), "w", encoding="utf-8") as out_file:
+        for c in range(n_clusters):
+            spill = os.path.join(tmp, f"{c}.names")
+            with open(spill, "r", encoding="utf-8") as f:
+                shutil.copyfileobj(f, out_file)
+            os.remove(spill)
+
+    bounds = np.concatenate([[0], np.cumsum(counts)]).tolist()
+    meta = {
+        "feature_columns": predictor.feature_columns,
+        "rows": n_rows,
+        "clusters": [[bounds[c], bounds[c + 1]] for c in range(n_clusters)],
+        "cluster_variance": squared_error / max(1, n_rows * n_components),
+        "fingerprint": fingerprint(predictor),
+    }
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    if os.path.exists(out):
+        old = f"{out}.old"
+        shutil.rmtree(old, ignore_errors=True)
+        os.replace(out, old)
+        os.replace(tmp, out)
+        shutil.rmtree(old)
+    else:
+        os.replace(tmp, out)
+    return out
+
+
+def index_rows(path, chunk_size=CHUNK_SIZE):
+    """
+    The corpus an index was built from, as (filenames, float64 features)
+    chunks; lets a retrained model be indexed without the metrics files.
+    """
+    features = np.load(os.path.join(path, "features.npy"), mmap_mode="r")
+    with open(os.path.join(path, "names.txt"), "r", encoding="utf-8") as f:
+        names = f.read().splitlines()
+    for start in range(0, len(features), chunk_size):
+        yield names[start:start + chunk_size], np.asarray(features[start:start + chunk_size], dtype=np.float64)
+
+
+def has_index(path):
+    return os.path.exists(os.path.join(path, "meta.json"))
+
+
+class NeighborIndex:
+    """
+    k-nearest corpus files and centroid distances for one model.
+
+    Distances are Euclidean in the model's (whitened) PCA space, the one
+    KMeans clustered in.
+    """
+
+    def __init__(self, path, predictor):
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["fingerprint"] != fingerprint(predictor):
+            raise ValueError(f"{path} was built for a different model; run `python neighbors.py build`")
+        self.predictor = predictor
+        self.features = np.load(os.path.join(path, "features.npy"), mmap_mode="r")
+        self.points = np.load(os.path.join(path, "points.npy")).astype(np.float64)
+        self.sq_norms = np.einsum("ij,ij->i", self.points, self.points)
+        with open(os.path.join(path, "names.txt"), "r", encoding="utf-8") as f:
+            self.names = f.read().splitlines()
+        self.ranges = [tuple(bounds) for bounds in meta["clusters"]]
+        self.starts = np.array([start for start, _ in self.ranges])
+        self.variance = meta["cluster_variance"]
+        self.trees = {}
+
+    def __len__(self):
+        return len(self.points)
+
+    def search_slice(self, P, k, start, end):
+        """(squared distances, row indexes) of the k nearest rows in [start, end), ascending."""
+        k = min(k, end - start)
+        if end - start > BRUTE_FORCE_ROWS:
+            tree = self.trees.get((start, end))
+            if tree is None:
+                from sklearn.neighbors import KDTree
+                tree = self.trees[(start, end)] = KDTree(self.points[start:end])
+            distances, rows = tree.query(P, k=k)
+            return distances ** 2, rows + start
+
+        query_norms = np.einsum("ij,ij->i", P, P)[:, np.newaxis]
+        best_d2 = best_rows = None
+        for block_start in range(start, end, BLOCK_ROWS):
+            block_end = min(block_start + BLOCK_ROWS, end)
+            d2 = self.sq_norms[block_start:block_end] - 2 * P @ self.points[block_start:block_end].T + query_norms
+            rows = np.broadcast_to(np.arange(block_start, block_end), d2.shape)
+            if best_d2 is not None:
+                d2 = np.concatenate([best_d2, d2], axis=1)
+                rows = np.concatenate([best_rows, rows], axis=1)
+            if d2.shape[1] > k:
+                keep = np.argpartition(d2, k - 1, axis=1)[:, :k]
+                d2 = np.take_along_axis(d2, keep, axis=1)
+                rows = np.take_along_axis(rows, keep, axis=1)
+            best_d2, best_rows = d2, rows
+        order = np.argsort(best_d2, axis=1)
+        return np.maximum(np.take_along_axis(best_d2, order, axis=1), 0), np.take_along_axis(best_rows, order, axis=1)
+
+    def search(self, P, k=5, clusters=None):
+        """
+        (distances, row indexes) of the k nearest corpus rows to each
+        projected row of P, optionally only within `clusters`.
+        """
+        P = np.atleast_2d(P)
+        if clusters is None:
+            # One search over everything: a per-cluster tree prunes badly
+            # when the query sits in another cluster
+            spans = [(0, len(self))] if len(self) else []
+        else:
+            spans = [self.ranges[c] for c in sorted(clusters) if self.ranges[c][1] > self.ranges[c][0]]
+        if not spans:
+            return np.empty((len(P), 0)), np.empty((len(P), 0), dtype=np.int64)
+        parts = [self.search_slice(P, k, start, end) for start, end in spans]
+        if len(parts) == 1:
+            d2, rows = parts[0]
+            return np.sqrt(d2), rows
+        d2 = np.concatenate([d for d, _ in parts], axis=1)
+        rows = np.concatenate([r for _, r in parts], axis=1)
+        order = np.argsort(d2, axis=1)[:, :k]
+        return np.sqrt(np.take_along_axis(d2, order, axis=1)), np.take_along_axis(rows, order, axis=1)
+
+    def cluster_of(self, row):
+        return int(np.searchsorted(self.starts, row, side="right") - 1)
+
+    def neighbor(self, row, distance):
+        cluster = self.cluster_of(row)
+        return {
+            "filename": self.names[row],
+            "cluster": cluster,
+            "label": self.predictor.cluster_mapping.get(cluster, "Unknown"),
+            "distance": float(distance),
+            "metrics": dict(zip(self.predictor.feature_columns, self.features[row].tolist())),
+        }
+
+    def nearest(self, metrics, k=5, label=None):
+        """The k most similar corpus files to a metrics dict, optionally only those labelled `label`."""
+        P = self.predictor.project(self.predictor.vectorize(metrics))
+        clusters = None
+        if label is not None:
+            clusters = [c for c, name in self.predictor.cluster_mapping.items() if name == label]
+        distances, rows = self.search(P, k, clusters)
+        return [self.neighbor(int(row), distance) for row, distance in zip(rows[0], distances[0])]
+
+    def score(self, distances):
+        """Continuous 0-100 score from the distances to each centroid."""
+        logits = -np.asarray(distances) ** 2 / (2 * self.variance)
+        weights = np.exp(logits - logits.max())
+        weights /= weights.sum()
+        scores = [LABEL_SCORES.get(self.predictor.cluster_mapping.get(c), LABEL_SCORES["Bad"])
+                  for c in range(len(weights))]
+        return float(weights @ scores)
+
+    def explain(self, metrics, k=5):
+        """Cluster, label, continuous score, centroid distances and nearest files for a metrics dict."""
+        x = self.predictor.vectorize(metrics)
+        distances = self.predictor.centroid_distances(x)
+        cluster = int(distances.argmin())
+        return {
+            "cluster": cluster,
+            "label": self.predictor.cluster_mapping.get(cluster, "Unknown"),
+            "score": self.score(distances),
+            "centroid_distances": {
+                self.predictor.cluster_mapping.get(c, str(c)): float(d) for c, d in enumerate(distances)
+            },
+            "neighbors": self.nearest(metrics, k),
+        }
+
+
+def load_index(predictor=None, model_dir=MODEL_DIR):
+    """The index for the current model, or None if there is none (or it is stale)."""
+    predictor = predictor or get_predictor(model_dir)
+    path = index_path(model_dir)
+    if not has_index(path):
+        return None
+    try:
+        return NeighborIndex(path, predictor)
+    except ValueError as e:
+        warnings.warn(str(e))
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_parser = sub.add_parser("build", help="index a metrics file under the current model")
+    build_parser.add_argument("--metrics", default=METRICS_CSV, help="metrics CSV or *.parquet directory")
+    build_parser.add_argument("--model-dir", default=MODEL_DIR)
+    build_parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    query_parser = sub.add_parser("query", help="explain one source file")
+    query_parser.add_argument("file")
+    query_parser.add_argument("-k", type=int, default=5)
+    query_parser.add_argument("--model-dir", default=MODEL_DIR)
+    args = parser.parse_args()
+
+    predictor = get_predictor(args.model_dir)
+    if args.command == "build":
+        out = build(metrics_chunks(args.metrics, predictor, args.chunk_size), predictor, index_path(args.model_dir))
+        with open(os.path.join(out, "meta.json"), "r", encoding="utf-8") as f:
+            print(f"✅ Indexed {json.load(f)['rows']} rows in {out}")
+        return
+
+    index = load_index(predictor, args.model_dir)
+    if index is None:
+        raise SystemExit("No neighbour index for the current model; run `python neighbors.py build`")
+    from extract import extract
+    result = index.explain(extract(args.file), k=args.k)
+    print(f"{args.file}: {result['label']} (score {result['score']:.1f})")
+    for label, distance in result["centroid_distances"].items():
+        print(f"  distance to {label:8} centroid: {distance:.3f}")
+    print("Most similar corpus files:")
+    for n in result["neighbors"]:
+        print(f"  {n['distance']:7.3f}  {n['label']:8} {n['filename']}")
+
+
+if __name__ == "__main__":
+    main()
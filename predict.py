@@ -1,38 +1,193 @@
-from extract import extract
-import joblib
-import pandas as pd
+from extract import extract, extract_source
+import functools
+import instrument
+import itertools
+import languages
+import model_artifact
+import os
+from multiprocessing import Pool
+import numpy as np
 import warnings
 
 warnings.filterwarnings("ignore", category=UserWarning)
 
+MODEL_DIR = "data"
+METRICS_CSV = os.path.join(MODEL_DIR, "metrics.csv")
+# Versioned models written by train.py; CURRENT names the one in use
+VERSIONS_DIR = os.path.join(MODEL_DIR, "models")
+MANIFEST = "manifest.json"
 
-def predict_code_quality(filepath, metrics_csv='data/metrics.csv'):
-    # Load trained models
-    scaler = joblib.load("data/scaler.pkl")
-    pca = joblib.load("data/pca.pkl")
-    kmeans = joblib.load("data/kmeans.pkl")
-    cluster_mapping = joblib.load("data/cluster_mapping.pkl")
 
-    # Load training feature columns
-    train_df = pd.read_csv(metrics_csv)
-    cols_to_drop = [col for col in ["filename", "language"] if col in train_df.columns]
-    feature_columns = [col for col in train_df.columns if col not in cols_to_drop]
+def current_model_dir(model_dir=MODEL_DIR):
+    """The current trained version under `model_dir`, else `model_dir` itself."""
+    current = os.path.join(model_dir, "models", "CURRENT")
+    if os.path.exists(current):
+        with open(current, "r", encoding="utf-8") as f:
+            return os.path.join(model_dir, "models", f.read().strip())
+    return model_dir
 
-    # Extract features from new code
-    new_code_features = extract(filepath)
 
-    # Convert to DataFrame
-    X_new_df = pd.DataFrame([new_code_features], columns=feature_columns)
+class QualityPredictor:
+    """
+    Long-lived predictor that loads the trained model once, from model.bin
+    (see model_artifact.py) or else the scikit-learn pickles.
 
-    # Ensure correct datatype
-    if "has_docstring" in X_new_df.columns:
-        X_new_df["has_docstring"] = X_new_df["has_docstring"].astype(int)
+    The scaler → PCA → KMeans chain is folded into plain matrices at load
+    time so a prediction is a couple of small matrix products:
 
-    # Scale → PCA → Predict
-    X_new_scaled = scaler.transform(X_new_df)
-    X_new_pca = pca.transform(X_new_scaled)
+        projection = x @ proj_weight + proj_bias         (scaled + PCA)
+        cluster    = argmax(x @ score_weight + score_bias)
 
-    cluster = kmeans.predict(X_new_pca)[0]
-    label = cluster_mapping.get(cluster, "Unknown")
+    where the score is -0.5 * squared distance to each centroid with the
+    per-row constant dropped, which keeps the same argmin as KMeans.
+    """
 
-    return cluster, label
+    def __init__(self, model_dir=MODEL_DIR, metrics_csv=METRICS_CSV, params=None):
+        if params is None:
+            params = load_model_params(model_dir, metrics_csv)
+        self.feature_columns = params["feature_columns"]
+        self.cluster_mapping = params["cluster_mapping"]
+        mean, scale = params["mean"], params["scale"]
+        components = params["components"]
+
+        # ((x - mean) / scale - pca.mean_) @ components.T
+        self.proj_weight = (components / scale).T
+        self.proj_bias = -(mean / scale + params["pca_mean"]) @ components.T
+
+        centers = params["centers"]
+        self.centers = centers
+        self.score_weight = self.proj_weight @ centers.T
+        self.score_bias = self.proj_bias @ centers.T - 0.5 * np.einsum("ij,ij->i", centers, centers)
+
+    def vectorize(self, metrics):
+        """Order a metrics dict into the training feature vector."""
+        return np.array([float(metrics[col]) for col in self.feature_columns])
+
+    def project(self, X):
+        """Scaled + PCA-reduced features for one vector or a matrix of rows."""
+        return X @ self.proj_weight + self.proj_bias
+
+    def predict_vector(self, x):
+        cluster = int(np.argmax(x @ self.score_weight + self.score_bias))
+        return cluster, self.cluster_mapping.get(cluster, "Unknown")
+
+    def predict_matrix(self, X):
+        """Cluster ids for a (n_files, n_features) matrix in one pass."""
+        with instrument.stage("predict_batch"):
+            return np.argmax(X @ self.score_weight + self.score_bias, axis=1)
+
+    def centroid_distances(self, X):
+        """
+        Euclidean distance to every KMeans centroid in PCA space, for one
+        vector or a matrix of rows: ||p - c||^2 = ||p||^2 - 2 * score.
+        """
+        P = self.project(X)
+        d2 = np.einsum("...i,...i->...", P, P)[..., np.newaxis] - 2 * (X @ self.score_weight + self.score_bias)
+        return np.sqrt(np.maximum(d2, 0))
+
+    def predict_metrics(self, metrics):
+        # Scaling, PCA and KMeans are one fused product, so they are timed as one stage
+        with instrument.stage("predict"):
+            return self.predict_vector(self.vectorize(metrics))
+
+    def predict_file(self, filepath):
+        return self.predict_metrics(extract(filepath))
+
+    def predict_source(self, code, filename="snippet.py"):
+        return self.predict_metrics(extract_source(code, filename))
+
+    def predict_many(self, items, chunk_size=1000, processes=None):
+        """
+        Score many files, yielding (name, metrics, cluster, label) per item.
+
+        `items` may mix file paths and (filename, source) tuples. Items are
+        consumed `chunk_size` at a time: each chunk is extracted across a
+        process pool, stacked into one matrix and predicted in a single
+        pass, so memory stays bounded however long the input is. Within a
+        chunk, files are handed to the pool grouped by language so each
+        worker batch stays on one language pack; results still come out in
+        input order. Files that fail to extract are yielded with None for
+        metrics and cluster.
+        """
+        processes = processes or os.cpu_count() or 1
+        items = iter(items)
+        pool = Pool(processes=processes, initializer=instrument.reset) if processes > 1 else None
+        try:
+            while True:
+                chunk = list(itertools.islice(items, chunk_size))
+                if not chunk:
+                    break
+                order = languages.group_by_language(chunk, key=item_name)
+                grouped = [chunk[i] for i in order]
+                if pool is not None and instrument.enabled:
+                    grouped_results = []
+                    for metrics, stats in pool.map(extract_item_with_stats, grouped, chunksize=max(1, len(chunk) // (4 * processes))):
+                        instrument.merge(stats)
+                        grouped_results.append(metrics)
+                elif pool is not None:
+                    grouped_results = pool.map(extract_item, grouped, chunksize=max(1, len(chunk) // (4 * processes)))
+                else:
+                    grouped_results = [extract_item(item) for item in grouped]
+                results = [None] * len(chunk)
+                for i, metrics in zip(order, grouped_results):
+                    results[i] = metrics
+
+                ok = [m for m in results if m is not None]
+                clusters = self.predict_matrix(np.array([self.vectorize(m) for m in ok])) if ok else []
+                clusters = iter(clusters)
+                for item, metrics in zip(chunk, results):
+                    name = item_name(item)
+                    if metrics is None:
+                        yield name, None, None, None
+                        continue
+                    cluster = int(next(clusters))
+                    yield name, metrics, cluster, self.cluster_mapping.get(cluster, "Unknown")
+        finally:
+            if pool is not None:
+                pool.terminate()
+
+
+def load_model_params(model_dir=MODEL_DIR, metrics_csv=METRICS_CSV):
+    """
+    Model arrays from model.bin when the (current) model directory has
+    one, otherwise from the scikit-learn pickles.
+    """
+    model_dir = current_model_dir(model_dir)
+    artifact = os.path.join(model_dir, model_artifact.ARTIFACT)
+    if os.path.exists(artifact):
+        return model_artifact.load(artifact)
+    return model_artifact.params_from_pickles(model_dir, metrics_csv)
+
+
+def item_name(item):
+    """File name of a predict_many() item: a path or a (filename, source) tuple."""
+    return item[0] if isinstance(item, tuple) else item
+
+
+def extract_item(item):
+    """Metrics for a path or a (filename, source) tuple; None on failure."""
+    try:
+        if isinstance(item, tuple):
+            return extract_source(item[1], item[0])
+        return extract(item)
+    except Exception:
+        return None
+
+
+def extract_item_with_stats(item):
+    """extract_item() plus this worker's stage timings, for merging in the parent."""
+    return extract_item(item), instrument.drain()
+
+
+@functools.lru_cache(maxsize=None)
+def get_predictor(model_dir=MODEL_DIR, metrics_csv=METRICS_CSV):
+    """Process-wide predictor, loaded on first use."""
+    return QualityPredictor(model_dir, metrics_csv)
+
+
+def predict_code_quality(filepath, metrics_csv=METRICS_CSV):
+    return get_predictor(metrics_csv=metrics_csv).predict_file(filepath)
+
+
+def predict_many(items, chunk_size=1000, processes=None):
+    return get_predictor().predict_many(items, chunk_size=chunk_size, processes=processes)
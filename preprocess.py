@@ -1,9 +1,10 @@
-import pandas as pd
+from metrics_store import read_metrics
 from sklearn.preprocessing import StandardScaler
 from sklearn.decomposition import PCA
 
 def preprocess_dataset(csv_path):
-    df = pd.read_csv(csv_path)
+    # csv_path may also be a *.parquet directory written by export.py
+    df = read_metrics(csv_path)
     cols_to_drop = [col for col in ["filename", "language", "quality"] if col in df.columns]
     X = df.drop(columns=cols_to_drop)
     
@@ -0,0 +1,109 @@
+import os
+import posixpath
+import subprocess
+from collections import Counter
+
+from fetch import fetch_repo_files
+from predict import predict_many
+
+# Below this many files a process pool costs more than it saves
+PARALLEL_THRESHOLD = 64
+
+
+def read_local_repo(repo_path, extensions=(".py",), ref="HEAD"):
+    """{path: source} for matching files at `ref` of a local (bare or normal) git repo."""
+    listing = subprocess.run(
+        ["git", "-C", repo_path, "ls-tree", "-r", "-z", ref],
+        capture_output=True, check=True,
+    ).stdout.decode("utf-8", errors="surrogateescape")
+
+    entries = []
+    for record in listing.split("\0"):
+        if not record:
+            continue
+        meta, path = record.split("\t", 1)
+        _, kind, sha = meta.split()
+        if kind == "blob" and path.endswith(tuple(extensions)):
+            entries.append((path, sha))
+    if not entries:
+        return {}
+
+    # One cat-file process streams every blob instead of one call per file
+    batch = subprocess.run(
+        ["git", "-C", repo_path, "cat-file", "--batch"],
+        input="".join(f"{sha}\n" for _, sha in entries).encode(),
+        capture_output=True, check=True,
+    ).stdout
+
+    files = {}
+    pos = 0
+    for path, _ in entries:
+        header_end = batch.index(b"\n", pos)
+        header = batch[pos:header_end].split()
+        if header[-1] == b"missing":
+            pos = header_end + 1
+            continue
+        size = int(header[2])
+        content = batch[header_end + 1:header_end + 1 + size]
+        pos = header_end + 1 + size + 1
+        files[path] = content.decode("utf-8", errors="ignore")
+    return files
+
+
+def rollup(results):
+    """
+    Per-directory summary: file count, label counts and mean metrics.
+    Every file also counts towards all of its parent directories, so "."
+    summarizes the whole repository.
+    """
+    totals = {}
+    for result in results:
+        directory = posixpath.dirname(result["path"])
+        while True:
+            key = directory or "."
+            entry = totals.setdefault(key, {"files": 0, "labels": Counter(), "sums": Counter()})
+            entry["files"] += 1
+            entry["labels"][result["label"]] += 1
+            for k, v in result["metrics"].items():
+                if isinstance(v, (int, float)):
+                    entry["sums"][k] += v
+            if not directory:
+                break
+            directory = posixpath.dirname(directory)
+
+    return {
+        directory: {
+            "files": entry["files"],
+            "labels": dict(entry["labels"]),
+            "mean": {k: v / entry["files"] for k, v in entry["sums"].items()},
+        }
+        for directory, entry in sorted(totals.items())
+    }
+
+
+def analyze_files(files, processes=None):
+    """Score each {path: source} file on its own and roll the results up."""
+    if processes is None and len(files) < PARALLEL_THRESHOLD:
+        processes = 1
+    results = []
+    for path, metrics, cluster, label in predict_many(sorted(files.items()), processes=processes):
+        if metrics is None:
+            continue
+        results.append({"path": path, "cluster": cluster, "label": label, "metrics": metrics})
+    return {"files": results, "directories": rollup(results)}
+
+
+def analyze_repo(repo, extensions=(".py",), processes=None, local=False):
+    """
+    Analyze a GitHub repository URL, or with `local` also a git repository
+    path on this machine. Leave `local` off for untrusted input such as the
+    web app, or anyone could read the host's repositories.
+    Returns None if the repository could not be read.
+    """
+    if local and os.path.isdir(repo):
+        files = read_local_repo(repo, extensions)
+    else:
+        files = fetch_repo_files(repo, extensions)
+    if files is None:
+        return None
+    return analyze_files(files, processes=processes)
@@ -0,0 +1,607 @@
+"""
+Repository quality reports as PDF or HTML.
+
+    python codeq.py path/to/repo > results.ndjson
+    python reports.py results.ndjson --out report.pdf   # or report.html
+
+A report has a summary (grade table, grade histograms, a radar chart of
+each label's mean metrics against the repository's), a per-directory
+table, the files most in need of attention and a table of every file.
+
+The records (codeq's NDJSON, or a list such as repo_analysis's "files")
+are read twice, once to aggregate and once to stream the file table, and
+pages are written as rows arrive rather than laid out from a list of
+flowables. HTML memory is bounded by the number of directories; a PDF
+also holds each finished page's operators (about 0.5 KB per file) until
+reportlab assembles the document on save. Charts are rendered to PNG
+once and cached on disk under the hash of the numbers they plot, so
+rebuilding a report for an unchanged repository skips matplotlib
+entirely.
+
+ReportWorker builds reports on a background thread; the app submits a
+job and polls its progress instead of waiting on it.
+"""
+import argparse
+import base64
+import functools
+import hashlib
+import heapq
+import html
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from collections import Counter
+
+from matplotlib.figure import Figure
+from reportlab import rl_config
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+from neighbors import LABEL_GRADES, LABEL_SCORES
+from repo_analysis import rollup
+
+REPORTS_DIR = "reports"
+CHART_CACHE_DIR = os.path.join("data", "chart_cache")
+CHART_VERSION = "1"  # bump when chart styling changes
+MAX_CACHED_CHARTS = 512
+CHART_DPI = 110
+
+LABELS = ["Good", "Average", "Bad"]
+LABEL_COLORS = {"Good": "#2e7d32", "Average": "#f9a825", "Bad": "#c62828"}
+RADAR_METRICS = [
+    "cyclomatic_complexity",
+    "num_functions",
+    "num_comments",
+    "num_imports",
+    "nesting_depth",
+    "avg_line_length",
+]
+WORST_FILES = 25
+GRADE_DIRECTORIES = 12  # largest top-level directories in the grade chart
+
+# Binary (not ASCII85) page streams: a quarter smaller, and without
+# reportlab's optional C accelerator the encoding was a third of the build
+rl_config.useA85 = 0
+
+# (title, width in points, align); widths fill a letter page inside the margins
+DIRECTORY_COLUMNS = [
+    ("Directory", 230, "left"), ("Files", 45, "right"), ("Good", 45, "right"),
+    ("Average", 50, "right"), ("Bad", 45, "right"), ("Avg score", 55, "right"),
+    ("Avg complexity", 62, "right"),
+]
+FILE_COLUMNS = [
+    ("Path", 250, "left"), ("Language", 60, "left"), ("Label", 55, "left"),
+    ("Grade", 35, "left"), ("Score", 35, "right"), ("Complexity", 55, "right"),
+    ("LOC", 40, "right"),
+]
+
+
+# -----------------------------------
+# Records and aggregation
+# -----------------------------------
+def iter_records(source):
+    """Scored files from an NDJSON path (codeq output) or an iterable of dicts; errors are skipped."""
+    if isinstance(source, str):
+        with open(source, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    if record.get("metrics"):
+                        yield record
+        return
+    for record in source:
+        if record.get("metrics"):
+            yield record
+
+
+def file_score(record):
+    return LABEL_SCORES.get(record["label"], LABEL_SCORES["Bad"])
+
+
+def summarize(records, worst=WORST_FILES):
+    """
+    One pass over the records: label, language and per-label metric
+    totals, the directory rollup, and the `worst` lowest-scoring files
+    (most complex first among equal scores).
+    """
+    summary = {
+        "files": 0,
+        "labels": Counter(),
+        "languages": Counter(),
+        "label_sums": {label: Counter() for label in LABELS},
+        "worst": [],
+    }
+    heap = summary["worst"]
+
+    def tally(records):
+        for i, record in enumerate(records):
+            summary["files"] += 1
+            label = record["label"]
+            metrics = record["metrics"]
+            summary["labels"][label] += 1
+            summary["languages"][metrics.get("language", "Unknown")] += 1
+            sums = summary["label_sums"].setdefault(label, Counter())
+            for key in RADAR_METRICS:
+                sums[key] += metrics.get(key, 0)
+
+            rank = (-file_score(record), metrics.get("cyclomatic_complexity", 0), -i)
+            entry = (rank, file_row(record))
+            if len(heap) < worst:
+                heapq.heappush(heap, entry)
+            elif rank > heap[0][0]:
+                heapq.heapreplace(heap, entry)
+            # rollup() walks up to "" and expects relative POSIX paths
+            yield {**record, "path": record["path"].replace(os.sep, "/").lstrip("/")}
+
+    summary["directories"] = rollup(tally(records))
+    summary["worst"] = [row for _, row in sorted(heap, reverse=True)]
+    return summary
+
+
+def file_row(record):
+    metrics = record["metrics"]
+    return (
+        record["path"],
+        metrics.get("language", ""),
+        record["label"],
+        LABEL_GRADES.get(record["label"], "C"),
+        str(file_score(record)),
+        f"{metrics.get('cyclomatic_complexity', 0):.2f}",
+        str(metrics.get("lines_of_code", 0)),
+    )
+
+
+def directory_score(entry):
+    return sum(LABEL_SCORES.get(label, LABEL_SCORES["Bad"]) * n for label, n in entry["labels"].items()) / entry["files"]
+
+
+def directory_rows(directories):
+    for directory, entry in directories.items():
+        yield (
+            directory,
+            str(entry["files"]),
+            *(str(entry["labels"].get(label, 0)) for label in LABELS),
+            f"{directory_score(entry):.1f}",
+            f"{entry['mean'].get('cyclomatic_complexity', 0):.2f}",
+        )
+
+
+# -----------------------------------
+# Charts
+# -----------------------------------
+def chart_key(kind, data):
+    payload = json.dumps([CHART_VERSION, kind, data], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def chart(kind, data, cache_dir=CHART_CACHE_DIR):
+    """Path of the PNG for `data`, rendered only if no cached copy exists."""
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"{kind}-{chart_key(kind, data)}.png")
+    if os.path.exists(path):
+        os.utime(path)  # recently used charts survive pruning
+        return path
+    fig = CHARTS[kind](data)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    fig.savefig(tmp, format="png", dpi=CHART_DPI, bbox_inches="tight")
+    os.replace(tmp, path)
+    prune_charts(cache_dir)
+    return path
+
+
+def prune_charts(cache_dir=CHART_CACHE_DIR, max_files=MAX_CACHED_CHARTS):
+    entries = [e for e in os.scandir(cache_dir) if e.name.endswith(".png")]
+    if len(entries) <= max_files:
+        return
+    entries.sort(key=lambda e: e.stat().st_mtime)
+    for entry in entries[:len(entries) - max_files]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def grade_histogram(data):
+    # Figure directly, not pyplot: no global state, safe off the main thread
+    fig = Figure(figsize=(6, 2.6))
+    ax = fig.add_subplot()
+    counts = [data.get(label, 0) for label in LABELS]
+    bars = ax.bar([f"{LABEL_GRADES[label]} ({label})" for label in LABELS], counts,
+                  color=[LABEL_COLORS[label] for label in LABELS])
+    ax.bar_label(bars)
+    ax.margins(y=0.15)  # room for the labels under the title
+    ax.set_ylabel("Files")
+    ax.set_title("Grade distribution")
+    return fig
+
+
+def directory_grades(data):
+    fig = Figure(figsize=(7, 3.2))
+    ax = fig.add_subplot()
+    names = [name for name, _ in data]
+    bottom = [0] * len(data)
+    for label in LABELS:
+        counts = [labels.get(label, 0) for _, labels in data]
+        ax.bar(names, counts, bottom=bottom, label=LABEL_GRADES[label], color=LABEL_COLORS[label])
+        bottom = [b + c for b, c in zip(bottom, counts)]
+    ax.set_ylabel("Files")
+    ax.set_title("Grades by top-level directory")
+    ax.legend()
+    ax.tick_params(axis="x", labelrotation=30)
+    for tick in ax.get_xticklabels():
+        tick.set_horizontalalignment("right")
+    return fig
+
+
+def radar(data):
+    import numpy as np
+
+    fig = Figure(figsize=(5, 5))
+    ax = fig.add_subplot(polar=True)
+    angles = np.linspace(0, 2 * np.pi, len(RADAR_METRICS), endpoint=False).tolist()
+    for label, values in data.items():
+        ax.plot(angles + angles[:1], values + values[:1], color=LABEL_COLORS.get(label), label=label)
+        ax.fill(angles + angles[:1], values + values[:1], color=LABEL_COLORS.get(label), alpha=0.15)
+    ax.set_xticks(angles)
+    ax.set_xticklabels([k.replace("_", "\n") for k in RADAR_METRICS], fontsize=8)
+    ax.set_title("Mean metrics by label (1 = repository mean)")
+    ax.legend(loc="lower right", bbox_to_anchor=(1.25, -0.1))
+    return fig
+
+
+CHARTS = {"grades": grade_histogram, "directory_grades": directory_grades, "radar": radar}
+
+
+def radar_data(summary):
+    """Each label's mean metrics relative to the whole repository's."""
+    overall = summary["directories"].get(".", {}).get("mean", {})
+    data = {}
+    for label in LABELS:
+        n = summary["labels"].get(label, 0)
+        if not n:
+            continue
+        sums = summary["label_sums"][label]
+        data[label] = [
+            round(sums[key] / n / overall[key], 4) if overall.get(key) else 1.0
+            for key in RADAR_METRICS
+        ]
+    return data
+
+
+def top_directories(directories, n=GRADE_DIRECTORIES):
+    top = [(d, entry) for d, entry in directories.items() if d != "." and "/" not in d]
+    top.sort(key=lambda item: -item[1]["files"])
+    return [(d, dict(entry["labels"])) for d, entry in top[:n]]
+
+
+# -----------------------------------
+# Writers
+# -----------------------------------
+class PdfReport:
+    """
+    Writes straight onto a reportlab canvas: each finished page is
+    compressed and handed to the document as soon as the next one starts,
+    so a 10k-row table never exists as a list of flowables.
+    """
+
+    MARGIN = 40
+    ROW_HEIGHT = 14
+    FONT = "Helvetica"
+    BOLD = "Helvetica-Bold"
+
+    def __init__(self, path, title):
+        self.canvas = canvas.Canvas(path, pagesize=letter, pageCompression=1)
+        self.canvas.setTitle(title)
+        self.width, self.height = letter
+        self.title_text = title
+        self.page = 1
+        self.y = self.height - self.MARGIN
+
+    def new_page(self):
+        self.footer()
+        self.canvas.showPage()
+        self.page += 1
+        self.y = self.height - self.MARGIN
+
+    def footer(self):
+        self.canvas.setFont(self.FONT, 8)
+        self.canvas.drawString(self.MARGIN, self.MARGIN / 2, self.title_text)
+        self.canvas.drawRightString(self.width - self.MARGIN, self.MARGIN / 2, f"Page {self.page}")
+
+    def space(self, height):
+        if self.y - height < self.MARGIN:
+            self.new_page()
+
+    def title(self, text):
+        self.space(30)
+        self.canvas.setFont(self.BOLD, 18)
+        self.canvas.drawString(self.MARGIN, self.y - 18, text)
+        self.y -= 30
+
+    def heading(self, text):
+        self.space(40)  # keep a heading with the first lines under it
+        self.y -= 6
+        self.canvas.setFont(self.BOLD, 13)
+        self.canvas.drawString(self.MARGIN, self.y - 13, text)
+        self.y -= 20
+
+    def paragraph(self, text):
+        self.canvas.setFont(self.FONT, 10)
+        self.space(14)
+        self.canvas.drawString(self.MARGIN, self.y - 10, text)
+        self.y -= 16
+
+    def image(self, path, width, height):
+        self.space(height + 8)
+        self.canvas.drawImage(path, self.MARGIN, self.y - height, width, height, preserveAspectRatio=True, anchor="w")
+        self.y -= height + 8
+
+    def table_header(self, columns):
+        self.canvas.drawText(self.rows([[title for title, _, _ in columns]], columns, self.BOLD))
+        self.canvas.line(self.MARGIN, self.y + 3, self.width - self.MARGIN, self.y + 3)
+
+    def rows(self, rows, columns, font):
+        """
+        One text object for a run of rows. The canvas keeps every page's
+        operators until save(); as one joined string per page rather
+        than a string per cell, a long table costs a fraction of the memory.
+        """
+        text = self.canvas.beginText()
+        text.setFont(font, 8)
+        for values in rows:
+            x = self.MARGIN
+            for value, (_, width, align) in zip(values, columns):
+                value = fit(value, width - 4, font, 8)
+                if align == "right":
+                    text.setTextOrigin(x + width - 4 - stringWidth(value, font, 8), self.y - 9)
+                else:
+                    text.setTextOrigin(x, self.y - 9)
+                text.textOut(value)
+                x += width
+            self.y -= self.ROW_HEIGHT
+        return text
+
+    def table(self, columns, rows):
+        rows = iter(rows)
+        row = next(rows, None)
+        self.space(2 * self.ROW_HEIGHT)
+        self.table_header(columns)
+        while row is not None:
+            fits = int((self.y - self.MARGIN) // self.ROW_HEIGHT)
+            page = [row, *itertools.islice(rows, fits - 1)]
+            self.canvas.drawText(self.rows(page, columns, self.FONT))
+            row = next(rows, None)
+            if row is not None:
+                self.new_page()
+                self.table_header(columns)
+        self.y -= 6
+
+    def close(self):
+        self.footer()
+        self.canvas.save()
+
+
+def fit(text, width, font, size):
+    """`text` cut to `width` points; paths lose their start, since the file name matters most."""
+    # No Helvetica glyph is much wider than the font size
+    if len(text) * size * 1.02 <= width or stringWidth(text, font, size) <= width:
+        return text
+    # Proportional first guess, then trim the rest
+    keep = max(1, int(len(text) * width / stringWidth(text, font, size)) - 1)
+    text = text[-keep:]
+    while len(text) > 1 and stringWidth("…" + text, font, size) > width:
+        text = text[1:]
+    return "…" + text
+
+
+class HtmlReport:
+    """Single self-contained HTML file, written top to bottom; charts are inlined as data URIs."""
+
+    STYLE = """
+body { font-family: Helvetica, Arial, sans-serif; margin: 2em; color: #222; }
+table { border-collapse: collapse; font-size: 12px; margin-bottom: 1.5em; }
+th, td { padding: 2px 8px; border-bottom: 1px solid #ddd; }
+th { text-align: left; background: #f5f5f5; position: sticky; top: 0; }
+td.right, th.right { text-align: right; }
+img { display: block; margin: 0.5em 0 1.5em; }
+"""
+
+    def __init__(self, path, title):
+        self.file = open(path, "w", encoding="utf-8")
+        self.file.write(
+            f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>{html.escape(title)}</title>"
+            f"<style>{self.STYLE}</style></head><body>\n"
+        )
+
+    def title(self, text):
+        self.file.write(f"<h1>{html.escape(text)}</h1>\n")
+
+    def heading(self, text):
+        self.file.write(f"<h2>{html.escape(text)}</h2>\n")
+
+    def paragraph(self, text):
+        self.file.write(f"<p>{html.escape(text)}</p>\n")
+
+    def image(self, path, width, height):
+        with open(path, "rb") as f:
+            data = base64.b64encode(f.read()).decode("ascii")
+        self.file.write(f"<img src=\"data:image/png;base64,{data}\" width=\"{int(width * 1.33)}\">\n")
+
+    def table(self, columns, rows):
+        classes = [' class="right"' if align == "right" else "" for _, _, align in columns]
+        self.file.write("<table><tr>")
+        self.file.write("".join(f"<th{c}>{html.escape(title)}</th>" for (title, _, _), c in zip(columns, classes)))
+        self.file.write("</tr>\n")
+        for values in rows:
+            self.file.write("<tr>" + "".join(f"<td{c}>{html.escape(v)}</td>" for v, c in zip(values, classes)) + "</tr>\n")
+        self.file.write("</table>\n")
+
+    def close(self):
+        self.file.write("</body></html>\n")
+        self.file.close()
+
+
+WRITERS = {"pdf": PdfReport, "html": HtmlReport}
+
+
+def report_format(path):
+    return "html" if path.lower().endswith((".html", ".htm")) else "pdf"
+
+
+# -----------------------------------
+# Building
+# -----------------------------------
+def build_report(source, out, title="Code Quality Report", fmt=None, progress=None, chart_cache=CHART_CACHE_DIR):
+    """
+    Write the report for `source` (NDJSON path or iterable of records that
+    can be iterated twice) to `out`. `progress(done, total)` is called as
+    file rows are written. Returns `out`.
+    """
+    fmt = fmt or report_format(out)
+    summary = summarize(iter_records(source))
+    total = summary["files"]
+    if progress:
+        progress(0, total)
+
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    tmp = f"{out}.tmp"
+    writer = WRITERS[fmt](tmp, title)
+    try:
+        writer.title(title)
+        writer.paragraph(
+            f"{total} files · " + ", ".join(f"{n} {lang}" for lang, n in summary["languages"].most_common())
+        )
+        if total:
+            overall = summary["directories"]["."]
+            writer.paragraph(
+                f"Average score {directory_score(overall):.1f}/100 · "
+                f"average complexity {overall['mean'].get('cyclomatic_complexity', 0):.2f}"
+            )
+
+        writer.heading("Summary")
+        writer.table(
+            [("Grade", 60, "left"), ("Label", 80, "left"), ("Files", 60, "right"), ("Share", 60, "right")],
+            (
+                (LABEL_GRADES[label], label, str(summary["labels"].get(label, 0)),
+                 f"{100 * summary['labels'].get(label, 0) / (total or 1):.1f}%")
+                for label in LABELS
+            ),
+        )
+        writer.image(chart("grades", {label: summary["labels"].get(label, 0) for label in LABELS}, chart_cache), 400, 175)
+        directories = top_directories(summary["directories"])
+        if len(directories) > 1:
+            writer.image(chart("directory_grades", directories, chart_cache), 460, 210)
+        radar_values = radar_data(summary)
+        if radar_values:
+            writer.image(chart("radar", radar_values, chart_cache), 330, 330)
+
+        writer.heading("Directories")
+        writer.table(DIRECTORY_COLUMNS, directory_rows(summary["directories"]))
+
+        writer.heading(f"Files Needing Attention (lowest {len(summary['worst'])})")
+        writer.table(FILE_COLUMNS, summary["worst"])
+
+        writer.heading("All Files")
+
+        def file_rows():
+            for done, record in enumerate(iter_records(source), 1):
+                yield file_row(record)
+                if progress and done % 100 == 0:
+                    progress(done, total)
+
+        writer.table(FILE_COLUMNS, file_rows())
+    finally:
+        writer.close()
+    os.replace(tmp, out)
+    if progress:
+        progress(total, total)
+    return out
+
+
+class ReportJob:
+    def __init__(self, source, out, title, fmt):
+        self.source = source
+        self.out = out
+        self.title = title
+        self.fmt = fmt or report_format(out)
+        self.status = "queued"  # queued → running → done / failed
+        self.done = 0
+        self.total = None
+        self.error = None
+        self.seconds = None
+        self.finished = threading.Event()
+
+    @property
+    def progress(self):
+        return self.done / self.total if self.total else 0.0
+
+    def update(self, done, total):
+        self.done, self.total = done, total
+
+    def wait(self, timeout=None):
+        return self.finished.wait(timeout)
+
+
+class ReportWorker:
+    """
+    Builds queued reports one at a time on a background thread, so the
+    caller (the Streamlit script thread) returns immediately and polls
+    the job's status and progress.
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.loop, daemon=True)
+        self.thread.start()
+
+    def submit(self, source, out, title="Code Quality Report", fmt=None):
+        job = ReportJob(source, out, title, fmt)
+        self.queue.put(job)
+        return job
+
+    def loop(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            job.status = "running"
+            start = time.perf_counter()
+            try:
+                build_report(job.source, job.out, job.title, job.fmt, progress=job.update)
+                job.status = "done"
+            except Exception as e:
+                job.error = str(e)
+                job.status = "failed"
+            job.seconds = time.perf_counter() - start
+            job.source = None  # the records can be large
+            job.finished.set()
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+
+@functools.lru_cache(maxsize=None)
+def get_report_worker():
+    """The process-wide report worker."""
+    return ReportWorker()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("results", help="NDJSON from codeq.py")
+    parser.add_argument("--out", default=os.path.join(REPORTS_DIR, "report.pdf"), help="*.pdf or *.html")
+    parser.add_argument("--title", default="Code Quality Report")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    out = build_report(args.results, args.out, args.title)
+    print(f"✅ Report written to {out} in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Headless HTTP/JSON scoring service.
+
+    python service.py --port 8000 --workers 4
+
+POST /score with {"source": "...", "filename": "x.py"} or
+{"sources": [{"source": "...", "filename": "x.py"}, ...]} returns the
+metrics, cluster and label for each source. GET /health returns "ok" and
+GET /metrics the stage timings and counters in Prometheus text format
+(start with --no-stats to turn instrumentation off).
+"""
+import argparse
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+import instrument
+from predict import extract_item, get_predictor
+from workers import WorkerPool
+
+MAX_WAIT = 0.005  # seconds a request may wait for others to join its batch
+MAX_BATCH = 256
+EXTRACT_TIMEOUT = 10
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+
+class MicroBatcher:
+    """
+    Collects feature vectors from concurrent requests and predicts them
+    together: the first vector starts a MAX_WAIT window and everything that
+    arrives in it goes through the fused scaler→PCA→KMeans transform as one
+    matrix.
+    """
+
+    def __init__(self, predictor, max_wait=MAX_WAIT, max_batch=MAX_BATCH):
+        self.predictor = predictor
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self.queue = queue.Queue()
+        self.batches = 0
+        self.thread = threading.Thread(target=self.loop, daemon=True)
+        self.thread.start()
+
+    def submit(self, metrics):
+        future = Future()
+        self.queue.put((metrics, future))
+        return future
+
+    def loop(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                X = np.array([self.predictor.vectorize(metrics) for metrics, _ in batch])
+                clusters = self.predictor.predict_matrix(X)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            instrument.count("batches")
+            instrument.count("batched_items", len(batch))
+            for (_, future), cluster in zip(batch, clusters):
+                cluster = int(cluster)
+                future.set_result((cluster, self.predictor.cluster_mapping.get(cluster, "Unknown")))
+
+
+class ScoringService:
+    def __init__(self, workers=None):
+        self.predictor = get_predictor()
+        self.batcher = MicroBatcher(self.predictor)
+        # A source that hangs extraction costs only its own worker, which is
+        # killed and replaced at the deadline
+        self.pool = WorkerPool(extract_item, processes=workers, timeout=EXTRACT_TIMEOUT)
+        self.dispatch = ThreadPoolExecutor(max_workers=self.pool.processes)
+
+    def score(self, sources):
+        """Score a list of {"source", "filename"} dicts."""
+        instrument.count("requests")
+        extractions = [
+            self.dispatch.submit(self.pool.apply, (item.get("filename", "snippet.py"), item["source"]))
+            for item in sources
+        ]
+        results = []
+        for item, extraction in zip(sources, extractions):
+            filename = item.get("filename", "snippet.py")
+            try:
+                metrics = extraction.result()
+            except TimeoutError:
+                results.append({"filename": filename, "error": f"extraction timed out after {EXTRACT_TIMEOUT} s"})
+                continue
+            if metrics is None:
+                results.append({"filename": filename, "error": "extraction failed"})
+                continue
+            results.append({"metrics": metrics, "future": self.batcher.submit(metrics)})
+
+        for result in results:
+            if "future" in result:
+                result["cluster"], result["label"] = result.pop("future").result()
+        return results
+
+    def close(self):
+        self.dispatch.shutdown(cancel_futures=True)
+        self.pool.close()
+
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive for clients that reuse connections
+    service = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body):
+        self.send_body(status, json.dumps(body).encode("utf-8"), "application/json")
+
+    def send_body(self, status, data, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self.send_json(200, {"status": "ok"})
+        elif self.path == "/metrics":
+            self.send_body(200, instrument.prometheus().encode("utf-8"), "text/plain; version=0.0.4")
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/score":
+            self.send_json(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers["Content-Length"])
+            if length < 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            self.close_connection = True  # the body can't be skipped without a length
+            self.send_json(400, {"error": "missing or invalid Content-Length"})
+            return
+        if length > MAX_BODY_BYTES:
+            self.send_json(413, {"error": "request too large"})
+            return
+        try:
+            body = json.loads(self.rfile.read(length))
+            if "sources" in body:
+                sources = body["sources"]
+            else:
+                sources = [body]
+            if not all(isinstance(item.get("source"), str) for item in sources):
+                raise ValueError
+        except (ValueError, TypeError, AttributeError):
+            self.send_json(400, {"error": "expected {\"source\": ...} or {\"sources\": [...]}"})
+            return
+
+        try:
+            with instrument.stage("request"):
+                results = self.service.score(sources)
+        except Exception as e:
+            self.send_json(500, {"error": str(e)})
+            return
+        self.send_json(200, {"results": results} if "sources" in body else results[0])
+
+
+def make_server(host="127.0.0.1", port=8000, workers=None):
+    service = ScoringService(workers=workers)
+    handler = type("Handler", (ScoringHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server, service
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=None, help="extraction processes (default: CPU count)")
+    parser.add_argument("--no-stats", action="store_true", help="disable the timers behind /metrics")
+    args = parser.parse_args()
+
+    if not args.no_stats:
+        instrument.enable()
+
+    server, service = make_server(args.host, args.port, args.workers)
+    print(f"Scoring service on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
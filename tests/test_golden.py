@@ -0,0 +1,15 @@
+import json
+
+import pytest
+
+from bench.scanner import GOLDEN_FILE, SAMPLES
+from extract import extract
+
+with open(GOLDEN_FILE, "r", encoding="utf-8") as f:
+    GOLDEN = json.load(f)
+
+
+@pytest.mark.parametrize("path", SAMPLES)
+def test_extract_matches_golden(path):
+    # Regenerate with `python -m bench.scanner --update` only for an intended change
+    assert extract(path) == GOLDEN[path]
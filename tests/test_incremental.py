@@ -0,0 +1,65 @@
+import os
+import random
+import sysconfig
+
+import pytest
+
+import extract
+from bench.incremental_edits import generate_source
+from extract import extract_source
+from incremental import IncrementalAnalyzer, split_regions
+
+# Lines an editor passes through while typing: each leaves a bracket,
+# string, comment or block open for the rest of the file
+BROKEN_LINES = [
+    'x = (\n', 'def f(\n', 's = \'abc\n', '"""\n', "'''unterminated\n", '    if x:\n', 'class\n',
+    '{\n', '}\n', ')\n', '/* open\n', 'function g(a, {\n', 'var t = `tmpl ${\n', '\tx\n', 'if (x)\n',
+    'total = 1 +\n',
+]
+
+JS_FUNCTION = '''function handler{i}(items, limit) {{
+  // keep items above the limit
+  var total = 0;
+  for (var j = 0; j < items.length; j++) {{
+    if (items[j] > limit) {{
+      total += items[j];
+    }} else {{
+      total -= 1;
+    }}
+  }}
+  return total;
+}}
+
+'''
+
+
+def sources():
+    stdlib = sysconfig.get_paths()["stdlib"]
+    for name in ["textwrap.py"]:
+        with open(os.path.join(stdlib, name), "r", encoding="utf-8") as f:
+            yield name, f.read()
+    yield "generated.py", generate_source(300)
+    yield "handlers.js", "".join(JS_FUNCTION.format(i=i) for i in range(20))
+
+
+@pytest.mark.parametrize("engine", ["lines", "ast"])
+@pytest.mark.parametrize("filename,source", list(sources()), ids=lambda v: v if v.endswith(("py", "js")) else "")
+def test_matches_full_extract_through_broken_edits(monkeypatch, engine, filename, source):
+    monkeypatch.setattr(extract, "PYTHON_ENGINE", engine)
+    rng = random.Random(filename)
+    lines = source.splitlines(keepends=True)
+    analyzer = IncrementalAnalyzer(filename)
+    assert analyzer.update(source) == extract_source(source, filename)
+
+    for broken in BROKEN_LINES:
+        # Just above a region start, where an open construct runs into the next region
+        starts = [start for start, _ in split_regions(lines, analyzer.language)[1:]]
+        pos = rng.choice(starts or range(len(lines)))
+        lines.insert(pos, broken)
+        assert analyzer.apply_edit(pos, pos, broken) == extract_source("".join(lines), filename), (pos, broken)
+        # an ordinary edit while the file is still broken
+        edit = rng.randrange(len(lines))
+        lines[edit] = lines[edit].rstrip("\n") + "  # edited\n" if lines[edit].strip() else "y = 2\n"
+        assert analyzer.apply_edit(edit, edit + 1, lines[edit]) == extract_source("".join(lines), filename)
+        del lines[pos]
+        assert analyzer.apply_edit(pos, pos + 1, "") == extract_source("".join(lines), filename)
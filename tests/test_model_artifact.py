@@ -0,0 +1,50 @@
+import glob
+import os
+
+import numpy as np
+import pytest
+
+import model_artifact
+from bench import synthetic
+from predict import MODEL_DIR, QualityPredictor, predict_code_quality
+
+# data/ holds pickles from an older scikit-learn
+pytestmark = pytest.mark.filterwarnings("ignore::sklearn.exceptions.InconsistentVersionWarning")
+
+
+@pytest.fixture(scope="module")
+def predictors():
+    reference = QualityPredictor(params=model_artifact.params_from_pickles(MODEL_DIR))
+    candidate = QualityPredictor(params=model_artifact.load(os.path.join(MODEL_DIR, model_artifact.ARTIFACT)))
+    return reference, candidate
+
+
+def test_schema_and_mapping(predictors):
+    reference, candidate = predictors
+    assert candidate.feature_columns == reference.feature_columns
+    assert candidate.cluster_mapping == reference.cluster_mapping
+
+
+def test_files_match_pickles(predictors, tmp_path):
+    reference, _ = predictors
+    files = sorted(glob.glob(os.path.join(MODEL_DIR, "*.py")))
+    files += synthetic.write_corpus(str(tmp_path), size=20, files_per_shape=1)
+    files += sorted(glob.glob(os.path.join(os.path.dirname(os.__file__), "*.py")))[:20]
+    results = {path: (reference.predict_file(path), predict_code_quality(path)) for path in files}
+    assert {path: pair for path, pair in results.items() if pair[0] != pair[1]} == {}
+
+
+def test_random_vectors_match_pickles(predictors):
+    reference, candidate = predictors
+    X = np.random.default_rng(0).normal(size=(20000, len(reference.feature_columns))) * 50
+    np.testing.assert_array_equal(candidate.predict_matrix(X), reference.predict_matrix(X))
+    np.testing.assert_allclose(candidate.project(X), reference.project(X), rtol=0, atol=1e-9)
+
+
+def test_save_load_round_trip(predictors, tmp_path):
+    reference, _ = predictors
+    path = str(tmp_path / model_artifact.ARTIFACT)
+    model_artifact.save(path, model_artifact.params_from_pickles(MODEL_DIR))
+    X = np.random.default_rng(1).normal(size=(1000, len(reference.feature_columns)))
+    np.testing.assert_array_equal(QualityPredictor(params=model_artifact.load(path)).predict_matrix(X),
+                                  reference.predict_matrix(X))
@@ -0,0 +1,382 @@
+"""
+Out-of-core training for the scaler → PCA → KMeans models.
+
+    python train.py fit [--metrics data/metrics.csv]   # train from scratch
+    python train.py update new_metrics.csv [--relabel] # warm-start on new files
+    python train.py list
+
+The metrics file (CSV or a Parquet directory from export.py) is streamed
+in chunks, so the corpus never has to fit in memory. It is parsed once:
+pass 1 spills the float64 feature rows to a temporary file that the
+later passes read back through a memmap.
+
+    pass 1   StandardScaler.partial_fit
+    pass 2   IncrementalPCA.partial_fit on the scaled chunks
+    pass 3   MiniBatchKMeans.partial_fit on the projected chunks (--epochs times),
+             started from KMeans centers of a reservoir sample kept in pass 2
+    pass 4   mean cyclomatic complexity per cluster → Bad / Average / Good
+
+As in unsupervised.ipynb, KMeans clusters the PCA projection and the
+cluster with the lowest mean complexity is labelled "Bad".
+
+Every run writes a new version directory under data/models/ holding
+the same four pickles as data/, the model.bin inference artifact,
+the neighbour index (neighbors.py) and manifest.json. data/models/CURRENT
+points at the newest one, and QualityPredictor loads from there.
+`update` continues from the current version's models. Only the new rows
+are read. Each new centroid keeps the label of the nearest centroid
+of the previous version, so a label never moves to another cluster
+between versions. If the mean complexities would now order the
+clusters differently, the old labels are kept unless --relabel is
+given. Every model drifts a little from what a full refit would give,
+so run `fit` again now and then.
+"""
+import argparse
+import datetime
+import itertools
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+import sklearn
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.decomposition import IncrementalPCA
+from sklearn.preprocessing import StandardScaler
+
+import model_artifact
+import neighbors
+from metrics_store import feature_columns, iter_feature_chunks, read_columns
+from predict import MANIFEST, METRICS_CSV, VERSIONS_DIR, QualityPredictor
+
+N_COMPONENTS = 10
+N_CLUSTERS = 3
+CHUNK_SIZE = 10000
+EPOCHS = 3
+RANDOM_STATE = 42
+SAMPLE_SIZE = 20000  # rows kept in memory to initialize the clustering
+LABELS = ["Bad", "Average", "Good"]  # by increasing mean cyclomatic complexity
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def rechunk(chunks, min_rows):
+    """Yield the chunks, folding any with fewer than `min_rows` rows into the one before."""
+    held = None
+    for chunk in chunks:
+        if held is not None and len(chunk) < min_rows:
+            held = np.vstack([held, chunk])
+            continue
+        if held is not None:
+            yield held
+        held = chunk
+    if held is not None:
+        yield held
+
+
+class Trainer:
+    """Streams one metrics file through the partial-fit models."""
+
+    def __init__(self, scaler, pca, kmeans, columns, cluster_stats=None):
+        self.scaler = scaler
+        self.pca = pca
+        self.kmeans = kmeans
+        self.columns = columns
+        self.cluster_stats = cluster_stats or {"sum": [0.0] * kmeans.n_clusters, "count": [0] * kmeans.n_clusters}
+        self.mapping = None  # carried over from the parent version; None to derive it from cluster_stats
+        self.timings = {}
+        self.sample = None
+        self.data = None
+
+    @classmethod
+    def new(cls, columns, n_components=N_COMPONENTS, n_clusters=N_CLUSTERS):
+        return cls(
+            StandardScaler(),
+            IncrementalPCA(n_components=n_components),
+            MiniBatchKMeans(n_clusters=n_clusters, random_state=RANDOM_STATE),
+            columns,
+        )
+
+    def chunks(self, chunk_size, source=None):
+        """Feature chunks from `source`, or from the spilled copy once pass 1 has run."""
+        if source is None:
+            source = (self.data[i:i + chunk_size] for i in range(0, len(self.data), chunk_size))
+        min_rows = max(self.pca.n_components, self.kmeans.n_clusters)
+        return rechunk(source, min_rows)
+
+    def timed(self, name, func, *args):
+        start = time.perf_counter()
+        func(*args)
+        self.timings[name] = round(self.timings.get(name, 0.0) + time.perf_counter() - start, 4)
+
+    def fit_scaler(self, path, chunk_size, spill_path):
+        rows = 0
+        with open(spill_path, "wb") as f:
+            for X in self.chunks(chunk_size, iter_feature_chunks(path, self.columns, chunk_size)):
+                self.scaler.partial_fit(X)
+                f.write(np.ascontiguousarray(X, dtype=np.float64).tobytes())
+                rows += len(X)
+        self.data = np.memmap(spill_path, dtype=np.float64, mode="r", shape=(rows, len(self.columns)))
+
+    def fit_pca(self, chunk_size, sample_size=SAMPLE_SIZE):
+        # Reservoir sampling keeps a uniform sample of the scaled rows
+        rng = np.random.default_rng(RANDOM_STATE)
+        sample = np.empty((sample_size, len(self.columns)))
+        filled = seen = 0
+        for X in self.chunks(chunk_size):
+            X = self.scaler.transform(X)
+            self.pca.partial_fit(X)
+            take = min(sample_size - filled, len(X))
+            sample[filled:filled + take] = X[:take]
+            filled += take
+            rest = X[take:]
+            if len(rest):
+                # Row i of the stream replaces a random slot with probability size / (i + 1)
+                slots = rng.integers(0, seen + take + np.arange(1, len(rest) + 1))
+                keep = slots < sample_size
+                sample[slots[keep]] = rest[keep]
+            seen += len(X)
+        self.sample = sample[:filled]
+
+    def init_kmeans(self):
+        """Full KMeans on the sample, so the mini-batches start from good centers."""
+        if self.sample is None or hasattr(self.kmeans, "cluster_centers_"):
+            return  # warm start: keep the existing centers
+        km = KMeans(n_clusters=self.kmeans.n_clusters, n_init=10, random_state=RANDOM_STATE)
+        km.fit(self.pca.transform(self.sample))
+        self.kmeans.set_params(init=km.cluster_centers_, n_init=1)
+        self.sample = None
+
+    def fit_kmeans(self, chunk_size, epochs):
+        self.init_kmeans()
+        for _ in range(epochs):
+            for X in self.chunks(chunk_size):
+                self.kmeans.partial_fit(self.pca.transform(self.scaler.transform(X)))
+
+    def count_clusters(self, chunk_size):
+        complexity = self.columns.index("cyclomatic_complexity")
+        for X in self.chunks(chunk_size):
+            clusters = self.kmeans.predict(self.pca.transform(self.scaler.transform(X)))
+            sums = np.bincount(clusters, weights=X[:, complexity], minlength=self.kmeans.n_clusters)
+            counts = np.bincount(clusters, minlength=self.kmeans.n_clusters)
+            self.cluster_stats["sum"] = (np.array(self.cluster_stats["sum"]) + sums).tolist()
+            self.cluster_stats["count"] = (np.array(self.cluster_stats["count"]) + counts).tolist()
+
+    def train(self, path, chunk_size=CHUNK_SIZE, epochs=EPOCHS):
+        with tempfile.TemporaryDirectory() as tmp:
+            self.timed("scaler", self.fit_scaler, path, chunk_size, os.path.join(tmp, "features.f64"))
+            self.timed("pca", self.fit_pca, chunk_size)
+            self.timed("kmeans", self.fit_kmeans, chunk_size, epochs)
+            self.timed("mapping", self.count_clusters, chunk_size)
+            self.data = None
+
+    def cluster_mapping(self):
+        return dict(self.mapping) if self.mapping is not None else self.complexity_mapping()
+
+    def complexity_mapping(self):
+        sums = np.array(self.cluster_stats["sum"])
+        counts = np.array(self.cluster_stats["count"])
+        means = np.divide(sums, counts, out=np.full(len(sums), np.inf), where=counts > 0)
+        order = np.argsort(means, kind="stable")
+        labels = LABELS if len(order) == len(LABELS) else [f"Cluster {i}" for i in range(len(order))]
+        return {int(cluster): label for cluster, label in zip(order, labels)}
+
+    def feature_centers(self):
+        """KMeans centers mapped back through the PCA and scaler, comparable across versions."""
+        return self.scaler.inverse_transform(self.pca.inverse_transform(self.kmeans.cluster_centers_))
+
+    def carry_mapping(self, previous_centers, previous_mapping):
+        """Label each cluster like the nearest previous centroid, pairing the closest ones first."""
+        new = self.scaler.transform(self.feature_centers())
+        old = self.scaler.transform(previous_centers)
+        distances = ((new[:, np.newaxis, :] - old[np.newaxis]) ** 2).sum(axis=2)
+        mapping = {}
+        used = set()
+        for flat in np.argsort(distances, axis=None, kind="stable"):
+            cluster, previous = divmod(int(flat), len(old))
+            if cluster not in mapping and previous not in used:
+                mapping[cluster] = previous_mapping[previous]
+                used.add(previous)
+        return mapping
+
+
+def list_versions(models_dir=VERSIONS_DIR):
+    if not os.path.isdir(models_dir):
+        return []
+    return sorted(name for name in os.listdir(models_dir) if name.startswith("v") and name[1:].isdigit())
+
+
+def current_version(models_dir=VERSIONS_DIR):
+    current = os.path.join(models_dir, "CURRENT")
+    if not os.path.exists(current):
+        return None
+    with open(current, "r", encoding="utf-8") as f:
+        return f.read().strip()
+
+
+def load_manifest(version_dir):
+    with open(os.path.join(version_dir, MANIFEST), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_version(trainer, models_dir, manifest, index_rows=None):
+    """
+    Write the models into the next vNNNN directory and make it current.
+    `index_rows(predictor)` gives the (filenames, features) chunks for the
+    version's neighbour index, if it should have one.
+    """
+    versions = list_versions(models_dir)
+    version = f"v{int(versions[-1][1:]) + 1 if versions else 1:04d}"
+    version_dir = os.path.join(models_dir, version)
+    tmp_dir = os.path.join(models_dir, f"_{version}.tmp")
+    os.makedirs(tmp_dir)
+
+    joblib.dump(trainer.scaler, os.path.join(tmp_dir, "scaler.pkl"))
+    joblib.dump(trainer.pca, os.path.join(tmp_dir, "pca.pkl"))
+    joblib.dump(trainer.kmeans, os.path.join(tmp_dir, "kmeans.pkl"))
+    joblib.dump(trainer.cluster_mapping(), os.path.join(tmp_dir, "cluster_mapping.pkl"))
+    artifact = os.path.join(tmp_dir, model_artifact.ARTIFACT)
+    model_artifact.save(artifact, model_artifact.params_from_models(
+        trainer.scaler, trainer.pca, trainer.kmeans, trainer.cluster_mapping(), trainer.columns,
+    ))
+    if index_rows is not None:
+        predictor = QualityPredictor(params=model_artifact.load(artifact))
+        trainer.timed("neighbors", neighbors.build, index_rows(predictor), predictor,
+                      os.path.join(tmp_dir, neighbors.INDEX_DIR))
+    manifest = {
+        "version": version,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "rows": int(trainer.scaler.n_samples_seen_) if np.ndim(trainer.scaler.n_samples_seen_) == 0
+        else int(trainer.scaler.n_samples_seen_[0]),
+        "feature_columns": trainer.columns,
+        "n_components": trainer.pca.n_components,
+        "n_clusters": trainer.kmeans.n_clusters,
+        "cluster_stats": trainer.cluster_stats,
+        "cluster_mapping": {str(k): v for k, v in trainer.cluster_mapping().items()},
+        "timings_s": trainer.timings,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "scikit-learn": sklearn.__version__,
+        **manifest,
+    }
+    with open(os.path.join(tmp_dir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_dir, version_dir)
+
+    current_tmp = os.path.join(models_dir, "CURRENT.tmp")
+    with open(current_tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(current_tmp, os.path.join(models_dir, "CURRENT"))
+    return version_dir
+
+
+def fit(metrics_path=METRICS_CSV, models_dir=VERSIONS_DIR, chunk_size=CHUNK_SIZE, epochs=EPOCHS,
+        n_components=N_COMPONENTS, n_clusters=N_CLUSTERS):
+    """Train from scratch on `metrics_path`; returns the new version directory."""
+    columns = feature_columns(read_columns(metrics_path))
+    trainer = Trainer.new(columns, n_components, n_clusters)
+    trainer.train(metrics_path, chunk_size, epochs)
+    os.makedirs(models_dir, exist_ok=True)
+    return save_version(trainer, models_dir, {
+        "mode": "fit",
+        "parent": None,
+        "sources": [metrics_path],
+        "epochs": epochs,
+    }, index_rows=lambda predictor: neighbors.metrics_chunks(metrics_path, predictor, chunk_size))
+
+
+def update(metrics_path, models_dir=VERSIONS_DIR, chunk_size=CHUNK_SIZE, epochs=EPOCHS, relabel=False):
+    """
+    Warm-start the current version on the rows in `metrics_path` only.
+    The parent's labels are carried over unless `relabel`, which labels
+    the clusters by mean complexity again.
+    """
+    parent = current_version(models_dir)
+    if parent is None:
+        raise FileNotFoundError(f"No current model in {models_dir}; run `train.py fit` first")
+    parent_dir = os.path.join(models_dir, parent)
+    manifest = load_manifest(parent_dir)
+
+    trainer = Trainer(
+        joblib.load(os.path.join(parent_dir, "scaler.pkl")),
+        joblib.load(os.path.join(parent_dir, "pca.pkl")),
+        joblib.load(os.path.join(parent_dir, "kmeans.pkl")),
+        manifest["feature_columns"],
+        manifest["cluster_stats"],
+    )
+    previous_centers = trainer.feature_centers()
+    trainer.train(metrics_path, chunk_size, epochs)
+    carried = trainer.carry_mapping(previous_centers, {int(k): v for k, v in manifest["cluster_mapping"].items()})
+    relabelled = carried != trainer.complexity_mapping()
+    if not relabel:
+        trainer.mapping = carried
+
+    # The parent's index already holds the older rows; re-project them
+    # together with the new ones
+    index_rows = None
+    parent_index = os.path.join(parent_dir, neighbors.INDEX_DIR)
+    if neighbors.has_index(parent_index):
+        index_rows = lambda predictor: itertools.chain(
+            neighbors.index_rows(parent_index, chunk_size),
+            neighbors.metrics_chunks(metrics_path, predictor, chunk_size),
+        )
+    return save_version(trainer, models_dir, {
+        "mode": "update",
+        "parent": parent,
+        "sources": manifest["sources"] + [metrics_path],
+        "epochs": epochs,
+        "relabelled": relabel and relabelled,
+        # set when the mean complexities disagree with the labels kept
+        "complexity_mapping": {str(k): v for k, v in trainer.complexity_mapping().items()}
+        if relabelled and not relabel else None,
+    }, index_rows=index_rows)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    fit_parser = sub.add_parser("fit", help="train new models from scratch")
+    fit_parser.add_argument("--metrics", default=METRICS_CSV, help="metrics CSV or *.parquet directory")
+    update_parser = sub.add_parser("update", help="warm-start the current models on new rows")
+    update_parser.add_argument("metrics", help="metrics of the newly added files only")
+    update_parser.add_argument("--relabel", action="store_true",
+                               help="label the clusters by mean complexity again instead of keeping the parent's labels")
+    for p in (fit_parser, update_parser):
+        p.add_argument("--models-dir", default=VERSIONS_DIR)
+        p.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+        p.add_argument("--epochs", type=int, default=EPOCHS, help="MiniBatchKMeans passes over the data")
+    list_parser = sub.add_parser("list", help="show the trained versions")
+    list_parser.add_argument("--models-dir", default=VERSIONS_DIR)
+    args = parser.parse_args()
+
+    if args.command == "list":
+        current = current_version(args.models_dir)
+        for version in list_versions(args.models_dir):
+            manifest = load_manifest(os.path.join(args.models_dir, version))
+            marker = "*" if version == current else " "
+            print(f"{marker} {version}  {manifest['created']}  {manifest['mode']:6}  {manifest['rows']:>9} rows")
+        return
+
+    start = time.perf_counter()
+    if args.command == "fit":
+        version_dir = fit(args.metrics, args.models_dir, args.chunk_size, args.epochs)
+    else:
+        version_dir = update(args.metrics, args.models_dir, args.chunk_size, args.epochs, args.relabel)
+    manifest = load_manifest(version_dir)
+    print(f"✅ {manifest['version']} trained on {manifest['rows']} rows in {time.perf_counter() - start:.1f}s "
+          f"(peak RSS {manifest['peak_rss_mb']} MB)")
+    print(f"Cluster mapping: {manifest['cluster_mapping']}")
+    if manifest.get("complexity_mapping"):
+        print(f"⚠️ Mean complexity now orders the clusters as {manifest['complexity_mapping']}; "
+              f"kept the previous labels (pass --relabel to switch)")
+
+
+if __name__ == "__main__":
+    main()
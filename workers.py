@@ -0,0 +1,159 @@
+import os
+import queue
+import threading
+import time
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import wait
+
+import instrument
+
+
+def worker_loop(conn, func):
+    """Run `func` on every item received until a None sentinel arrives."""
+    instrument.reset()  # a forked worker starts with a copy of the parent's numbers
+    while True:
+        item = conn.recv()
+        if item is None:
+            break
+        result = func(item)
+        # The parent merges the worker's stage timings as results come back
+        conn.send((result, instrument.drain() if instrument.enabled else None))
+
+
+class Worker:
+    def __init__(self, func):
+        self.conn, child_conn = Pipe()
+        self.process = Process(target=worker_loop, args=(child_conn, func), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.item = None
+        self.deadline = None
+
+    def submit(self, item, timeout):
+        self.item = item
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.conn.send(item)
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class WorkerPool:
+    """
+    Fixed set of warm worker processes with a per-task timeout.
+
+    Unlike multiprocessing.Pool, a task that overruns `timeout` only costs
+    its own worker: that process is killed and replaced while the others
+    keep running. Results come back as (item, result) in completion order;
+    timed-out or crashed tasks yield (item, None).
+
+    apply() is the blocking, thread-safe alternative for servers that take
+    items from many threads; don't mix the two on one pool.
+    """
+
+    def __init__(self, func, processes=None, timeout=None):
+        self.func = func
+        self.processes = processes or os.cpu_count() or 1
+        self.timeout = timeout
+        self.workers = [Worker(func) for _ in range(self.processes)]
+        self.lock = threading.Lock()
+        self.idle = queue.Queue()
+        for worker in self.workers:
+            self.idle.put(worker)
+
+    def apply(self, item):
+        """
+        Run `item` on the next free worker and return its result, or None if
+        the worker crashed. Raises TimeoutError once the task overruns
+        `timeout`, after killing and replacing its worker.
+        """
+        worker = self.idle.get()
+        try:
+            worker.submit(item, self.timeout)
+            finished = worker.conn.poll(self.timeout)
+            result, stats = worker.conn.recv() if finished else (None, None)
+        except (EOFError, OSError):
+            # Worker died mid-task (segfault, OOM kill, ...)
+            instrument.count("worker_crashes")
+            self.idle.put(self.replace(worker))
+            return None
+        if not finished:
+            instrument.count("timeouts")
+            self.idle.put(self.replace(worker))
+            raise TimeoutError(f"task exceeded {self.timeout} s")
+        self.idle.put(worker)
+        instrument.merge(stats)
+        return result
+
+    def imap_unordered(self, items):
+        items = iter(items)
+        idle = list(self.workers)
+        busy = {}
+        exhausted = False
+
+        while True:
+            while idle and not exhausted:
+                try:
+                    item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                worker = idle.pop()
+                worker.submit(item, self.timeout)
+                busy[worker.conn] = worker
+            if not busy:
+                return
+
+            deadlines = [w.deadline for w in busy.values() if w.deadline is not None]
+            wait_for = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            for conn in wait(list(busy), timeout=wait_for):
+                worker = busy.pop(conn)
+                try:
+                    result, stats = conn.recv()
+                except (EOFError, OSError):
+                    # Worker died mid-task (segfault, OOM kill, ...)
+                    instrument.count("worker_crashes")
+                    yield worker.item, None
+                    idle.append(self.replace(worker))
+                    continue
+                instrument.merge(stats)
+                yield worker.item, result
+                idle.append(worker)
+
+            now = time.monotonic()
+            for conn, worker in list(busy.items()):
+                if worker.deadline is not None and worker.deadline <= now:
+                    del busy[conn]
+                    instrument.count("timeouts")
+                    yield worker.item, None
+                    idle.append(self.replace(worker))
+
+    def replace(self, worker):
+        worker.kill()
+        new_worker = Worker(self.func)
+        with self.lock:
+            self.workers[self.workers.index(worker)] = new_worker
+        return new_worker
+
+    def close(self):
+        for worker in self.workers:
+            worker.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()